@@ -0,0 +1,54 @@
+# bench_category_model.py
+# Compare per-call category prediction latency: unpickling on every call vs the process-wide holder.
+#
+# Usage: python benchmarks/bench_category_model.py [calls]
+
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from budget_app.ml_utils import CategoryModelHolder, train_model  # noqa: E402
+
+
+def predict_unpickling_every_call(path, description):
+    # The pre-holder behaviour: stat, open and unpickle the artifact on every prediction.
+    if not os.path.exists(path):
+        train_model(path)
+    with open(path, 'rb') as f:
+        artifact = pickle.load(f)
+    return artifact['model'].predict(artifact['vectorizer'].transform([description]))[0]
+
+
+def predict_with_holder(holder, description):
+    model, vectorizer = holder.get()
+    return model.predict(vectorizer.transform([description]))[0]
+
+
+def per_call_us(func, *args, calls):
+    started = time.perf_counter()
+    for _ in range(calls):
+        func(*args)
+    return (time.perf_counter() - started) / calls * 1_000_000
+
+
+def main(calls):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'model.pkl')
+        train_model(path)
+        holder = CategoryModelHolder(path)
+        holder.warm_up()
+
+        before = per_call_us(predict_unpickling_every_call, path, 'Uber to office', calls=calls)
+        after = per_call_us(predict_with_holder, holder, 'Uber to office', calls=calls)
+        print(f"calls: {calls}")
+        print(f"unpickle per call: {before:10.1f} us")
+        print(f"process holder:    {after:10.1f} us")
+        print(f"speed-up:          {before / after:10.1f}x")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,77 @@
+# bench_dashboard.py
+# Compare dashboard latency for full ORM hydration against the SQL aggregation service.
+#
+# Usage: python benchmarks/bench_dashboard.py [rows ...]
+
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from budget_app import create_app, db  # noqa: E402
+from budget_app.models import User, Income, Expense  # noqa: E402
+from budget_app.services.dashboard_data import load_dashboard_data  # noqa: E402
+from budget_app.services.rollups import rebuild_rollups  # noqa: E402
+
+CATEGORIES = ['Food', 'Transport', 'Utilities', 'Entertainment', 'Health', 'Other']
+CURRENCIES = ['INR', 'USD', 'EUR']
+
+
+def seed(user_id, rows):
+    rng = random.Random(rows)
+    start = date(2015, 1, 1)
+    incomes = []
+    expenses = []
+    for index in range(rows):
+        day = start + timedelta(days=rng.randrange(3650))
+        incomes.append({
+            'amount': round(rng.uniform(10, 5000), 2), 'source': 'Salary', 'date': day,
+            'currency_code': rng.choice(CURRENCIES), 'user_id': user_id,
+        })
+        expenses.append({
+            'amount': round(rng.uniform(1, 500), 2), 'category': rng.choice(CATEGORIES),
+            'date': datetime.combine(day, datetime.min.time()),
+            'currency_code': rng.choice(CURRENCIES), 'user_id': user_id,
+        })
+    db.session.execute(Income.__table__.insert(), incomes)
+    db.session.execute(Expense.__table__.insert(), expenses)
+    db.session.commit()
+    rebuild_rollups()
+
+
+def hydrate_everything(user_id):
+    incomes = Income.query.filter_by(user_id=user_id).all()
+    expenses = Expense.query.filter_by(user_id=user_id).all()
+    return len(incomes) + len(expenses)
+
+
+def timed(func, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+        db.session.expunge_all()
+    return best * 1000
+
+
+def main(sizes):
+    app = create_app()
+    with app.app_context():
+        print(f"{'rows/table':>12} {'hydrate (ms)':>14} {'aggregate (ms)':>16}")
+        for size in sizes:
+            db.drop_all()
+            db.create_all()
+            user = User(username='bench', email='bench@example.com', password='x')
+            db.session.add(user)
+            db.session.commit()
+            seed(user.id, size)
+            print(f"{size:>12} {timed(hydrate_everything, user.id):>14.1f} {timed(load_dashboard_data, user.id):>16.1f}")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,64 @@
+# bench_forecast.py
+# Time a cold and a cached cash-flow forecast for one user with many recurring schedules.
+#
+# Usage: python benchmarks/bench_forecast.py [schedules] [months]
+
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from budget_app import create_app, db  # noqa: E402
+from budget_app.models import User, RecurringTransaction  # noqa: E402
+from budget_app.services.forecast import build_forecast, forecast_balances  # noqa: E402
+
+START = date(2024, 6, 1)
+REPEAT = 50
+
+
+def main():
+    schedules = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    months = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    rng = random.Random(schedules)
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', password='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.execute(RecurringTransaction.__table__.insert(), [
+            {
+                'type': 'income' if rng.random() < 0.2 else 'expense',
+                'amount': round(rng.uniform(5, 2000), 2),
+                'interval': rng.choice(('daily', 'weekly', 'monthly')),
+                'next_date': datetime(2024, 5, 1) + timedelta(days=rng.randint(0, 90)),
+                'user_id': user.id,
+            }
+            for _ in range(schedules)
+        ])
+        db.session.commit()
+
+        build_forecast(user.id, START, months)
+        started = time.perf_counter()
+        for _ in range(REPEAT):
+            forecast = build_forecast(user.id, START, months)
+        cold = (time.perf_counter() - started) / REPEAT
+
+        forecast_balances(user.id, months, start=START)
+        started = time.perf_counter()
+        for _ in range(REPEAT):
+            forecast_balances(user.id, months, start=START)
+        cached = (time.perf_counter() - started) / REPEAT
+
+        print(f"{schedules} schedules, {months} months ({len(forecast['dates'])} days)")
+        print(f"  uncached: {cold * 1000:.2f} ms, cached: {cached * 1000:.2f} ms")
+        print(f"  ending balance {forecast['ending_balance']}, lowest {forecast['lowest_balance']} on {forecast['lowest_date']}")
+
+
+if __name__ == '__main__':
+    main()
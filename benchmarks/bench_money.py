@@ -0,0 +1,87 @@
+# bench_money.py
+# Time SQL aggregation over a large expense ledger stored as integer cents against a float copy of it.
+#
+# Usage: python benchmarks/bench_money.py [expenses] [users]
+
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from sqlalchemy import text  # noqa: E402
+from budget_app import create_app, db  # noqa: E402
+from budget_app.models import User, Expense  # noqa: E402
+from budget_app.services.rollups import compute_rollups  # noqa: E402
+
+CATEGORIES = ('Food', 'Rent', 'Travel', 'Coffee', 'Utilities', 'Other')
+REPEAT = 5
+CHUNK = 10000
+
+
+def _timed(run):
+    run()
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        result = run()
+    return (time.perf_counter() - started) / REPEAT, result
+
+
+def main():
+    expenses = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rng = random.Random(expenses)
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(User.__table__.insert(), [
+            {'username': f'bench{index}', 'email': f'bench{index}@example.com', 'password': 'x'}
+            for index in range(users)
+        ])
+        for start in range(0, expenses, CHUNK):
+            db.session.execute(Expense.__table__.insert(), [
+                {
+                    'amount': rng.randint(1, 50000) / 100, 'category': rng.choice(CATEGORIES),
+                    'date': datetime(2023, 1, 1) + timedelta(days=rng.randint(0, 729)),
+                    'currency_code': 'USD', 'user_id': rng.randint(1, users),
+                }
+                for _ in range(min(CHUNK, expenses - start))
+            ])
+        # Two unindexed copies with identical layouts, so only the storage type differs:
+        # integer cents as stored now, and REAL major units as stored before the migration.
+        for table, amount in (('cents_expense', 'amount'), ('float_expense', 'amount / 100.0')):
+            db.session.execute(text(
+                f'CREATE TABLE {table} AS SELECT id, {amount} AS amount, category, date, user_id FROM expense'
+            ))
+        db.session.commit()
+
+        cents, (exact_total, exact_groups) = _timed(lambda: (
+            db.session.execute(text('SELECT SUM(amount) FROM cents_expense')).scalar(),
+            db.session.execute(text(
+                'SELECT user_id, category, SUM(amount) FROM cents_expense GROUP BY user_id, category'
+            )).all(),
+        ))
+        floats, (float_total, float_groups) = _timed(lambda: (
+            db.session.execute(text('SELECT SUM(amount) FROM float_expense')).scalar(),
+            [(user_id, category, round(total, 2)) for user_id, category, total in db.session.execute(text(
+                'SELECT user_id, category, SUM(amount) FROM float_expense GROUP BY user_id, category'
+            ))],
+        ))
+        rollups, _ = _timed(lambda: compute_rollups(list(range(1, users + 1))))
+        mismatched = sum(
+            1 for (_, _, exact), (_, _, rounded) in zip(exact_groups, float_groups) if exact != round(rounded * 100)
+        )
+
+        print(f'{expenses} expenses across {users} users')
+        print(f'  integer cents: {cents * 1000:.1f} ms (ledger total + per user/category sums)')
+        print(f'  float amounts: {floats * 1000:.1f} ms (same queries, rounded in Python)')
+        print(f'  compute_rollups: {rollups * 1000:.1f} ms')
+        print(f'  exact total {exact_total / 100:.2f}, float total {float_total!r} '
+              f'(drift {float_total - exact_total / 100:.2e}, {mismatched} group sums off by a cent)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# bench_recurring.py
+# Time a nightly `flask recurring run` over synthetic schedules spread across many users.
+#
+# Usage: python benchmarks/bench_recurring.py [schedules] [users]
+
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_recurring.db'))
+
+from budget_app import create_app, db  # noqa: E402
+from budget_app.models import User, RecurringTransaction  # noqa: E402
+from budget_app.services.recurring_expenses import run_recurring  # noqa: E402
+
+NOW = datetime(2024, 6, 1, 2, 0)
+INTERVALS = ('daily', 'weekly', 'monthly')
+CATEGORIES = ('Rent', 'Salary', 'Gym', 'Streaming', 'Insurance')
+
+
+def seed(schedules, users):
+    rng = random.Random(schedules)
+    db.session.execute(User.__table__.insert(), [
+        {'username': f'user{index}', 'email': f'user{index}@example.com', 'password': 'x'}
+        for index in range(users)
+    ])
+    rows = []
+    for _ in range(schedules):
+        interval = rng.choice(INTERVALS)
+        # Most schedules are due tonight; some missed a few periods, some are not due yet.
+        lag = rng.choice((0, 0, 0, 1, 2, -3))
+        period = {'daily': timedelta(days=1), 'weekly': timedelta(weeks=1), 'monthly': timedelta(days=30)}[interval]
+        rows.append({
+            'type': 'income' if rng.random() < 0.2 else 'expense',
+            'amount': round(rng.uniform(5, 2000), 2),
+            'category': rng.choice(CATEGORIES),
+            'interval': interval,
+            'next_date': NOW - timedelta(hours=1) - period * max(lag, 0) + timedelta(days=-lag if lag < 0 else 0),
+            'user_id': rng.randrange(1, users + 1),
+        })
+    db.session.execute(RecurringTransaction.__table__.insert(), rows)
+    db.session.commit()
+
+
+def main():
+    schedules = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed(schedules, users)
+        report = run_recurring(now=NOW)
+        print(f"{schedules} schedules over {users} users ({db.engine.dialect.name})")
+        print(f"  advanced {report['due']} schedules, {report['occurrences']} occurrences, {report['chunks']} chunks")
+        print(f"  {report['seconds']} s, {report['schedules_per_second']} schedules/s")
+        again = run_recurring(now=NOW)
+        print(f"  second run: {again['occurrences']} occurrences in {again['seconds']} s")
+
+
+if __name__ == '__main__':
+    main()
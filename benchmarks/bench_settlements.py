@@ -0,0 +1,83 @@
+# bench_settlements.py
+# Compare transfer counts and solve time of the settlement solver against largest-first matching
+# on synthetic groups of 10, 100 and 1,000 members.
+#
+# Usage: python benchmarks/bench_settlements.py [trials]
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from budget_app.services.settlements import minimize_transfers  # noqa: E402
+
+GROUP_SIZES = (10, 100, 1000)
+
+
+def synthetic_balances(members, seed):
+    # Trip-style balances: most members owe a few round amounts, one in ten paid and is owed the rest.
+    rng = random.Random(seed)
+    payers = max(1, members // 10)
+    debts = [-rng.choice((500, 1000, 1500, 2000, 2500)) * rng.randint(1, 4) for _ in range(members - payers)]
+    owed = -sum(debts)
+    credits = [owed // payers] * payers
+    credits[0] += owed - sum(credits)
+    values = debts + credits
+    rng.shuffle(values)
+    return {user_id: value for user_id, value in enumerate(values, start=1)}
+
+
+def round_balances(members, seed):
+    # Coarse balances in multiples of 5.00, where many small zero-sum subgroups exist.
+    rng = random.Random(seed)
+    values = [rng.choice((-1, 1)) * rng.randint(1, 6) * 500 for _ in range(members - 1)]
+    values.append(-sum(values))
+    return {user_id: value for user_id, value in enumerate(values, start=1)}
+
+
+SCENARIOS = (('trip', synthetic_balances), ('round', round_balances))
+
+
+def largest_first(balances):
+    # The matching _build_group_snapshot used before the solver.
+    creditors = sorted(([key, value] for key, value in balances.items() if value > 0), key=lambda item: -item[1])
+    debtors = sorted(([key, -value] for key, value in balances.items() if value < 0), key=lambda item: -item[1])
+    transfers = 0
+    creditor_idx = debtor_idx = 0
+    while creditor_idx < len(creditors) and debtor_idx < len(debtors):
+        amount = min(creditors[creditor_idx][1], debtors[debtor_idx][1])
+        transfers += 1
+        creditors[creditor_idx][1] -= amount
+        debtors[debtor_idx][1] -= amount
+        if creditors[creditor_idx][1] <= 0:
+            creditor_idx += 1
+        if debtors[debtor_idx][1] <= 0:
+            debtor_idx += 1
+    return transfers
+
+
+def main(trials):
+    print(f"{'scenario':>8} {'members':>8} {'largest-first':>14} {'solver':>8} {'solver ms':>10} {'deterministic':>14}")
+    for name, generate in SCENARIOS:
+        for members in GROUP_SIZES:
+            greedy_total = solver_total = 0
+            elapsed = 0.0
+            deterministic = True
+            for trial in range(trials):
+                balances = generate(members, seed=trial)
+                greedy_total += largest_first(balances)
+                started = time.perf_counter()
+                transfers = minimize_transfers(balances)
+                elapsed += time.perf_counter() - started
+                solver_total += len(transfers)
+                deterministic &= transfers == minimize_transfers(dict(reversed(list(balances.items()))))
+            print(
+                f"{name:>8} {members:>8} {greedy_total / trials:>14.1f} {solver_total / trials:>8.1f} "
+                f"{elapsed / trials * 1000:>10.2f} {str(deterministic):>14}"
+            )
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,63 @@
+# bench_startup.py
+# Time create_app() against an existing database with and without a current schema_version marker.
+#
+# Usage: python benchmarks/bench_startup.py [database_url] [repeat]
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+if len(sys.argv) > 1:
+    os.environ['DATABASE_URL'] = sys.argv[1]
+else:
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}")
+
+import budget_app  # noqa: E402
+from budget_app import create_app, db  # noqa: E402
+from budget_app.models import SchemaVersion  # noqa: E402
+
+
+def _forget_marker(app):
+    with app.app_context():
+        SchemaVersion.query.delete()
+        db.session.commit()
+
+
+def _time_schema_check(app, repeat, forget):
+    timings = []
+    for _ in range(repeat):
+        if forget:
+            _forget_marker(app)
+        with app.app_context():
+            db.engine.dispose()  # each start opens a fresh connection, as a new process would
+            started = time.perf_counter()
+            budget_app._ensure_schema()
+            timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def _time_create_app(app, repeat, forget):
+    timings = []
+    for _ in range(repeat):
+        if forget:
+            _forget_marker(app)
+        started = time.perf_counter()
+        create_app()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    app = create_app()
+    print(f"{os.environ['DATABASE_URL']} ({repeat} runs, best of)")
+    for label, forget in (('reflect + create_all (no marker)', True), ('marker read (schema current)', False)):
+        check = _time_schema_check(app, repeat, forget)
+        total = _time_create_app(app, repeat, forget)
+        print(f'  {label}: schema check {check * 1000:.2f} ms, create_app {total * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,12 @@
-from flask import Flask
+from flask import Flask, current_app
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
-from sqlalchemy import inspect, text
+from datetime import datetime
+from sqlalchemy import Float, event, func, inspect, text
+from sqlalchemy.exc import DBAPIError, IntegrityError
 
 db = SQLAlchemy()
 login_manager = LoginManager()
-migrate = Migrate()
 
 
 def _database_uri():
@@ -23,16 +23,99 @@ def _database_uri():
 
     return 'sqlite:///budget.db'
 
+def _engine_options(database_uri):
+    import os
+
+    # SQLite gets its pool from Flask-SQLAlchemy; its settings are pragmas, see _configure_sqlite().
+    if database_uri.startswith('sqlite'):
+        return {}
+
+    # Serverless instances are frozen between requests, so pooled connections go stale or
+    # pile up on the server; open one per request unless a pool is asked for.
+    pool = (os.environ.get('DB_POOL') or ('null' if os.environ.get('VERCEL') else 'queue')).lower()
+    if pool == 'null':
+        from sqlalchemy.pool import NullPool
+
+        return {'poolclass': NullPool}
+
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
+
+def _export_cache_dir(app):
+    import os
+
+    if os.environ.get('VERCEL'):
+        return '/tmp/budget-exports'
+    return os.path.join(app.instance_path, 'exports')
+
+def _category_model_path():
+    import os
+
+    if os.environ.get('VERCEL'):
+        return '/tmp/model.pkl'
+    return 'model.pkl'
+
+def _online_model_path():
+    import os
+
+    if os.environ.get('VERCEL'):
+        return '/tmp/online_model.pkl'
+    return 'online_model.pkl'
+
+def _migrations_enabled():
+    import os
+
+    # Nobody runs `flask db` inside a serverless function.
+    return not os.environ.get('VERCEL')
+
+def _category_model_warm_up():
+    import os
+
+    # Serverless cold starts should not pay for importing scikit-learn before the first request.
+    if os.environ.get('VERCEL'):
+        return 'lazy'
+    return 'startup'
+
 def create_app():
     app = Flask(__name__)
     app.config['SECRET_KEY'] = __import__('os').environ.get('SECRET_KEY') or 'your-secret-key-change-in-production'
     app.config['SQLALCHEMY_DATABASE_URI'] = _database_uri()
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLITE_BUSY_TIMEOUT'] = int(__import__('os').environ.get('SQLITE_BUSY_TIMEOUT', 15000))  # ms
+    app.config['SQLITE_MMAP_SIZE'] = int(__import__('os').environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
     app.config['UPLOAD_FOLDER'] = 'static/profile_pics'
+    app.config['LEDGER_PAGE_SIZE'] = int(__import__('os').environ.get('LEDGER_PAGE_SIZE', 50))
+    app.config['EXPORT_JOB_WORKERS'] = int(__import__('os').environ.get('EXPORT_JOB_WORKERS', 2))
+    app.config['EXPORT_CACHE_DIR'] = __import__('os').environ.get('EXPORT_CACHE_DIR') or _export_cache_dir(app)
+    app.config['ADMIN_USERNAMES'] = [
+        name.strip() for name in (__import__('os').environ.get('ADMIN_USERNAMES') or '').split(',') if name.strip()
+    ]
+    app.config['CATEGORY_MODEL_PATH'] = __import__('os').environ.get('CATEGORY_MODEL_PATH') or _category_model_path()
+    app.config['CATEGORY_MODEL_MODE'] = (__import__('os').environ.get('CATEGORY_MODEL_MODE') or 'batch').lower()
+    app.config['CATEGORY_MODEL_WARM_UP'] = (
+        __import__('os').environ.get('CATEGORY_MODEL_WARM_UP') or _category_model_warm_up()
+    ).lower()
+    app.config['ONLINE_MODEL_PATH'] = __import__('os').environ.get('ONLINE_MODEL_PATH') or _online_model_path()
+    app.config['ONLINE_MODEL_PERSIST_EVERY'] = int(__import__('os').environ.get('ONLINE_MODEL_PERSIST_EVERY', 50))
+    app.config['SETTLEMENT_EXACT_LIMIT'] = int(__import__('os').environ.get('SETTLEMENT_EXACT_LIMIT', 12))
+    app.config['SETTLEMENT_TIME_BUDGET'] = float(__import__('os').environ.get('SETTLEMENT_TIME_BUDGET', 0.05))
+    app.config['ENABLE_MIGRATIONS'] = (
+        __import__('os').environ.get('ENABLE_MIGRATIONS', str(_migrations_enabled())).lower() in ('1', 'true', 'yes')
+    )
 
     db.init_app(app)
     login_manager.init_app(app)
-    migrate.init_app(app, db)
+    if app.config['ENABLE_MIGRATIONS']:
+        # Flask-Migrate pulls in Alembic and Mako; only the `flask db` commands need them.
+        from flask_migrate import Migrate
+
+        Migrate(app, db)
 
     login_manager.login_view = 'main.login'
     login_manager.login_message_category = 'info'
@@ -46,39 +129,134 @@ def create_app():
     from .routes import main as main_blueprint
     app.register_blueprint(main_blueprint)
 
+    from .commands import register_commands
+    register_commands(app)
+
     # Ensure tables exist for fresh deployments where migrations haven't been run.
     with app.app_context():
-        db.create_all()
-        _ensure_runtime_columns()
+        _configure_sqlite(app)
+        _ensure_schema()
+
+    _warm_up_category_model(app)
 
     return app
 
 
-def _ensure_runtime_columns():
+def _warm_up_category_model(app):
+    from . import ml_utils
+
+    ml_utils.category_model.configure(app.config['CATEGORY_MODEL_PATH'])
+    # Lazy mode loads an existing artifact on the first prediction and never trains
+    # one, so requests fall back to keyword matching until a model is shipped.
+    if app.config['CATEGORY_MODEL_WARM_UP'] != 'lazy':
+        try:
+            ml_utils.category_model.warm_up()
+        except OSError:
+            app.logger.warning('Category model could not be trained or loaded; keyword matching will be used.')
+
+    if app.config['CATEGORY_MODEL_MODE'] != 'online':
+        ml_utils.disable_online_learning()
+        return
+    try:
+        ml_utils.enable_online_learning(
+            app.config['ONLINE_MODEL_PATH'],
+            persist_every=app.config['ONLINE_MODEL_PERSIST_EVERY'],
+        )
+    except Exception:
+        ml_utils.disable_online_learning()
+        app.logger.warning('Online category model could not be loaded; using the batch model.')
+
+
+def _configure_sqlite(app):
+    """
+    Apply connection pragmas to every new SQLite connection.
+
+    WAL lets readers proceed while a write is in progress, busy_timeout makes a
+    writer wait for the lock instead of failing with "database is locked",
+    synchronous=NORMAL drops the fsync on each commit (WAL stays consistent
+    across crashes), and mmap_size serves reads from memory-mapped pages.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return
+    pragmas = (
+        ('journal_mode', 'WAL'),
+        ('busy_timeout', app.config['SQLITE_BUSY_TIMEOUT']),
+        ('synchronous', 'NORMAL'),
+        ('mmap_size', app.config['SQLITE_MMAP_SIZE']),
+    )
+
+    @event.listens_for(db.engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+
+def _ensure_schema():
+    """
+    Create missing tables and check the schema, unless the schema_version
+    marker shows this schema version has already been verified.
+
+    The marker read is the only query on a normal start; reflection and
+    db.create_all() run once after each schema change. Columns added to
+    existing tables come from Alembic migrations ("flask db upgrade"); an
+    out-of-date database is reported and checked again on the next start.
+    """
+    from .models import SCHEMA_VERSION, SchemaVersion
+
+    if _recorded_schema_version() == SCHEMA_VERSION:
+        return
+
+    db.create_all()
+    problems = _schema_problems()
+    if problems:
+        current_app.logger.warning(
+            'Database schema is out of date (%s); run "flask db upgrade".', '; '.join(problems)
+        )
+        return
+    try:
+        db.session.merge(SchemaVersion(id=1, version=SCHEMA_VERSION, checked_at=datetime.utcnow()))
+        db.session.commit()
+    except IntegrityError:
+        # Another process starting at the same time recorded it first.
+        db.session.rollback()
+
+
+def _recorded_schema_version():
+    try:
+        return db.session.execute(text('SELECT version FROM schema_version WHERE id = 1')).scalar()
+    except DBAPIError:
+        # The marker table does not exist yet.
+        db.session.rollback()
+        return None
+
+
+def _schema_problems():
+    from .models import Money
+
     inspector = inspect(db.engine)
-    required_columns = {
-        'user': {
-            'is_guest': "ALTER TABLE \"user\" ADD COLUMN is_guest BOOLEAN DEFAULT FALSE NOT NULL",
-            'invite_token': "ALTER TABLE \"user\" ADD COLUMN invite_token VARCHAR(64)"
-        },
-        'income': {
-            'currency_code': "ALTER TABLE income ADD COLUMN currency_code VARCHAR(3) DEFAULT 'USD' NOT NULL"
-        },
-        'expense': {
-            'currency_code': "ALTER TABLE expense ADD COLUMN currency_code VARCHAR(3) DEFAULT 'USD' NOT NULL"
-        },
-        'shared_expense': {
-            'currency_code': "ALTER TABLE shared_expense ADD COLUMN currency_code VARCHAR(3) DEFAULT 'USD' NOT NULL",
-            'split_method': "ALTER TABLE shared_expense ADD COLUMN split_method VARCHAR(20) DEFAULT 'equal' NOT NULL"
-        },
-    }
+    problems = []
+    for table in db.metadata.sorted_tables:
+        stored_types = {column['name']: column['type'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in stored_types:
+                problems.append(f'{table.name}.{column.name} is missing')
+            elif isinstance(column.type, Money) and isinstance(stored_types[column.name], Float):
+                problems.append(f'{table.name}.{column.name} still stores money as floats')
+    return problems or _rollup_problems()
+
 
-    for table_name, columns in required_columns.items():
-        if not inspector.has_table(table_name):
-            continue
+def _rollup_problems():
+    from .models import Expense, Income, MonthlyRollup
 
-        existing_columns = {column['name'] for column in inspector.get_columns(table_name)}
-        for column_name, statement in columns.items():
-            if column_name not in existing_columns:
-                db.session.execute(text(statement))
-                db.session.commit()
+    # Rollups count every entry, so a table created on an existing database shows up here until it is backfilled.
+    problems = []
+    for kind, model in (('income', Income), ('expense', Expense)):
+        entries = db.session.query(func.count(model.id)).scalar()
+        tracked = db.session.query(func.coalesce(func.sum(MonthlyRollup.entry_count), 0)).filter(
+            MonthlyRollup.kind == kind
+        ).scalar()
+        if entries != tracked:
+            problems.append(f'monthly_rollup tracks {tracked} of {entries} {kind} rows')
+    return problems
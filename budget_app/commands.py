@@ -0,0 +1,230 @@
+# commands.py
+# Flask CLI commands for maintenance tasks (run with `flask --app run <group> <command>`)
+
+import click
+from flask.cli import AppGroup
+
+rollups_cli = AppGroup('rollups', help='Maintain the per-user monthly rollup table.')
+
+
+def _print_rollup_report(report, repaired):
+    click.echo(f"Users scanned: {report['users']}")
+    click.echo(f"Users with drift: {report['drifted_users']}")
+    click.echo(f"Drifted rollup keys: {report['drifted_keys']}")
+    if repaired and report['drifted_users']:
+        click.echo('Drifted rollups were rebuilt from the base tables.')
+
+
+@rollups_cli.command('verify')
+@click.option('--chunk-size', default=500, show_default=True, help='Users recomputed per batch.')
+def verify_rollups(chunk_size):
+    """Report rollup drift without changing anything."""
+    from .services.rollups import rebuild_rollups
+
+    report = rebuild_rollups(chunk_size=chunk_size, repair=False)
+    _print_rollup_report(report, repaired=False)
+    if report['drifted_keys']:
+        raise SystemExit(1)
+
+
+@rollups_cli.command('rebuild')
+@click.option('--chunk-size', default=500, show_default=True, help='Users recomputed per batch.')
+@click.option('--user-id', 'user_ids', type=int, multiple=True, help='Only rebuild these users.')
+def rebuild_rollups_command(chunk_size, user_ids):
+    """Recompute rollups from Income/Expense and replace drifted rows."""
+    from .services.rollups import rebuild_rollups
+
+    report = rebuild_rollups(chunk_size=chunk_size, repair=True, user_ids=list(user_ids) or None)
+    _print_rollup_report(report, repaired=True)
+
+
+expenses_cli = AppGroup('expenses', help='Bulk maintenance for expense records.')
+
+
+@expenses_cli.command('recategorize')
+@click.option('--user-id', type=int, default=None, help='Only process this user (default: all users).')
+@click.option('--chunk-size', default=5000, show_default=True, help='Expenses predicted per batch.')
+@click.option('--only-category', 'only_categories', multiple=True, help='Only reconsider expenses in this category (default: Other).')
+@click.option('--all-categories', is_flag=True, help='Reconsider every expense, overwriting categories users chose.')
+@click.option('--apply', 'apply_changes', is_flag=True, help='Write the changes (default: only show them).')
+def recategorize_command(user_id, chunk_size, only_categories, all_categories, apply_changes):
+    """Re-run the category model over existing expenses in bulk."""
+    from .services.recategorize import DEFAULT_CATEGORIES, recategorize_expenses
+
+    dry_run = not apply_changes
+    report = recategorize_expenses(
+        user_id=user_id, chunk_size=chunk_size, dry_run=dry_run,
+        only_categories=None if all_categories else list(only_categories or DEFAULT_CATEGORIES),
+    )
+    for expense_id, old, new in report['diff']:
+        click.echo(f"  expense {expense_id}: {old} -> {new}")
+    verb = 'Would change' if dry_run else 'Changed'
+    click.echo(f"Scanned {report['scanned']} expenses in {report['chunks']} chunks; {verb.lower()} {report['changed']}.")
+    click.echo(f"Throughput: {report['rows_per_second']} rows/s ({report['seconds']} s)")
+
+
+groups_cli = AppGroup('groups', help='Maintain shared-group data.')
+
+
+@groups_cli.command('check-balances')
+@click.option('--repair', is_flag=True, help='Rewrite the ledger of groups with drift.')
+@click.option('--chunk-size', default=500, show_default=True, help='Groups recomputed per batch.')
+@click.option('--group-id', 'group_ids', type=int, multiple=True, help='Only check these groups.')
+def check_balances_command(repair, chunk_size, group_ids):
+    """Recompute group balances from the raw shares and report (or repair) ledger drift."""
+    from .services.group_balances import check_group_balances
+
+    report = check_group_balances(chunk_size=chunk_size, repair=repair, group_ids=list(group_ids) or None)
+    click.echo(f"Groups scanned: {report['groups']}")
+    click.echo(f"Groups with drift: {report['drifted_groups']}")
+    click.echo(f"Drifted balance keys: {report['drifted_keys']}")
+    if repair and report['drifted_groups']:
+        click.echo('Drifted balances were rebuilt from the raw shares.')
+    elif report['drifted_keys']:
+        raise SystemExit(1)
+
+
+@groups_cli.command('import-expenses')
+@click.argument('group_id', type=int)
+@click.argument('csv_file', type=click.File('rb'))
+@click.option('--currency', default='USD', show_default=True, help='Currency for rows without one.')
+@click.option('--dry-run', is_flag=True, help='Validate the file without importing.')
+def import_expenses_command(group_id, csv_file, currency, dry_run):
+    """Bulk import shared expenses for a group from a CSV file."""
+    from .models import Group
+    from .services.group_imports import import_shared_expenses
+    from . import db
+
+    group = db.session.get(Group, group_id)
+    if group is None:
+        raise click.ClickException(f'Group {group_id} does not exist.')
+
+    report = import_shared_expenses(group, csv_file.read(), default_currency=currency.upper(), dry_run=dry_run)
+    for line, message in report['errors']:
+        click.echo(f"  line {line}: {message}")
+    if report['errors']:
+        click.echo(f"{len(report['errors'])} invalid rows; nothing was imported.")
+        raise SystemExit(1)
+    if dry_run:
+        click.echo(f"{report['rows']} rows are valid.")
+    else:
+        click.echo(f"Imported {report['imported']} shared expenses into group {group_id}.")
+
+
+recurring_cli = AppGroup('recurring', help='Generate recurring incomes and expenses.')
+
+
+@recurring_cli.command('run')
+@click.option('--chunk-size', default=5000, show_default=True, help='Recurring entries per transaction.')
+@click.option('--user-id', type=int, default=None, help='Only process this user (default: all users).')
+@click.option('--now', type=click.DateTime(), default=None, help='Treat this time as now (default: current UTC time).')
+@click.option('--max-occurrences', default=1000, show_default=True, help='Missed periods caught up per entry per run.')
+@click.option('--owner', default=None, help='Worker name recorded on leased entries (default: host:pid).')
+@click.option('--lease-seconds', default=300, show_default=True, help='How long a claimed chunk stays reserved.')
+def run_recurring_command(chunk_size, user_id, now, max_occurrences, owner, lease_seconds):
+    """Emit every due (and missed) occurrence of the recurring entries of all users.
+
+    Several workers may run this at once; each leases its own chunks.
+    """
+    from .services.recurring_expenses import run_recurring
+
+    report = run_recurring(
+        now=now, chunk_size=chunk_size, user_id=user_id, max_occurrences=max_occurrences,
+        owner=owner, lease_seconds=lease_seconds,
+    )
+    click.echo(
+        f"Advanced {report['due']} schedules in {report['chunks']} chunks; "
+        f"created {report['incomes']} incomes and {report['expenses']} expenses."
+    )
+    if report['skipped']:
+        click.echo(f"Skipped {report['skipped']} schedules with an unknown interval.")
+    if report['lost_leases']:
+        click.echo(f"Rolled back {report['lost_leases']} chunks whose lease expired; another worker posted them.")
+    click.echo(f"Throughput: {report['schedules_per_second']} schedules/s ({report['seconds']} s)")
+
+
+rates_cli = AppGroup('rates', help='Manage exchange rates used for converted totals.')
+
+
+@rates_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+def import_rates_command(path):
+    """Import exchange rates from a local CSV (date,base,quote,rate) or JSON file."""
+    from .services.exchange_rates import import_rates, load_rates_file
+
+    try:
+        report = import_rates(load_rates_file(path))
+    except (KeyError, ValueError) as exc:
+        raise click.ClickException(f'Invalid rates file: {exc}')
+    click.echo(f"Imported {report['written']} exchange rates.")
+    _echo_skipped_rates(report)
+
+
+@rates_cli.command('fetch')
+@click.option('--base', default='USD', show_default=True, help='Currency the rates are quoted against.')
+@click.option('--date', 'day', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Rate date (default: latest).')
+def fetch_rates_command(base, day):
+    """Download one day of rates with forex-python and store them (needs network access)."""
+    from datetime import datetime
+    from .services.exchange_rates import import_rates
+
+    try:
+        from forex_python.converter import CurrencyRates
+    except ImportError:
+        raise click.ClickException('forex-python is not installed; import a rates file instead.')
+
+    base = base.upper()
+    day = day.date() if day else datetime.utcnow().date()
+    try:
+        rates = CurrencyRates().get_rates(base, day)
+    except Exception as exc:
+        raise click.ClickException(f'Could not fetch rates: {exc}')
+    report = import_rates(
+        {'date': day, 'base': base, 'quote': quote, 'rate': rate}
+        for quote, rate in rates.items() if quote != base
+    )
+    click.echo(f"Stored {report['written']} {base} rates for {day.isoformat()}.")
+    _echo_skipped_rates(report)
+
+
+def _echo_skipped_rates(report):
+    if report['skipped']:
+        click.echo(f"Skipped {report['skipped']} rates in unsupported currencies: {', '.join(report['unsupported'])}.")
+
+
+@click.command('import-time')
+@click.option('--top', default=10, show_default=True, help='Slowest top-level packages to list.')
+@click.option('--time-budget', type=float, default=None, help='Seconds allowed (default: IMPORT_TIME_BUDGET or 1.5).')
+@click.option('--module-budget', type=int, default=None, help='Modules allowed (default: IMPORT_MODULE_BUDGET or 500).')
+def import_time_command(top, time_budget, module_budget):
+    """Report what importing the web process costs, and exit 1 when it is over budget."""
+    from .services.import_profile import (
+        IMPORT_MODULE_BUDGET, IMPORT_TIME_BUDGET, WEB_MODULES, budget_problems, profile_imports
+    )
+
+    time_budget = IMPORT_TIME_BUDGET if time_budget is None else time_budget
+    module_budget = IMPORT_MODULE_BUDGET if module_budget is None else module_budget
+    profile = profile_imports()
+    click.echo(f"Imported {', '.join(WEB_MODULES)} in {profile['seconds'] * 1000:.1f} ms "
+               f"({len(profile['modules'])} modules; budget {time_budget * 1000:.0f} ms / {module_budget} modules)")
+    for package, seconds, count in profile['packages'][:top]:
+        click.echo(f"  {package:<24} {seconds * 1000:8.1f} ms  {count:4d} modules")
+    click.echo(f"Heavy dependencies loaded: {', '.join(profile['heavy']) or 'none'}")
+
+    problems = budget_problems(profile, time_budget, module_budget)
+    for problem in problems:
+        click.echo(f'Over budget: {problem}')
+    if problems:
+        raise SystemExit(1)
+
+
+def register_commands(app):
+    """
+    Attach the maintenance command groups to the Flask CLI.
+    """
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(expenses_cli)
+    app.cli.add_command(groups_cli)
+    app.cli.add_command(recurring_cli)
+    app.cli.add_command(rates_cli)
+    app.cli.add_command(import_time_command)
@@ -157,13 +157,31 @@ class ExpenseForm(FlaskForm):
     submit = SubmitField('Add Expense')
 
 
+# -------------------- Category Rule Form --------------------
+class CategoryRuleForm(FlaskForm):
+    """
+    Form for adding a keyword or merchant rule, e.g. "AMZN" -> Shopping.
+    """
+    # Text to look for in expense descriptions (case-insensitive)
+    pattern = StringField('Description contains', validators=[DataRequired(), Length(min=2, max=100)])
+
+    # Category assigned when the pattern matches
+    category = StringField('Category', validators=[DataRequired(), Length(max=100)])
+
+    # Global rules apply to every user; only admins may create them
+    is_global = BooleanField('Apply to all users')
+
+    # Submit button for the form
+    submit = SubmitField('Save Rule')
+
+
 # -------------------- Export Form --------------------
 class ExportForm(FlaskForm):
     """
-    Form to select export format (CSV or PDF) and date range.
+    Form to select export format (CSV, NDJSON or PDF) and date range.
     """
-    # Export format field (required, options: CSV or PDF)
-    export_format = SelectField('Export Format', choices=[('csv', 'CSV'), ('pdf', 'PDF')], validators=[DataRequired()])
+    # Export format field (required, options: CSV, NDJSON or PDF)
+    export_format = SelectField('Export Format', choices=[('csv', 'CSV'), ('ndjson', 'NDJSON'), ('pdf', 'PDF')], validators=[DataRequired()])
 
     # Start date field (required)
     start_date = DateField('Start Date', format='%Y-%m-%d', validators=[DataRequired()])
@@ -235,3 +253,19 @@ class AddSharedExpenseForm(FlaskForm):
     # Submit button for the form
     submit = SubmitField('Add Expense')
 
+
+class ImportSharedExpensesForm(FlaskForm):
+    """
+    Form to bulk import shared expenses into a group from a CSV file or pasted CSV text.
+    """
+    # CSV upload (optional if text is pasted instead)
+    csv_file = FileField('CSV File', validators=[Optional(), FileAllowed(['csv', 'txt'], 'CSV files only!')])
+
+    # Pasted CSV text, including the header row
+    csv_text = TextAreaField('Or paste CSV', validators=[Optional()])
+
+    # Validate without importing
+    dry_run = BooleanField('Only check the file')
+
+    # Submit button for the form
+    submit = SubmitField('Import Expenses')
@@ -0,0 +1,252 @@
+# ml_online.py
+# Incremental category learning from user corrections (hashing vectorizer + partial_fit)
+
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.naive_bayes import MultinomialNB
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves from several workers are not serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# partial_fit needs every label up front; corrections to other labels are ignored.
+KNOWN_CATEGORIES = (
+    'Entertainment', 'Food', 'Health', 'Income', 'Other', 'Shopping', 'Transport', 'Utilities',
+)
+N_FEATURES = 2 ** 16
+ALPHA = 1.0
+
+
+class OnlineCategoryModel:
+    """
+    A global Multinomial Naive Bayes model updated one correction at a time,
+    plus small per-user count deltas for personalization.
+
+    Every correction is folded into the global model with ``partial_fit`` and
+    also recorded in the correcting user's delta. Deltas are sparse
+    ``(class, feature) -> count`` maps kept in an LRU of at most ``max_users``
+    users with at most ``max_features_per_user`` entries each, so memory stays
+    bounded. Because the global model already contains the user's corrections,
+    they effectively count twice when that user is predicted for.
+
+    The model and deltas are pickled to ``path`` every ``persist_every``
+    corrections or ``persist_interval`` seconds, whichever comes first, so
+    learning never needs a full retrain. Saving runs on a background thread,
+    never inside the request that made the correction.
+
+    Every worker process holds its own copy and saves to the same ``path``.
+    A save first merges the saved artifact: the global counts other workers
+    added are kept and this process adds only what it learned since its last
+    load or save. Per-user deltas are not summed; a user's saved delta is
+    replaced by this process's copy when it corrected for that user since.
+    """
+
+    def __init__(self, path, max_users=1000, max_features_per_user=2000,
+                 persist_every=50, persist_interval=300.0):
+        self.path = os.path.abspath(path)
+        self.max_users = max_users
+        self.max_features_per_user = max_features_per_user
+        self.persist_every = persist_every
+        self.persist_interval = persist_interval
+        self.vectorizer = HashingVectorizer(n_features=N_FEATURES, alternate_sign=False, norm=None)
+        self.classes = np.array(KNOWN_CATEGORIES)
+        self._class_index = {name: index for index, name in enumerate(KNOWN_CATEGORIES)}
+        self.model = None
+        self.deltas = OrderedDict()  # user_id -> {'classes': np.ndarray, 'features': OrderedDict}
+        self._pending_updates = 0
+        self._last_persist = time.monotonic()
+        self._version = None  # version of the artifact last loaded or saved
+        self._base_counts = None  # (class_count_, feature_count_) at that point
+        self._touched_users = set()
+        self._persist_thread = None
+        self._lock = threading.Lock()
+
+    def load_or_seed(self, seed_data):
+        """
+        Restore the persisted model, or seed a new one from (description, category) pairs.
+        """
+        with self._lock:
+            artifact = self._read_artifact()
+            if artifact is not None:
+                self.model = artifact['model']
+                self.deltas = OrderedDict(artifact.get('deltas', {}))
+                self._version = artifact.get('version')
+            else:
+                self.model = MultinomialNB(alpha=ALPHA)
+                texts = [text for text, label in seed_data if label in self._class_index]
+                labels = [label for _, label in seed_data if label in self._class_index]
+                self.model.partial_fit(self.vectorizer.transform(texts), labels, classes=self.classes)
+            self._base_counts = (self.model.class_count_.copy(), self.model.feature_count_.copy())
+
+    def learn(self, user_id, description, category):
+        """
+        Fold one user correction into the global model and the user's delta.
+
+        Returns:
+            bool: False when the category is not one the model can learn.
+        """
+        class_index = self._class_index.get(category)
+        if class_index is None or not description or self.model is None:
+            return False
+
+        X = self.vectorizer.transform([description])
+        with self._lock:
+            self.model.partial_fit(X, [category])
+            if user_id is not None:
+                self._record_delta(user_id, class_index, X)
+                self._touched_users.add(user_id)
+            self._pending_updates += 1
+        self.maybe_persist()
+        return True
+
+    def predict(self, description, user_id=None):
+        """
+        Predict a category, including the user's personal delta when one exists.
+        """
+        X = self.vectorizer.transform([description])
+        with self._lock:
+            delta = self.deltas.get(user_id) if user_id is not None else None
+            if delta is None:
+                return str(self.model.predict(X)[0])
+            self.deltas.move_to_end(user_id)
+            return str(self.classes[np.argmax(self._joint_log_likelihood(X, delta))])
+
+    def maybe_persist(self):
+        """
+        Start a background save if enough corrections or time have accumulated since the last one.
+        """
+        due = (
+            self._pending_updates >= self.persist_every
+            or (self._pending_updates and time.monotonic() - self._last_persist >= self.persist_interval)
+        )
+        if not due:
+            return
+        with self._lock:
+            if self._persist_thread is not None and self._persist_thread.is_alive():
+                return
+            self._persist_thread = threading.Thread(
+                target=self._persist_in_background, name='online-model-persist', daemon=True
+            )
+            self._persist_thread.start()
+
+    def wait_for_persist(self, timeout=None):
+        """
+        Block until a background save started by maybe_persist() has finished.
+        """
+        thread = self._persist_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def persist(self):
+        """
+        Merge this process's corrections into the saved artifact and write it atomically.
+        """
+        with _file_lock(self.path):
+            saved = self._read_artifact()
+            with self._lock:
+                if saved is not None and saved.get('version') != self._version:
+                    self._merge(saved)
+                version = str(time.time_ns())
+                data = pickle.dumps({'version': version, 'model': self.model, 'deltas': dict(self.deltas)})
+                self._version = version
+                self._base_counts = (self.model.class_count_.copy(), self.model.feature_count_.copy())
+                self._touched_users = set()
+                self._pending_updates = 0
+                self._last_persist = time.monotonic()
+
+            temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+
+    def _persist_in_background(self):
+        try:
+            self.persist()
+        except Exception:  # retried after the next correction
+            logger.exception('Online category model could not be saved to %s.', self.path)
+
+    def _read_artifact(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'rb') as f:
+            return pickle.load(f)
+
+    def _merge(self, saved):
+        # Counts are additive: keep what the saved model has and add what this
+        # process learned since its base, then refresh the derived log probabilities.
+        model, saved_model = self.model, saved['model']
+        base_classes, base_features = self._base_counts
+        model.class_count_ = saved_model.class_count_ + (model.class_count_ - base_classes)
+        model.feature_count_ = saved_model.feature_count_ + (model.feature_count_ - base_features)
+        model._update_feature_log_prob(model.alpha)
+        model._update_class_log_prior()
+
+        deltas = OrderedDict(saved.get('deltas', {}))
+        for user_id in self.deltas:
+            if user_id in self._touched_users:
+                deltas.pop(user_id, None)
+                deltas[user_id] = self.deltas[user_id]
+        while len(deltas) > self.max_users:
+            deltas.popitem(last=False)
+        self.deltas = deltas
+
+    def _record_delta(self, user_id, class_index, X):
+        delta = self.deltas.get(user_id)
+        if delta is None:
+            delta = {'classes': np.zeros(len(self.classes)), 'features': OrderedDict()}
+            self.deltas[user_id] = delta
+            while len(self.deltas) > self.max_users:
+                self.deltas.popitem(last=False)
+        self.deltas.move_to_end(user_id)
+
+        delta['classes'][class_index] += 1
+        features = delta['features']
+        for feature_index, count in zip(X.indices, X.data):
+            key = (class_index, int(feature_index))
+            features[key] = features.get(key, 0.0) + float(count)
+            features.move_to_end(key)
+        while len(features) > self.max_features_per_user:
+            features.popitem(last=False)
+
+    def _joint_log_likelihood(self, X, delta):
+        model = self.model
+        indices = X.indices
+        counts = X.data
+
+        feature_counts = model.feature_count_[:, indices].copy()
+        class_totals = model.feature_count_.sum(axis=1)
+        for (class_index, feature_index), value in delta['features'].items():
+            class_totals[class_index] += value
+        for position, feature_index in enumerate(indices):
+            for class_index in range(len(self.classes)):
+                feature_counts[class_index, position] += delta['features'].get((class_index, int(feature_index)), 0.0)
+
+        class_counts = model.class_count_ + delta['classes']
+        log_prior = np.log(class_counts + 1e-9) - np.log(class_counts.sum() + 1e-9 * len(class_counts))
+        log_prob = np.log(feature_counts + model.alpha) - np.log(class_totals + model.alpha * N_FEATURES)[:, None]
+        return log_prior + log_prob @ counts
+
+
+@contextmanager
+def _file_lock(path):
+    # Serializes read-merge-write across worker processes sharing the artifact.
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
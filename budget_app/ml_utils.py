@@ -1,8 +1,11 @@
 # ml_utils.py
 
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.naive_bayes import MultinomialNB
+import os
 import pickle
+import threading
+import time
+
+DEFAULT_MODEL_PATH = "model.pkl"
 
 # Pre-trained categories for demonstration
 sample_data = [
@@ -15,60 +18,220 @@ sample_data = [
 ]
 
 # Train the classifier (can be expanded later or loaded from a file)
-def train_model():
+def train_model(path=None):
     """
     Train a Naive Bayes classifier on sample keyword-category data.
     Saves the model and vectorizer to disk.
+
+    The artifact is written to a temporary file and renamed into place, so a
+    process reloading it never sees a half-written pickle.
+
+    Parameters:
+        path (str): Artifact location; defaults to the holder's configured path.
+
+    Returns:
+        str: Version identifier stored in the artifact.
     """
+    # scikit-learn takes most of a second to import; only training and unpickling need it.
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.naive_bayes import MultinomialNB
+
+    path = path or category_model.path
     texts, labels = zip(*sample_data)
     vectorizer = CountVectorizer()
     X = vectorizer.fit_transform(texts)
-    
+
     model = MultinomialNB()
     model.fit(X, labels)
 
     # Save model and vectorizer
-    with open("model.pkl", "wb") as f:
-        pickle.dump((model, vectorizer), f)
+    version = str(time.time_ns())
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        pickle.dump({"version": version, "model": model, "vectorizer": vectorizer}, f)
+    os.replace(temp_path, path)
+    return version
+
+
+class CategoryModelHolder:
+    """
+    Process-wide cache of the category model.
+
+    The artifact is unpickled once and shared by every request. At most once
+    per ``check_interval`` seconds the file is stat'ed; when its mtime or size
+    changes it is reloaded, and the new model is swapped in only if its version
+    differs. Nothing here ever trains, so prediction never blocks on training.
+    """
+
+    def __init__(self, path=DEFAULT_MODEL_PATH, check_interval=5.0):
+        self.path = os.path.abspath(path)
+        self.check_interval = check_interval
+        self._state = None  # (model, vectorizer, version, file signature)
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def configure(self, path=None, check_interval=None):
+        """
+        Point the holder at a different artifact and drop the cached model.
+        """
+        with self._lock:
+            if path:
+                self.path = os.path.abspath(path)
+            if check_interval is not None:
+                self.check_interval = check_interval
+            self._state = None
+            self._next_check = 0.0
+
+    def warm_up(self, train_if_missing=True):
+        """
+        Load the artifact ahead of the first request, training it first if it is missing.
+
+        Returns:
+            bool: True when a model is loaded.
+        """
+        if train_if_missing and not os.path.exists(self.path):
+            train_model(self.path)
+        return self.get() is not None
+
+    @property
+    def version(self):
+        state = self._state
+        return state[2] if state else None
+
+    def get(self):
+        """
+        Return the cached (model, vectorizer) pair, reloading it if the artifact changed.
+
+        Returns:
+            tuple | None: (model, vectorizer), or None if no artifact can be loaded.
+        """
+        state = self._state
+        if state is not None and time.monotonic() < self._next_check:
+            return state[0], state[1]
+
+        with self._lock:
+            state = self._state
+            self._next_check = time.monotonic() + self.check_interval
+            signature = self._signature()
+            if signature is None:
+                return (state[0], state[1]) if state else None
+            if state is None or state[3] != signature:
+                loaded = self._load(signature)
+                if loaded is not None and (state is None or loaded[2] != state[2]):
+                    self._state = state = loaded
+                elif state is not None:
+                    self._state = state = state[:3] + (signature,)
+            return (state[0], state[1]) if state else None
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, signature):
+        try:
+            with open(self.path, "rb") as f:
+                artifact = pickle.load(f)
+        except Exception:
+            return None
+        if isinstance(artifact, dict):
+            return artifact["model"], artifact["vectorizer"], artifact.get("version"), signature
+        # Artifacts written before versioning were a bare (model, vectorizer) tuple.
+        model, vectorizer = artifact
+        return model, vectorizer, f"legacy-{signature[0]}", signature
+
+
+category_model = CategoryModelHolder(os.environ.get("CATEGORY_MODEL_PATH", DEFAULT_MODEL_PATH))
+
+# OnlineCategoryModel used when CATEGORY_MODEL_MODE is "online"; None otherwise.
+online_model = None
+
+
+def enable_online_learning(path, **options):
+    """
+    Switch prediction to the incrementally trained model stored at ``path``.
+
+    The persisted model is restored if it exists; otherwise a new one is
+    seeded from ``sample_data``.
+
+    Parameters:
+        path (str): Artifact location for the online model.
+        **options: Passed through to OnlineCategoryModel.
+
+    Returns:
+        OnlineCategoryModel: The active online model.
+    """
+    global online_model
+    from .ml_online import OnlineCategoryModel
+
+    model = OnlineCategoryModel(path, **options)
+    model.load_or_seed(sample_data)
+    online_model = model
+    return model
+
+
+def disable_online_learning():
+    """
+    Go back to the batch-trained model only.
+    """
+    global online_model
+    online_model = None
+
+
+def learn_correction(user_id, description, category):
+    """
+    Feed a user's category correction to the online model, if one is enabled.
+
+    Returns:
+        bool: True when the correction was learned.
+    """
+    model = online_model
+    if model is None:
+        return False
+    return model.learn(user_id, description, category)
+
 
 # Predict category based on description
-def predict_category(description):
+def predict_category(description, user_id=None):
     """
     Predict the category of an expense using the trained model.
 
+    User and global category rules are checked first; the built-in keyword
+    rules are only used when no model is available.
+
     Parameters:
         description (str): Expense description (e.g., "Bought burger")
+        user_id (int): Owner of the expense; selects personal rules and online-model corrections.
 
     Returns:
         str: Predicted category or 'Other' if model not found
     """
-    import os
-    # Train model if it doesn't exist
-    if not os.path.exists("model.pkl"):
-        train_model()
-    
-    try:
-        # Load model and vectorizer
-        with open("model.pkl", "rb") as f:
-            model, vectorizer = pickle.load(f)
-        
-        X = vectorizer.transform([description])
-        return model.predict(X)[0]
-    except (FileNotFoundError, Exception) as e:
-        # Fallback to simple keyword matching if ML fails
-        description_lower = description.lower()
-        if any(word in description_lower for word in ['food', 'restaurant', 'pizza', 'burger', 'meal', 'grocery']):
-            return "Food"
-        elif any(word in description_lower for word in ['uber', 'taxi', 'transport', 'bus', 'train', 'gas']):
-            return "Transport"
-        elif any(word in description_lower for word in ['electric', 'water', 'utility', 'bill', 'internet']):
-            return "Utilities"
-        elif any(word in description_lower for word in ['movie', 'entertainment', 'game', 'concert']):
-            return "Entertainment"
-        elif any(word in description_lower for word in ['medicine', 'doctor', 'health', 'pharmacy']):
-            return "Health"
-        else:
-            return "Other"
+    from .services.category_rules import default_matcher, match_rules
+
+    ruled = match_rules(description, user_id)
+    if ruled:
+        return ruled
+
+    model = online_model
+    if model is not None:
+        try:
+            return model.predict(description, user_id)
+        except Exception:
+            pass
+
+    loaded = category_model.get()
+    if loaded is not None:
+        model, vectorizer = loaded
+        try:
+            X = vectorizer.transform([description])
+            return model.predict(X)[0]
+        except Exception:
+            pass
+
+    # Fallback to simple keyword matching if ML fails
+    return default_matcher.match(description) or "Other"
 
 # Only train when run directly
 if __name__ == "__main__":
@@ -1,6 +1,79 @@
 from . import db
 from flask_login import UserMixin
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+import math
+from sqlalchemy import type_coerce
+from sqlalchemy.sql import operators
+
+# --------------------------- MONEY TYPE ---------------------------
+
+MINOR_UNITS = 100  # every supported currency has two decimal places
+
+
+def to_minor(amount):
+    """
+    Convert an amount in major units (12.5) to integer minor units (1250),
+    rounding half away from zero. None counts as 0.
+    """
+    if amount is None:
+        return 0
+    if isinstance(amount, Decimal):
+        return int((amount * MINOR_UNITS).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    scaled = float(amount) * MINOR_UNITS
+    # The small epsilon keeps values such as 10.005 (1000.4999... in binary) rounding up.
+    return int(math.copysign(math.floor(abs(scaled) + 0.5 + 1e-7), scaled))
+
+
+def from_minor(minor):
+    """
+    Convert integer minor units back to a float amount in major units.
+    """
+    return minor / MINOR_UNITS
+
+
+def minor_units(expression):
+    """
+    Read a Money column or aggregate as raw integer minor units, e.g.
+    ``func.sum(minor_units(Expense.amount))`` for an exact integer total.
+    """
+    return type_coerce(expression, db.BigInteger)
+
+
+class Money(db.TypeDecorator):
+    """
+    Currency amount stored as an integer number of minor units.
+
+    Python code reads and writes amounts in major units as before (12.5
+    means 12.50) while the column holds 1250, so SUM(), comparisons and
+    additions in SQL are exact integer arithmetic and values are rounded to
+    the cent once, on the way in. Sums and differences of Money expressions
+    stay Money; use minor_units() to read the integers themselves.
+    """
+    impl = db.BigInteger
+    cache_ok = True
+
+    class comparator_factory(db.TypeDecorator.Comparator):
+        def _adapt_expression(self, op, other_comparator):
+            if op in (operators.add, operators.sub, operators.mul, operators.truediv):
+                return op, self.type
+            return super()._adapt_expression(op, other_comparator)
+
+    def coerce_compared_value(self, op, value):
+        # Scale factors are plain numbers; everything else compared with money is money.
+        if op in (operators.mul, operators.truediv):
+            return db.Float()
+        return self
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_minor(value)
+
+    def process_literal_param(self, value, dialect):
+        return str(to_minor(value))
+
+    def process_result_value(self, value, dialect):
+        # Aggregates come back as int (SQLite), Decimal (PostgreSQL SUM) or float (division).
+        return None if value is None else round(value) / MINOR_UNITS
 
 # --------------------------- USER MODEL ---------------------------
 
@@ -17,6 +90,7 @@ class User(UserMixin, db.Model):
     profile_picture = db.Column(db.String(300), nullable=True)
     is_guest = db.Column(db.Boolean, nullable=False, default=False)
     invite_token = db.Column(db.String(64), unique=True, nullable=True)
+    data_version = db.Column(db.Integer, nullable=False, default=0)  # bumped on every income/expense write
 
     # One-to-many relationships
     incomes = db.relationship('Income', backref='user', lazy=True)
@@ -38,8 +112,12 @@ class Income(db.Model):
     """
     Model to represent income records.
     """
+    __table_args__ = (
+        db.Index('ix_income_user_date', 'user_id', 'date', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     source = db.Column(db.String(100), nullable=False)
     description = db.Column(db.String(255))
     date = db.Column(db.Date, nullable=False)
@@ -54,8 +132,12 @@ class Expense(db.Model):
     """
     Model to represent expense records.
     """
+    __table_args__ = (
+        db.Index('ix_expense_user_date', 'user_id', 'date', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     category = db.Column(db.String(100), nullable=False)
     description = db.Column(db.String(255))
     date = db.Column(db.DateTime, default=datetime.utcnow)
@@ -64,6 +146,43 @@ class Expense(db.Model):
     frequency = db.Column(db.String(20), default='none')  # daily, weekly, monthly, etc.
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+# --------------------------- MONTHLY ROLLUP MODEL ---------------------------
+
+class MonthlyRollup(db.Model):
+    """
+    Per-user monthly totals keyed by (period, currency, category, kind).
+    Kept in step with Income/Expense writes so summaries read O(months) rows.
+    """
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'period', 'currency_code', 'category', 'kind', name='uq_monthly_rollup_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    period = db.Column(db.String(7), nullable=False)  # YYYY-MM
+    currency_code = db.Column(db.String(3), nullable=False, default='USD')
+    category = db.Column(db.String(100), nullable=False)  # expense category or income source
+    kind = db.Column(db.String(10), nullable=False)  # 'income' or 'expense'
+    total = db.Column(Money, nullable=False, default=0)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+
+# --------------------------- EXCHANGE RATE MODEL ---------------------------
+
+class ExchangeRate(db.Model):
+    """
+    Daily exchange rate: one unit of ``base`` is worth ``rate`` units of ``quote``.
+    Imported from a rates file or the CLI; never fetched on the request path.
+    """
+    __table_args__ = (
+        db.UniqueConstraint('base', 'quote', 'date', name='uq_exchange_rate_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False)
+    base = db.Column(db.String(3), nullable=False)
+    quote = db.Column(db.String(3), nullable=False)
+    rate = db.Column(db.Float, nullable=False)
+
 # --------------------------- CATEGORY MODEL ---------------------------
 
 class Category(db.Model):
@@ -73,19 +192,44 @@ class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
 
+# --------------------------- CATEGORY RULE MODEL ---------------------------
+
+class CategoryRule(db.Model):
+    """
+    Keyword or merchant rule mapping matching descriptions to a category.
+    Rules without a user_id apply to everyone.
+    """
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'pattern', name='uq_category_rule_user_pattern'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    pattern = db.Column(db.String(100), nullable=False)  # case-insensitive substring, e.g. "AMZN"
+    category = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 # --------------------------- RECURRING TRANSACTION MODEL ---------------------------
 
 class RecurringTransaction(db.Model):
     """
     Model to track recurring incomes or expenses with frequency and next due date.
     """
+    __table_args__ = (
+        db.Index('ix_recurring_transaction_user_id', 'user_id'),
+        db.Index('ix_recurring_transaction_next_date', 'next_date', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(10), nullable=False)  # 'income' or 'expense'
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     category = db.Column(db.String(100))
     interval = db.Column(db.String(50), nullable=False)  # daily, weekly, monthly, etc.
     next_date = db.Column(db.DateTime, nullable=False)
+    anchor_day = db.Column(db.Integer)  # day of month a monthly schedule falls on; next_date may be clamped
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    lease_owner = db.Column(db.String(64))  # claim token of the worker currently posting this entry
+    lease_expires_at = db.Column(db.DateTime)
 
 # --------------------------- USER PROFILE MODEL ---------------------------
 
@@ -93,6 +237,10 @@ class UserProfile(db.Model):
     """
     Optional model for extended user profile settings.
     """
+    __table_args__ = (
+        db.Index('ix_user_profile_user_id', 'user_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(150))
     currency = db.Column(db.String(10), default='INR')  # Currency preference
@@ -105,6 +253,10 @@ class Group(db.Model):
     """
     Model representing an expense sharing group (like in Splitwise).
     """
+    __table_args__ = (
+        db.Index('ix_group_created_by', 'created_by'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))  # Reference to creator's user ID
@@ -118,6 +270,11 @@ class GroupMember(db.Model):
     """
     Join table to manage users in a group.
     """
+    __table_args__ = (
+        db.Index('uq_group_member_group_user', 'group_id', 'user_id', unique=True),
+        db.Index('ix_group_member_user_id', 'user_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -126,10 +283,15 @@ class SharedExpense(db.Model):
     """
     Model to store shared group expenses.
     """
+    __table_args__ = (
+        db.Index('ix_shared_expense_group_created', 'group_id', 'created_at'),
+        db.Index('ix_shared_expense_paid_by', 'paid_by'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
     description = db.Column(db.String(255), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     currency_code = db.Column(db.String(3), nullable=False, default='USD')
     split_method = db.Column(db.String(20), nullable=False, default='equal')
     paid_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -142,7 +304,41 @@ class ExpenseShare(db.Model):
     """
     Model representing how a shared expense is split among group members.
     """
+    __table_args__ = (
+        db.Index('ix_expense_share_expense_user', 'expense_id', 'user_id'),
+        db.Index('ix_expense_share_user_id', 'user_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     expense_id = db.Column(db.Integer, db.ForeignKey('shared_expense.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    amount_owed = db.Column(db.Float, nullable=False)
+    amount_owed = db.Column(Money, nullable=False)
+
+class GroupBalance(db.Model):
+    """
+    Running net balance of one member in one currency within a group.
+    Positive balances are owed money; negative balances owe money.
+    """
+    __table_args__ = (
+        db.UniqueConstraint('group_id', 'user_id', 'currency_code', name='uq_group_balance_key'),
+        db.Index('ix_group_balance_user_id', 'user_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    currency_code = db.Column(db.String(3), nullable=False, default='USD')
+    balance = db.Column(Money, nullable=False, default=0)
+
+# --------------------------- SCHEMA VERSION MODEL ---------------------------
+
+SCHEMA_VERSION = 'f1a3c5e7b9d0'  # head Alembic revision; bump it with every new migration
+
+class SchemaVersion(db.Model):
+    """
+    Single-row marker recording the schema version the database was last
+    verified against, so app startup can skip reflecting the schema.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.String(32), nullable=False)
+    checked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -3,42 +3,53 @@
 
 import os
 import secrets
-import csv
 from collections import Counter, defaultdict
 from datetime import datetime, date
-from io import BytesIO, StringIO
-from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, Response
+from flask import (
+    Blueprint, render_template, redirect, url_for, flash, request, current_app, Response,
+    stream_with_context, jsonify, send_file
+)
 from flask_login import login_user, login_required, logout_user, current_user
 from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from PIL import Image
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 from .forms import ProfileForm
-try:
-    import cloudinary
-    import cloudinary.exceptions
-    import cloudinary.uploader
-except ImportError:
-    cloudinary = None
 
 from . import db
-from .models import User, Income, Expense, UserProfile, Group, SharedExpense, GroupMember, ExpenseShare
+from .models import User, Income, Expense, UserProfile, Group, SharedExpense, GroupMember, ExpenseShare, CategoryRule
 from .currencies import CURRENCY_SYMBOLS
+from .services.dashboard_data import load_dashboard_data
+from .services import rollups
+from .services.ledgers import keyset_page, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .services.exports import iter_export_rows, stream_csv, stream_ndjson
+from .services.export_jobs import submit_pdf_export, job_status, job_path, job_range
+from .services.exchange_rates import convert_totals
+from .services.category_rules import invalidate_rules
+from .services.settlements import minimize_transfers, to_cents
+from .services.splits import compute_split
+from .services.user_loader import user_loader, reset_user_loader
+from .services.group_balances import (
+    group_members, group_expense_feed, group_summaries, ledger_balances, track_shared_expense
+)
+from .services.guest_invites import merge_guest_account
 from .forms import (
     RegistrationForm, LoginForm, IncomeForm, ExpenseForm,
-    ProfileForm, ExportForm, CreateGroupForm, AddMemberForm, AddSharedExpenseForm
+    ProfileForm, ExportForm, CreateGroupForm, AddMemberForm, AddSharedExpenseForm, CategoryRuleForm,
+    ImportSharedExpensesForm
 )
 
 main = Blueprint('main', __name__, template_folder='templates')
 
+EXPORT_STREAMERS = {
+    'csv': (stream_csv, 'text/csv', 'csv'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson', 'ndjson'),
+}
 
-def _sum_amounts_by_currency(records):
-    totals = defaultdict(float)
-    for record in records:
-        totals[getattr(record, 'currency_code', 'USD') or 'USD'] += record.amount
-    return dict(sorted(totals.items()))
+
+@main.teardown_app_request
+def _drop_user_loader(exc):
+    # The app context (and g) can outlive a request, e.g. under the test client.
+    reset_user_loader()
 
 
 def _preferred_currency(user):
@@ -74,20 +85,12 @@ def _split_method_label(split_method):
     return labels.get(split_method, 'Split equally')
 
 
-def _parse_split_amounts(group, amount, split_method):
-    members = [member for member in group.members if member.user_id]
-    if not members:
-        return {}, 'Group has no members.'
-
-    if split_method == 'equal':
-        share_per_person = round(amount / len(members), 2)
-        split_map = {member.user_id: share_per_person for member in members}
-        adjustment = round(amount - sum(split_map.values()), 2)
-        if adjustment:
-            split_map[members[0].user_id] = round(split_map[members[0].user_id] + adjustment, 2)
-        return split_map, None
+def _parse_split_amounts(members, amount, split_method):
+    members = [member for member in members if member.user_id]
+    member_ids = [member.user_id for member in members]
+    if split_method not in ('percentage', 'exact'):
+        return compute_split(amount, split_method, member_ids)
 
-    split_map = {}
     raw_values = {}
     for member in members:
         raw_value = (request.form.get(f'share_{member.user_id}') or '').strip()
@@ -98,82 +101,17 @@ def _parse_split_amounts(group, amount, split_method):
         except ValueError:
             return {}, f'Enter a valid number for {_member_display_name(member.user)}.'
 
-    if split_method == 'percentage':
-        total_percentage = round(sum(raw_values.values()), 2)
-        if abs(total_percentage - 100) > 0.05:
-            return {}, 'Percentage split must total 100.'
-        for user_id, percentage in raw_values.items():
-            split_map[user_id] = round(amount * (percentage / 100), 2)
-    elif split_method == 'exact':
-        total_exact = round(sum(raw_values.values()), 2)
-        if abs(total_exact - amount) > 0.05:
-            return {}, 'Exact split amounts must match the total expense.'
-        split_map = {user_id: round(value, 2) for user_id, value in raw_values.items()}
-    else:
-        return {}, 'Unsupported split method selected.'
-
-    adjustment = round(amount - sum(split_map.values()), 2)
-    if adjustment:
-        first_user_id = members[0].user_id
-        split_map[first_user_id] = round(split_map[first_user_id] + adjustment, 2)
-
-    return split_map, None
-
-
-def _recent_transactions(incomes, expenses):
-    timeline = []
-
-    for income in incomes:
-        timeline.append({
-            'kind': 'income',
-            'title': income.source,
-            'description': income.description or 'Income added',
-            'amount': income.amount,
-            'currency_code': income.currency_code or 'USD',
-            'date': income.date,
-        })
-
-    for expense in expenses:
-        timeline.append({
-            'kind': 'expense',
-            'title': expense.category,
-            'description': expense.description or 'Expense logged',
-            'amount': expense.amount,
-            'currency_code': expense.currency_code or 'USD',
-            'date': expense.date,
-        })
-
-    def _normalize_sort_date(value):
-        if value is None:
-            return datetime.min
-        if isinstance(value, datetime):
-            return value
-        return datetime.combine(value, datetime.min.time())
-
-    timeline.sort(key=lambda item: _normalize_sort_date(item['date']), reverse=True)
-    return timeline[:8]
-
+    return compute_split(amount, split_method, member_ids, raw_values)
 
-def _build_dashboard_charts(incomes, expenses):
-    monthly_totals = defaultdict(lambda: {'income': 0.0, 'expense': 0.0})
 
-    for income in incomes:
-        if income.date:
-            month_key = income.date.strftime('%b')
-            monthly_totals[month_key]['income'] += income.amount
-
-    for expense in expenses:
-        expense_date = expense.date.date() if isinstance(expense.date, datetime) else expense.date
-        if expense_date:
-            month_key = expense_date.strftime('%b')
-            monthly_totals[month_key]['expense'] += expense.amount
-
-    ordered_months = list(monthly_totals.keys())[-6:]
-    if not ordered_months:
+def _build_dashboard_charts(monthly_totals, top_categories):
+    month_keys = sorted(monthly_totals)[-6:]
+    ordered_months = [date(year, month, 1).strftime('%b') for year, month in month_keys]
+    if not month_keys:
         ordered_months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun']
 
-    income_series = [round(monthly_totals[month]['income'], 2) for month in ordered_months]
-    expense_series = [round(monthly_totals[month]['expense'], 2) for month in ordered_months]
+    income_series = [round(monthly_totals[key]['income'], 2) for key in month_keys] or [0.0] * len(ordered_months)
+    expense_series = [round(monthly_totals[key]['expense'], 2) for key in month_keys] or [0.0] * len(ordered_months)
     max_value = max(income_series + expense_series + [1])
 
     def _points(series):
@@ -204,11 +142,6 @@ def _build_dashboard_charts(incomes, expenses):
             })
         return points
 
-    category_totals = defaultdict(float)
-    for expense in expenses:
-        category_totals[expense.category or 'Other'] += expense.amount
-
-    top_categories = sorted(category_totals.items(), key=lambda item: item[1], reverse=True)[:4]
     top_category_max = max([value for _, value in top_categories] + [1])
 
     return {
@@ -225,33 +158,29 @@ def _build_dashboard_charts(incomes, expenses):
 
 
 def _build_group_snapshot(group):
-    member_users = {}
-    balances = defaultdict(lambda: defaultdict(float))
+    balances = ledger_balances(group.id)
+    feed_rows = group_expense_feed(group.id)
+    loader = user_loader().prime(expense.paid_by for expense in feed_rows)
+    # Members and payers who have since left the group are fetched in one query.
+    members = group_members(group.id)
+    member_users = {member.user_id: member.user for member in members if member.user}
     expense_feed = []
 
-    for member in group.members:
-        if member.user:
-            member_users[member.user_id] = member.user
-
-    for expense in sorted(group.expenses, key=lambda item: item.created_at or datetime.min, reverse=True):
+    for expense in feed_rows:
         currency_code = expense.currency_code or 'USD'
-        shares = list(expense.shares)
-        split_count = len(shares) or max(len(group.members), 1)
-        split_amount = sum(share.amount_owed for share in shares) / split_count if shares else expense.amount / split_count
-
-        for share in shares:
-            balances[share.user_id][currency_code] -= share.amount_owed
-
-        balances[expense.paid_by][currency_code] += expense.amount
+        if expense.share_count:
+            split_amount = expense.share_total / expense.share_count
+        else:
+            split_amount = expense.amount / max(len(members), 1)
 
-        payer = member_users.get(expense.paid_by)
+        payer = loader.get(expense.paid_by)
         expense_feed.append({
             'id': expense.id,
             'description': expense.description,
             'amount': expense.amount,
             'currency_code': currency_code,
             'split_amount': split_amount,
-            'split_method': _split_method_label(getattr(expense, 'split_method', 'equal')),
+            'split_method': _split_method_label(expense.split_method or 'equal'),
             'paid_by_name': _member_display_name(payer),
             'created_at': expense.created_at,
         })
@@ -260,7 +189,7 @@ def _build_group_snapshot(group):
     currency_totals = defaultdict(float)
 
     for user_id, user in member_users.items():
-        per_currency = dict(sorted(balances[user_id].items()))
+        per_currency = dict(sorted(balances.get(user_id, {}).items()))
         for currency_code, value in per_currency.items():
             currency_totals[currency_code] += value
 
@@ -271,39 +200,25 @@ def _build_group_snapshot(group):
 
     settlement_suggestions = []
     for currency_code in sorted({code for row in member_balance_rows for code in row['balances']}):
-        creditors = []
-        debtors = []
-
-        for row in member_balance_rows:
-            balance_value = row['balances'].get(currency_code, 0)
-            if balance_value > 0:
-                creditors.append({'username': _member_display_name(row['user']), 'amount': balance_value})
-            elif balance_value < 0:
-                debtors.append({'username': _member_display_name(row['user']), 'amount': -balance_value})
-
-        creditors.sort(key=lambda item: item['amount'], reverse=True)
-        debtors.sort(key=lambda item: item['amount'], reverse=True)
-
-        creditor_idx = 0
-        debtor_idx = 0
-        while creditor_idx < len(creditors) and debtor_idx < len(debtors):
-            transfer_amount = min(creditors[creditor_idx]['amount'], debtors[debtor_idx]['amount'])
+        cents_by_user = {
+            user_id: to_cents(balances.get(user_id, {}).get(currency_code, 0))
+            for user_id in member_users
+        }
+        transfers = minimize_transfers(
+            cents_by_user,
+            exact_limit=current_app.config['SETTLEMENT_EXACT_LIMIT'],
+            time_budget=current_app.config['SETTLEMENT_TIME_BUDGET'],
+        )
+        for debtor_id, creditor_id, cents in transfers:
             settlement_suggestions.append({
                 'currency_code': currency_code,
-                'from_user': debtors[debtor_idx]['username'],
-                'to_user': creditors[creditor_idx]['username'],
-                'amount': round(transfer_amount, 2),
+                'from_user': _member_display_name(member_users[debtor_id]),
+                'to_user': _member_display_name(member_users[creditor_id]),
+                'amount': cents / 100,
             })
 
-            creditors[creditor_idx]['amount'] -= transfer_amount
-            debtors[debtor_idx]['amount'] -= transfer_amount
-
-            if creditors[creditor_idx]['amount'] <= 0.009:
-                creditor_idx += 1
-            if debtors[debtor_idx]['amount'] <= 0.009:
-                debtor_idx += 1
-
     return {
+        'members': members,
         'member_users': member_users,
         'member_balance_rows': member_balance_rows,
         'expense_feed': expense_feed,
@@ -314,9 +229,10 @@ def _build_group_snapshot(group):
 
 # -------------------- Helper: Save Profile Picture --------------------
 def save_picture(form_picture):
-    cloudinary_ready = _configure_cloudinary()
+    # Pillow and cloudinary are imported here, not at module level, to keep them out of cold starts.
+    cloudinary = _configure_cloudinary()
 
-    if cloudinary_ready:
+    if cloudinary is not None:
         try:
             upload_result = cloudinary.uploader.upload(
                 form_picture,
@@ -336,6 +252,8 @@ def save_picture(form_picture):
     picture_fn = random_hex + f_ext
     picture_path = os.path.join(current_app.root_path, 'static/profile_pics', picture_fn)
 
+    from PIL import Image
+
     output_size = (150, 150)
     img = Image.open(form_picture)
     img.thumbnail(output_size)
@@ -345,27 +263,32 @@ def save_picture(form_picture):
 
 
 def _configure_cloudinary():
-    if cloudinary is None:
-        return False
-
-    if os.environ.get('CLOUDINARY_URL'):
-        cloudinary.config(cloudinary_url=os.environ.get('CLOUDINARY_URL'), secure=True)
-        return True
-
+    """
+    Return the configured cloudinary module, or None when it is not installed or not configured.
+    """
     cloud_name = os.environ.get('CLOUDINARY_CLOUD_NAME')
     api_key = os.environ.get('CLOUDINARY_API_KEY')
     api_secret = os.environ.get('CLOUDINARY_API_SECRET')
+    if not os.environ.get('CLOUDINARY_URL') and not (cloud_name and api_key and api_secret):
+        return None
 
-    if cloud_name and api_key and api_secret:
+    try:
+        import cloudinary
+        import cloudinary.exceptions
+        import cloudinary.uploader
+    except ImportError:
+        return None
+
+    if os.environ.get('CLOUDINARY_URL'):
+        cloudinary.config(cloudinary_url=os.environ.get('CLOUDINARY_URL'), secure=True)
+    else:
         cloudinary.config(
             cloud_name=cloud_name,
             api_key=api_key,
             api_secret=api_secret,
             secure=True,
         )
-        return True
-
-    return False
+    return cloudinary
 
 
 # -------------------- Home --------------------
@@ -437,23 +360,23 @@ def toggle_dark_mode():
 @main.route('/dashboard')
 @login_required
 def dashboard():
-    incomes = Income.query.filter_by(user_id=current_user.id).all()
-    expenses = Expense.query.filter_by(user_id=current_user.id).all()
-    income_totals = _sum_amounts_by_currency(incomes)
-    expense_totals = _sum_amounts_by_currency(expenses)
+    dashboard_data = load_dashboard_data(current_user.id)
+    income_totals = dashboard_data['income_totals']
+    expense_totals = dashboard_data['expense_totals']
     balance_totals = {}
     for currency_code in set(income_totals) | set(expense_totals):
         balance_totals[currency_code] = income_totals.get(currency_code, 0) - expense_totals.get(currency_code, 0)
 
     active_groups = Group.query.join(GroupMember).filter(GroupMember.user_id == current_user.id).count()
-    recent_transactions = _recent_transactions(incomes, expenses)
-    chart_data = _build_dashboard_charts(incomes, expenses)
+    recent_transactions = dashboard_data['recent_transactions']
+    chart_data = _build_dashboard_charts(dashboard_data['monthly_totals'], dashboard_data['top_categories'])
     preferred_currency = _preferred_currency(current_user)
+    # Currencies without a stored exchange rate are left out of the converted totals and listed instead.
+    converted_income, income_missing = convert_totals(income_totals, preferred_currency)
+    converted_expense, expense_missing = convert_totals(expense_totals, preferred_currency)
     savings_rate = 0
-    preferred_income = income_totals.get(preferred_currency, 0)
-    preferred_expense = expense_totals.get(preferred_currency, 0)
-    if preferred_income:
-        savings_rate = round(max(preferred_income - preferred_expense, 0) / preferred_income * 100, 1)
+    if converted_income > 0:
+        savings_rate = round(max(converted_income - converted_expense, 0) / converted_income * 100, 1)
 
     return render_template(
         'dashboard.html',
@@ -461,6 +384,8 @@ def dashboard():
         expense_totals=expense_totals,
         balance_totals=balance_totals,
         preferred_currency=preferred_currency,
+        converted_balance=round(converted_income - converted_expense, 2),
+        missing_rates=sorted(set(income_missing) | set(expense_missing)),
         savings_rate=savings_rate,
         active_groups=active_groups,
         recent_transactions=recent_transactions,
@@ -469,15 +394,23 @@ def dashboard():
     )
 
 
+def _ledger_page_size():
+    page_size = request.args.get('per_page', type=int) or current_app.config.get('LEDGER_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    return max(1, min(page_size, MAX_PAGE_SIZE))
+
+
 @main.route('/income')
 @login_required
 def income_ledger():
-    incomes = Income.query.filter_by(user_id=current_user.id).all()
-    income_totals = _sum_amounts_by_currency(incomes)
+    cursor = request.args.get('cursor')
+    incomes, next_cursor = keyset_page(Income, current_user.id, cursor=cursor, page_size=_ledger_page_size())
+    income_totals = rollups.rollup_currency_totals(current_user.id, 'income')
     return render_template(
         'income_ledger.html',
-        incomes=sorted(incomes, key=lambda item: item.date or date.min, reverse=True),
+        incomes=incomes,
         income_totals=income_totals,
+        cursor=cursor,
+        next_cursor=next_cursor,
         currency_symbols=CURRENCY_SYMBOLS,
     )
 
@@ -485,12 +418,15 @@ def income_ledger():
 @main.route('/expenses')
 @login_required
 def expense_ledger():
-    expenses = Expense.query.filter_by(user_id=current_user.id).all()
-    expense_totals = _sum_amounts_by_currency(expenses)
+    cursor = request.args.get('cursor')
+    expenses, next_cursor = keyset_page(Expense, current_user.id, cursor=cursor, page_size=_ledger_page_size())
+    expense_totals = rollups.rollup_currency_totals(current_user.id, 'expense')
     return render_template(
         'expense_ledger.html',
-        expenses=sorted(expenses, key=lambda item: item.date or datetime.min, reverse=True),
+        expenses=expenses,
         expense_totals=expense_totals,
+        cursor=cursor,
+        next_cursor=next_cursor,
         currency_symbols=CURRENCY_SYMBOLS,
     )
 
@@ -513,6 +449,7 @@ def add_income():
             user_id=current_user.id
         )
         db.session.add(income)
+        rollups.track_income(income)
         db.session.commit()
         flash('Income added successfully!', 'success')
         return redirect(url_for('main.income_ledger'))
@@ -529,7 +466,7 @@ def add_expense():
         # Use ML to predict category if description provided and category is empty
         if form.description.data and not form.category.data:
             from .ml_utils import predict_category
-            predicted_category = predict_category(form.description.data)
+            predicted_category = predict_category(form.description.data, current_user.id)
             category = predicted_category if predicted_category else "Other"
         elif not form.category.data:
             category = "Other"
@@ -547,6 +484,7 @@ def add_expense():
             user_id=current_user.id
         )
         db.session.add(expense)
+        rollups.track_expense(expense)
         db.session.commit()
         flash('Expense added!', 'success')
         return redirect(url_for('main.expense_ledger'))
@@ -564,21 +502,28 @@ def edit_expense(expense_id):
     
     form = ExpenseForm(obj=expense)
     if form.validate_on_submit():
+        previous_category = expense.category
+        rollups.track_expense(expense, sign=-1)
         expense.amount = form.amount.data
         expense.currency_code = form.currency_code.data
         # Use ML to predict category if description provided and category is empty
         if form.description.data and not form.category.data:
             from .ml_utils import predict_category
-            predicted_category = predict_category(form.description.data)
+            predicted_category = predict_category(form.description.data, current_user.id)
             expense.category = predicted_category if predicted_category else "Other"
         elif not form.category.data:
             expense.category = "Other"
         else:
             expense.category = form.category.data
+            # An explicit change of category is a correction the online model can learn from.
+            if form.description.data and expense.category != previous_category:
+                from .ml_utils import learn_correction
+                learn_correction(current_user.id, form.description.data, expense.category)
         expense.description = form.description.data
         expense.date = form.date.data or datetime.utcnow().date()
         expense.is_recurring = form.is_recurring.data
         expense.frequency = form.frequency.data if form.is_recurring.data else 'none'
+        rollups.track_expense(expense)
         db.session.commit()
         flash('Expense updated successfully!', 'success')
         return redirect(url_for('main.expense_ledger'))
@@ -594,6 +539,7 @@ def delete_expense(expense_id):
         flash('You do not have permission to delete this expense.', 'danger')
         return redirect(url_for('main.expense_ledger'))
     
+    rollups.track_expense(expense, sign=-1)
     db.session.delete(expense)
     db.session.commit()
     flash('Expense deleted successfully!', 'success')
@@ -611,6 +557,7 @@ def edit_income(income_id):
     
     form = IncomeForm(obj=income)
     if form.validate_on_submit():
+        rollups.track_income(income, sign=-1)
         income.amount = form.amount.data
         income.source = form.source.data
         income.currency_code = form.currency_code.data
@@ -618,6 +565,7 @@ def edit_income(income_id):
         income.date = form.date.data
         income.is_recurring = form.is_recurring.data
         income.frequency = form.frequency.data if form.is_recurring.data else 'none'
+        rollups.track_income(income)
         db.session.commit()
         flash('Income updated successfully!', 'success')
         return redirect(url_for('main.income_ledger'))
@@ -633,6 +581,7 @@ def delete_income(income_id):
         flash('You do not have permission to delete this income.', 'danger')
         return redirect(url_for('main.income_ledger'))
     
+    rollups.track_income(income, sign=-1)
     db.session.delete(income)
     db.session.commit()
     flash('Income deleted successfully!', 'success')
@@ -686,29 +635,58 @@ def profile():
 @main.route('/graph')
 @login_required
 def graph():
-    # Retrieve the income and expense data from the database
-    expenses = Expense.query.filter_by(user_id=current_user.id).all()
+    # Read per (category, currency) totals from the monthly rollups
+    category_rows = rollups.rollup_category_totals(current_user.id, 'expense')
 
     # Process the data to get categories and amounts
-    categories = [f"{expense.category} ({expense.currency_code or 'USD'})" for expense in expenses]
-    amounts = [expense.amount for expense in expenses]
+    categories = [f"{category} ({currency_code})" for category, currency_code, _, _ in category_rows]
+    amounts = [total for _, _, total, _ in category_rows]
+
+    # Totals are converted to the preferred currency; the bars stay per currency
+    preferred_currency = _preferred_currency(current_user)
+    expense_totals = defaultdict(float)
+    for _, currency_code, total, _ in category_rows:
+        expense_totals[currency_code] += total
+    total_income, income_missing = convert_totals(rollups.rollup_currency_totals(current_user.id, 'income'), preferred_currency)
+    total_expense, expense_missing = convert_totals(expense_totals, preferred_currency)
 
-    # Calculate additional insights
-    total_income = sum(i.amount for i in Income.query.filter_by(user_id=current_user.id).all())
-    total_expense = sum(e.amount for e in expenses)
-    
     # Handle empty categories list
-    if categories:
-        category_counts = Counter(categories)
-        top_category = category_counts.most_common(1)[0][0] if category_counts else "N/A"
+    if category_rows:
+        category_counts = Counter({label: row[3] for label, row in zip(categories, category_rows)})
+        top_category = category_counts.most_common(1)[0][0]
     else:
         top_category = "N/A"
 
     return render_template('graph.html', categories=categories, amounts=amounts,
                            total_income=total_income, total_expense=total_expense, top_category=top_category,
+                           preferred_currency=preferred_currency,
+                           missing_rates=sorted(set(income_missing) | set(expense_missing)),
                            currency_symbols=CURRENCY_SYMBOLS)
 
 
+@main.route('/forecast')
+@login_required
+def forecast():
+    from .services.forecast import forecast_balances, DEFAULT_FORECAST_MONTHS
+
+    months = request.args.get('months', type=int) or DEFAULT_FORECAST_MONTHS
+    result = forecast_balances(current_user.id, months, currency_code=_preferred_currency(current_user))
+    return jsonify({
+        'currency_code': result['currency_code'],
+        'missing_currencies': result['missing_currencies'],
+        'start': result['start'].isoformat(),
+        'end': result['end'].isoformat(),
+        'starting_balance': result['starting_balance'],
+        'ending_balance': result['ending_balance'],
+        'lowest_balance': result['lowest_balance'],
+        'lowest_date': result['lowest_date'].isoformat(),
+        'income': result['income'],
+        'expenses': result['expenses'],
+        'dates': result['dates'].astype(str).tolist(),
+        'balances': result['balances'].round(2).tolist(),
+    })
+
+
 # -------------------- Export --------------------
 @main.route('/export', methods=['GET', 'POST'])
 @login_required
@@ -719,72 +697,162 @@ def export():
         start_date = form.start_date.data
         end_date = form.end_date.data
 
-        # Get actual user data
-        expenses = Expense.query.filter(
-            Expense.user_id == current_user.id,
-            Expense.date >= start_date,
-            Expense.date <= end_date
-        ).all()
-        
-        incomes = Income.query.filter(
-            Income.user_id == current_user.id,
-            Income.date >= start_date,
-            Income.date <= end_date
-        ).all()
-
-        # Prepare data for export
-        data = []
-        for expense in expenses:
-            data.append({
-                'type': 'Expense',
-                'category': expense.category,
-                'description': expense.description or '',
-                'amount': expense.amount,
-                'currency_code': expense.currency_code or 'USD',
-                'date': expense.date.strftime('%Y-%m-%d') if isinstance(expense.date, datetime) else str(expense.date)
-            })
-        
-        for income in incomes:
-            data.append({
-                'type': 'Income',
-                'category': income.source,
-                'description': income.description or '',
-                'amount': income.amount,
-                'currency_code': income.currency_code or 'USD',
-                'date': income.date.strftime('%Y-%m-%d') if isinstance(income.date, date) else str(income.date)
-            })
+        rows = iter_export_rows(current_user.id, start_date, end_date)
+
+        if export_format in EXPORT_STREAMERS:
+            encoder, mimetype, extension = EXPORT_STREAMERS[export_format]
+            return Response(stream_with_context(encoder(rows)), mimetype=mimetype,
+                            headers={"Content-Disposition": f"attachment;filename=financial_data_{start_date}_to_{end_date}.{extension}"})
 
-        if export_format == 'csv':
-            output = StringIO()
-            writer = csv.DictWriter(output, fieldnames=['type', 'category', 'description', 'amount', 'currency_code', 'date'])
-            writer.writeheader()
-            writer.writerows(data)
-            csv_data = output.getvalue().encode('utf-8')
-            return Response(csv_data, mimetype='text/csv',
-                            headers={"Content-Disposition": f"attachment;filename=financial_data_{start_date}_to_{end_date}.csv"})
-
-        elif export_format == 'pdf':
-            buffer = BytesIO()
-            c = canvas.Canvas(buffer, pagesize=letter)
-            c.drawString(100, 750, f"Financial Data Export - {start_date} to {end_date}")
-            c.drawString(100, 730, f"User: {current_user.username}")
-            y = 710
-            for entry in data:
-                if y < 50:  # New page if needed
-                    c.showPage()
-                    y = 750
-                c.drawString(100, y, f"{entry['type']}: {entry['category']} - {entry['description']} - {entry['currency_code']} {entry['amount']} - {entry['date']}")
-                y -= 20
-            c.showPage()
-            c.save()
-            buffer.seek(0)
-            return Response(buffer.getvalue(), mimetype='application/pdf',
-                            headers={"Content-Disposition": f"attachment;filename=financial_data_{start_date}_to_{end_date}.pdf"})
+        if export_format == 'pdf':
+            job_id = submit_pdf_export(current_user, start_date, end_date)
+            if request.accept_mimetypes.best == 'application/json':
+                return jsonify(_export_job_payload(job_id)), 202
+            return redirect(url_for('main.export', job=job_id))
 
         flash('Data exported successfully!', 'success')
         return redirect(url_for('main.export'))
 
-    return render_template('export.html', form=form)
+    monthly_totals = rollups.rollup_monthly_totals(current_user.id)
+    monthly_summary = [
+        {
+            'label': date(year, month, 1).strftime('%b %Y'),
+            'income': monthly_totals[(year, month)]['income'],
+            'expense': monthly_totals[(year, month)]['expense'],
+        }
+        for year, month in sorted(monthly_totals, reverse=True)[:12]
+    ]
+    job_id = request.args.get('job')
+    export_job = _export_job_payload(_resubmit_unknown_job(job_id)) if job_id else None
+    return render_template('export.html', form=form, monthly_summary=monthly_summary, export_job=export_job)
+
+
+def _export_job_payload(job_id):
+    status = job_status(current_user.id, job_id)
+    return {
+        'job_id': job_id,
+        'status': status or 'unknown',
+        'status_url': url_for('main.export_job_status', job_id=job_id),
+        'download_url': url_for('main.download_export', job_id=job_id) if status == 'done' else None,
+    }
+
+
+def _resubmit_unknown_job(job_id):
+    # Jobs live in one worker's memory: a poll that reaches another worker, or
+    # arrives after a restart, queues the range again here. The new job id
+    # differs when the user's data changed since.
+    date_range = job_range(job_id)
+    if date_range is None or job_status(current_user.id, job_id) is not None:
+        return job_id
+    return submit_pdf_export(current_user, *date_range)
+
+
+@main.route('/export/jobs/<job_id>')
+@login_required
+def export_job_status(job_id):
+    payload = _export_job_payload(_resubmit_unknown_job(job_id))
+    if payload['status'] == 'unknown':
+        return jsonify(payload), 404
+    return jsonify(payload)
+
+
+@main.route('/export/jobs/<job_id>/download')
+@login_required
+def download_export(job_id):
+    path = job_path(current_user.id, job_id)
+    if path is None or job_status(current_user.id, job_id) != 'done':
+        flash('That export is not ready yet.', 'warning')
+        return redirect(url_for('main.export', job=job_id))
+    start, end = job_id.split('-')[:2]
+    return send_file(path, mimetype='application/pdf', as_attachment=True,
+                     download_name=f"financial_data_{start}_to_{end}.pdf")
+
+
+# -------------------- Admin: Re-categorize Expenses --------------------
+def _is_admin(user):
+    return user.is_authenticated and user.username in current_app.config.get('ADMIN_USERNAMES', ())
+
+
+@main.route('/admin/recategorize', methods=['POST'])
+@login_required
+def admin_recategorize():
+    if not _is_admin(current_user):
+        return jsonify({'error': 'Admin access required.'}), 403
+
+    from .services.recategorize import DEFAULT_CATEGORIES, PREVIEW_MAX_CHUNKS, recategorize_expenses
+
+    # A JSON body cannot be sent cross-site without a CORS preflight, so form posts (and their CSRF risk) are refused.
+    payload = request.get_json(silent=True) if request.is_json else None
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Send the options as a JSON object.'}), 415
+    # A full run outlives a worker timeout and would stop after committing some chunks.
+    if payload.get('dry_run', True) is False:
+        return jsonify({'error': 'Apply changes with `flask expenses recategorize --apply`.'}), 400
+    if payload.get('all_categories') is True:
+        only_categories = None
+    else:
+        only_categories = payload.get('only_categories') or list(DEFAULT_CATEGORIES)
+        if isinstance(only_categories, str):
+            only_categories = [name.strip() for name in only_categories.split(',') if name.strip()]
+    try:
+        report = recategorize_expenses(
+            user_id=int(payload['user_id']) if payload.get('user_id') else None,
+            chunk_size=int(payload.get('chunk_size') or 5000),
+            only_categories=only_categories,
+            max_chunks=PREVIEW_MAX_CHUNKS,
+        )
+    except (TypeError, ValueError):
+        return jsonify({'error': 'user_id and chunk_size must be integers.'}), 400
+    except RuntimeError as exc:
+        return jsonify({'error': str(exc)}), 503
+    report['diff'] = [{'id': expense_id, 'from': old, 'to': new} for expense_id, old, new in report['diff']]
+    return jsonify(report)
+
+
+# -------------------- Category Rules --------------------
+@main.route('/rules', methods=['GET', 'POST'])
+@login_required
+def category_rules():
+    form = CategoryRuleForm()
+    can_edit_global = _is_admin(current_user)
+    if form.validate_on_submit():
+        owner_id = None if form.is_global.data and can_edit_global else current_user.id
+        pattern = form.pattern.data.strip()
+        rule = CategoryRule.query.filter_by(user_id=owner_id, pattern=pattern).first()
+        if rule:
+            rule.category = form.category.data.strip()
+        else:
+            db.session.add(CategoryRule(user_id=owner_id, pattern=pattern, category=form.category.data.strip()))
+        db.session.commit()
+        invalidate_rules(owner_id)
+        flash('Category rule saved.', 'success')
+        return redirect(url_for('main.category_rules'))
+
+    personal_rules = CategoryRule.query.filter_by(user_id=current_user.id).order_by(CategoryRule.pattern).all()
+    global_rules = CategoryRule.query.filter(CategoryRule.user_id.is_(None)).order_by(CategoryRule.pattern).all()
+    return render_template(
+        'category_rules.html',
+        form=form,
+        personal_rules=personal_rules,
+        global_rules=global_rules,
+        can_edit_global=can_edit_global,
+    )
+
+
+@main.route('/rules/<int:rule_id>/delete', methods=['POST'])
+@login_required
+def delete_category_rule(rule_id):
+    rule = CategoryRule.query.get_or_404(rule_id)
+    if rule.user_id != current_user.id and not (rule.user_id is None and _is_admin(current_user)):
+        flash('You do not have permission to delete this rule.', 'danger')
+        return redirect(url_for('main.category_rules'))
+
+    owner_id = rule.user_id
+    db.session.delete(rule)
+    db.session.commit()
+    invalidate_rules(owner_id)
+    flash('Category rule deleted.', 'success')
+    return redirect(url_for('main.category_rules'))
 
 
 # -------------------- Create Group --------------------
@@ -872,11 +940,8 @@ def group_detail(group_id):
         flash('You do not have access to manage this group.', 'danger')
         return redirect(url_for('main.view_groups'))
 
-    member_users = {}
-    for member in group.members:
-        user = User.query.get(member.user_id)
-        if user:
-            member_users[member.user_id] = user
+    members = group_members(group_id)
+    member_users = {member.user_id: member.user for member in members if member.user}
 
     invite_links = {
         user_id: url_for('main.claim_invite', token=user.invite_token, _external=True)
@@ -887,6 +952,7 @@ def group_detail(group_id):
     return render_template(
         'group_detail.html',
         group=group,
+        members=members,
         member_users=member_users,
         invite_links=invite_links,
         currency_symbols=CURRENCY_SYMBOLS,
@@ -899,20 +965,7 @@ def group_detail(group_id):
 @main.route('/groups')
 @login_required
 def view_groups():
-    # Get all groups where user is a member
-    user_groups = Group.query.join(GroupMember).filter(GroupMember.user_id == current_user.id).all()
-    # Also include groups created by user
-    created_groups = Group.query.filter_by(created_by=current_user.id).all()
-    all_groups = list({group.id: group for group in user_groups + created_groups}.values())
-    group_cards = []
-    for group in all_groups:
-        snapshot = _build_group_snapshot(group)
-        group_cards.append({
-            'group': group,
-            'member_count': len(snapshot['member_users']),
-            'expense_count': len(group.expenses),
-            'currencies': sorted({expense.currency_code or 'USD' for expense in group.expenses}),
-        })
+    group_cards = group_summaries(current_user.id)
     return render_template('view_groups.html', group_cards=group_cards, currency_symbols=CURRENCY_SYMBOLS)
 
 
@@ -932,7 +985,7 @@ def view_group(group_id):
     return render_template(
         'view_group.html',
         group=group,
-        members=group.members,
+        members=snapshot['members'],
         member_balance_rows=snapshot['member_balance_rows'],
         member_users=snapshot['member_users'],
         expense_feed=snapshot['expense_feed'],
@@ -958,7 +1011,8 @@ def add_shared_expense(group_id):
     form = AddSharedExpenseForm()
     form.currency_code.data = form.currency_code.data or _preferred_currency(current_user)
     form.split_method.data = form.split_method.data or 'equal'
-    member_users = [User.query.get(member.user_id) for member in group.members if User.query.get(member.user_id)]
+    members = group_members(group.id)
+    member_users = [member.user for member in members if member.user]
     form.paid_by.choices = [(user.id, _member_display_name(user)) for user in member_users]
 
     if form.validate_on_submit():
@@ -967,7 +1021,7 @@ def add_shared_expense(group_id):
         paid_by_id = form.paid_by.data
         currency_code = form.currency_code.data
         split_method = form.split_method.data
-        split_map, error_message = _parse_split_amounts(group, amount, split_method)
+        split_map, error_message = _parse_split_amounts(members, amount, split_method)
         if error_message:
             flash(error_message, 'danger')
             return render_template('add_shared_expense.html', form=form, group=group, member_users=member_users, member_display_name=_member_display_name)
@@ -983,7 +1037,7 @@ def add_shared_expense(group_id):
         db.session.add(expense)
         db.session.flush()
 
-        for member in group.members:
+        for member in members:
             if member.user_id not in split_map:
                 continue
             share = ExpenseShare(
@@ -993,6 +1047,7 @@ def add_shared_expense(group_id):
             )
             db.session.add(share)
 
+        track_shared_expense(expense, split_map)
         db.session.commit()
         flash('Shared expense added successfully!', 'success')
         return redirect(url_for('main.view_group', group_id=group.id))
@@ -1006,6 +1061,38 @@ def add_shared_expense(group_id):
     )
 
 
+# -------------------- Import Shared Expenses --------------------
+@main.route('/group/<int:group_id>/import', methods=['GET', 'POST'])
+@login_required
+def import_shared_expenses_view(group_id):
+    group = Group.query.get_or_404(group_id)
+
+    is_member = GroupMember.query.filter_by(group_id=group_id, user_id=current_user.id).first()
+    if not is_member and group.created_by != current_user.id:
+        flash('You must be a member of this group to add expenses.', 'danger')
+        return redirect(url_for('main.view_group', group_id=group_id))
+
+    form = ImportSharedExpensesForm()
+    report = None
+    if form.validate_on_submit():
+        data = form.csv_file.data.read() if form.csv_file.data else (form.csv_text.data or '')
+        if not data.strip():
+            flash('Upload a CSV file or paste CSV rows to import.', 'danger')
+        else:
+            from .services.group_imports import import_shared_expenses
+
+            report = import_shared_expenses(
+                group, data, default_currency=_preferred_currency(current_user), dry_run=form.dry_run.data
+            )
+            if report['imported']:
+                flash(f"Imported {report['imported']} shared expenses.", 'success')
+                return redirect(url_for('main.view_group', group_id=group.id))
+            if not report['errors']:
+                flash(f"{report['rows']} rows are ready to import." if report['dry_run'] else 'No rows to import.', 'info')
+
+    return render_template('import_shared_expenses.html', form=form, group=group, report=report)
+
+
 @main.route('/invite/<token>')
 @login_required
 def claim_invite(token):
@@ -1015,27 +1102,7 @@ def claim_invite(token):
         flash('This invite link is invalid or has already been claimed.', 'warning')
         return redirect(url_for('main.view_groups'))
 
-    guest_memberships = GroupMember.query.filter_by(user_id=guest_user.id).all()
-    for membership in guest_memberships:
-        existing_membership = GroupMember.query.filter_by(group_id=membership.group_id, user_id=current_user.id).first()
-        if existing_membership:
-            db.session.delete(membership)
-        else:
-            membership.user_id = current_user.id
-
-    for expense in SharedExpense.query.filter_by(paid_by=guest_user.id).all():
-        expense.paid_by = current_user.id
-
-    guest_shares = ExpenseShare.query.filter_by(user_id=guest_user.id).all()
-    for share in guest_shares:
-        existing_share = ExpenseShare.query.filter_by(expense_id=share.expense_id, user_id=current_user.id).first()
-        if existing_share:
-            existing_share.amount_owed += share.amount_owed
-            db.session.delete(share)
-        else:
-            share.user_id = current_user.id
-
-    db.session.flush()
+    merge_guest_account(guest_user.id, current_user.id)
     db.session.delete(guest_user)
     db.session.commit()
     flash('Invite claimed successfully. Your account is now connected to those shared balances.', 'success')
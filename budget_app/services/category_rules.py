@@ -0,0 +1,162 @@
+# category_rules.py
+# Keyword/merchant rules compiled into one regex per user, checked before the category model
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from flask import has_app_context
+from sqlalchemy import or_, select
+from ..models import CategoryRule
+from .. import db
+
+RULE_CACHE_TTL = 60.0
+RULE_CACHE_SIZE = 1024
+
+# The keyword lists predict_category has always fallen back on, kept in their original priority order.
+DEFAULT_RULES = (
+    [(word, 'Food') for word in ('food', 'restaurant', 'pizza', 'burger', 'meal', 'grocery')]
+    + [(word, 'Transport') for word in ('uber', 'taxi', 'transport', 'bus', 'train', 'gas')]
+    + [(word, 'Utilities') for word in ('electric', 'water', 'utility', 'bill', 'internet')]
+    + [(word, 'Entertainment') for word in ('movie', 'entertainment', 'game', 'concert')]
+    + [(word, 'Health') for word in ('medicine', 'doctor', 'health', 'pharmacy')]
+)
+
+_cache = OrderedDict()  # user_id -> (expires_at, RuleMatcher)
+_cache_lock = threading.Lock()
+
+
+class RuleMatcher:
+    """
+    Case-insensitive substring rules compiled into a single regex.
+
+    The patterns are folded into a character trie and emitted as one nested
+    alternation, so the regex engine only follows branches that share the
+    text's next character instead of trying every rule at every position.
+
+    Rules are given in priority order. One scan of the text finds the
+    longest rule starting at every position, including positions inside an
+    earlier match, so a user rule nested in a longer global keyword ('zon'
+    in 'amazon') is still seen. The highest-priority rule among those
+    matches (and the shorter rules they contain as prefixes) wins, so the
+    result does not depend on where in the text a rule matched.
+    """
+
+    def __init__(self, rules):
+        self._ranks = {}  # lowercased pattern -> (priority, category)
+        for pattern, category in rules:
+            key = (pattern or '').strip().lower()
+            if key and key not in self._ranks:
+                self._ranks[key] = (len(self._ranks), category)
+        # A lookahead consumes nothing, so matches may overlap and every start position is tried.
+        self._regex = re.compile(f'(?=({_trie_regex(self._ranks)}))') if self._ranks else None
+
+    def __len__(self):
+        return len(self._ranks)
+
+    def match(self, text):
+        """
+        Return the category of the best matching rule, or None.
+        """
+        if self._regex is None or not text:
+            return None
+        best = None
+        # Matching lowercased text without IGNORECASE lets the regex engine skip ahead by first character.
+        for found in self._regex.finditer(text.lower()):
+            matched = found.group(1)
+            # A shorter rule may be a prefix of the longest match at this position.
+            for end in range(len(matched), 0, -1):
+                ranked = self._ranks.get(matched[:end])
+                if ranked is not None and (best is None or ranked[0] < best[0]):
+                    best = ranked
+            if best is not None and best[0] == 0:
+                break
+        return best[1] if best is not None else None
+
+
+def _trie_regex(words):
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+    return _node_regex(trie)
+
+
+def _node_regex(node):
+    branches = [re.escape(char) + _node_regex(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        # Greedy optional: the longest rule at a position is tried first.
+        return f"(?:{body})?"
+    return body
+
+
+default_matcher = RuleMatcher(DEFAULT_RULES)
+
+
+def load_rules(user_id):
+    """
+    Read a user's rules followed by the global ones, in priority order.
+
+    Returns:
+        list[tuple]: (pattern, category) pairs.
+    """
+    owner = CategoryRule.user_id == user_id if user_id is not None else CategoryRule.user_id.is_(None)
+    query = (
+        select(CategoryRule.pattern, CategoryRule.category)
+        .where(or_(owner, CategoryRule.user_id.is_(None)))
+        # User rules first (NULLs sort last), then longer patterns before shorter ones.
+        .order_by(CategoryRule.user_id.is_(None), db.func.length(CategoryRule.pattern).desc(), CategoryRule.id)
+    )
+    return [tuple(row) for row in db.session.execute(query)]
+
+
+def matcher_for_user(user_id):
+    """
+    Return the compiled matcher for a user's and the global rules.
+
+    Matchers are cached per user for RULE_CACHE_TTL seconds and dropped by
+    invalidate_rules() whenever a rule changes in this process; the TTL
+    bounds staleness across processes.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(user_id)
+        if cached is not None and cached[0] > now:
+            _cache.move_to_end(user_id)
+            return cached[1]
+
+    matcher = RuleMatcher(load_rules(user_id))
+    with _cache_lock:
+        _cache[user_id] = (now + RULE_CACHE_TTL, matcher)
+        _cache.move_to_end(user_id)
+        while len(_cache) > RULE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return matcher
+
+
+def invalidate_rules(user_id=None):
+    """
+    Drop cached matchers: one user's after a personal rule changes, all after a global one does.
+    """
+    with _cache_lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+
+
+def match_rules(description, user_id=None):
+    """
+    Match a description against the stored rules for a user.
+
+    Returns:
+        str | None: The rule's category, or None when nothing matched or no app context is active.
+    """
+    if not description or not has_app_context():
+        return None
+    return matcher_for_user(user_id).match(description)
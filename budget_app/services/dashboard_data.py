@@ -0,0 +1,118 @@
+# dashboard_data.py
+# Aggregated dashboard data read from rollups and LIMIT queries instead of every ORM row
+
+from datetime import date, datetime
+from sqlalchemy import func
+from ..models import Income, Expense, MonthlyRollup
+from .. import db
+from .rollups import rollup_currency_totals, rollup_monthly_totals
+
+RECENT_TRANSACTION_LIMIT = 8
+TOP_CATEGORY_LIMIT = 4
+
+
+def top_categories(user_id, limit=TOP_CATEGORY_LIMIT):
+    """
+    Return the expense categories with the highest total spend, read from the monthly rollups.
+
+    Args:
+        user_id (int): ID of the user whose expenses are ranked.
+        limit (int): Number of categories to return.
+
+    Returns:
+        list: (category, total) tuples ordered by total, highest first.
+    """
+    total = func.sum(MonthlyRollup.total)
+    rows = (
+        db.session.query(MonthlyRollup.category, total)
+        .filter(MonthlyRollup.user_id == user_id, MonthlyRollup.kind == 'expense')
+        .group_by(MonthlyRollup.category)
+        .order_by(total.desc(), MonthlyRollup.category)
+        .limit(limit)
+        .all()
+    )
+    return [(name, value or 0.0) for name, value in rows]
+
+
+def recent_transactions(user_id, limit=RECENT_TRANSACTION_LIMIT):
+    """
+    Return the latest income and expense entries as one timeline.
+
+    Each table is read with ORDER BY date DESC LIMIT ``limit`` so at most
+    ``2 * limit`` rows are loaded before the two feeds are merged.
+
+    Args:
+        user_id (int): ID of the user whose activity is listed.
+        limit (int): Number of timeline items to return.
+
+    Returns:
+        list: Timeline dictionaries ordered from newest to oldest.
+    """
+    timeline = []
+
+    incomes = (
+        db.session.query(Income.id, Income.source, Income.description, Income.amount, Income.currency_code, Income.date)
+        .filter(Income.user_id == user_id)
+        .order_by(Income.date.desc(), Income.id.desc())
+        .limit(limit)
+        .all()
+    )
+    for income in incomes:
+        timeline.append({
+            'kind': 'income',
+            'title': income.source,
+            'description': income.description or 'Income added',
+            'amount': income.amount,
+            'currency_code': income.currency_code or 'USD',
+            'date': income.date,
+        })
+
+    expenses = (
+        db.session.query(Expense.id, Expense.category, Expense.description, Expense.amount, Expense.currency_code, Expense.date)
+        .filter(Expense.user_id == user_id)
+        .order_by(Expense.date.desc(), Expense.id.desc())
+        .limit(limit)
+        .all()
+    )
+    for expense in expenses:
+        timeline.append({
+            'kind': 'expense',
+            'title': expense.category,
+            'description': expense.description or 'Expense logged',
+            'amount': expense.amount,
+            'currency_code': expense.currency_code or 'USD',
+            'date': expense.date,
+        })
+
+    timeline.sort(key=lambda item: _normalize_sort_date(item['date']), reverse=True)
+    return timeline[:limit]
+
+
+def load_dashboard_data(user_id):
+    """
+    Collect everything the dashboard needs. Totals come from the monthly rollups,
+    so the cost depends on the number of months rather than the number of entries.
+
+    Args:
+        user_id (int): ID of the user viewing the dashboard.
+
+    Returns:
+        dict: Currency totals, monthly buckets, top categories and recent transactions.
+    """
+    return {
+        'income_totals': rollup_currency_totals(user_id, 'income'),
+        'expense_totals': rollup_currency_totals(user_id, 'expense'),
+        'monthly_totals': rollup_monthly_totals(user_id),
+        'top_categories': top_categories(user_id),
+        'recent_transactions': recent_transactions(user_id),
+    }
+
+
+def _normalize_sort_date(value):
+    if value is None:
+        return datetime.min
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, datetime.min.time())
+    return datetime.min
@@ -0,0 +1,242 @@
+# exchange_rates.py
+# Exchange rates read from the ExchangeRate table through an in-process cache, plus vectorised conversion
+
+import csv
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from sqlalchemy import and_, or_, select
+from ..currencies import CURRENCY_SYMBOLS
+from ..models import ExchangeRate
+from .. import db
+from .upserts import upsert_insert
+
+RATE_CACHE_SIZE = 4096
+RATE_CACHE_TTL = 300.0
+PIVOT_CURRENCY = 'USD'  # pairs without a stored rate are crossed through this currency
+RATE_COLUMNS = ('date', 'base', 'quote', 'rate')
+IMPORT_CHUNK_SIZE = 500  # rows per multi-row INSERT, well under SQLite's bind-parameter limit
+
+_cache = OrderedDict()  # (date, base, quote) -> (expires_at, rate or None)
+_cache_lock = threading.Lock()
+
+
+def rate_for(base, quote, day=None):
+    """
+    Return how many units of ``quote`` one unit of ``base`` is worth on ``day``.
+
+    The latest stored rate on or before ``day`` is used, read directly or
+    inverted from the opposite pair, and otherwise crossed through
+    PIVOT_CURRENCY. Lookups, including misses, are cached per
+    (date, base, quote) for RATE_CACHE_TTL seconds; import_rates() clears the
+    cache in this process and the TTL bounds staleness across processes.
+
+    Args:
+        base (str): Currency being converted from.
+        quote (str): Currency being converted to.
+        day (datetime.date | None): Rate date; defaults to today (UTC).
+
+    Returns:
+        float | None: The rate, or None when no rate is known.
+    """
+    if base == quote:
+        return 1.0
+    day = _as_date(day)
+    key = (day, base, quote)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] > now:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    rate = _stored_rate(base, quote, day)
+    if rate is None and PIVOT_CURRENCY not in (base, quote):
+        to_pivot = rate_for(base, PIVOT_CURRENCY, day)
+        from_pivot = rate_for(PIVOT_CURRENCY, quote, day) if to_pivot is not None else None
+        if from_pivot is not None:
+            rate = to_pivot * from_pivot
+
+    with _cache_lock:
+        _cache[key] = (now + RATE_CACHE_TTL, rate)
+        _cache.move_to_end(key)
+        while len(_cache) > RATE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return rate
+
+
+def convert_amounts(amounts, currency_codes, quote, day=None):
+    """
+    Convert many amounts to one currency at once.
+
+    Each distinct currency is looked up once through rate_for() and the
+    amounts are multiplied by their rate in one vectorised step, so
+    converting thousands of rows costs a handful of cached lookups.
+
+    Args:
+        amounts (Sequence[float]): Amounts to convert.
+        currency_codes (Sequence[str]): Currency of each amount.
+        quote (str): Target currency.
+        day (datetime.date | None): Rate date; defaults to today (UTC).
+
+    Returns:
+        numpy.ndarray: Converted amounts, NaN where no rate is known.
+    """
+    import numpy as np
+
+    amounts = np.asarray(amounts, dtype=float)
+    if not len(amounts):
+        return amounts
+    codes, positions = np.unique(np.asarray(currency_codes, dtype=str), return_inverse=True)
+    rates = np.array([rate_for(code, quote, day) for code in codes], dtype=float)
+    return amounts * rates[positions]
+
+
+def convert_totals(totals, quote, day=None):
+    """
+    Collapse per-currency totals into one total in ``quote``.
+
+    Each currency appears once, so this looks its rate up directly instead of
+    going through convert_amounts() and NumPy; the dashboard calls it on every load.
+
+    Args:
+        totals (dict): Currency code mapped to an amount.
+        quote (str): Target currency.
+        day (datetime.date | None): Rate date; defaults to today (UTC).
+
+    Returns:
+        tuple: (total rounded to cents, sorted currency codes left out for lack of a rate).
+    """
+    total = 0.0
+    missing = []
+    for code, amount in totals.items():
+        rate = rate_for(code, quote, day)
+        if rate is None:
+            missing.append(code)
+        else:
+            total += amount * rate
+    return round(total, 2), sorted(missing)
+
+
+def import_rates(rows):
+    """
+    Insert or update exchange rates.
+
+    Rates for currencies the app does not support (a provider's JPY quote,
+    say) are skipped and counted rather than failing the whole import.
+
+    Args:
+        rows (Iterable[dict]): ``date``, ``base``, ``quote`` and ``rate`` per row.
+
+    Returns:
+        dict: ``written`` rates, ``skipped`` rows and the sorted ``unsupported`` currency codes.
+
+    Raises:
+        ValueError: When a row has a non-positive rate or a bad date.
+    """
+    values = {}
+    skipped, unsupported = 0, set()
+    for row in rows:
+        base, quote = str(row['base']).upper(), str(row['quote']).upper()
+        unknown = {code for code in (base, quote) if code not in CURRENCY_SYMBOLS}
+        if unknown:
+            skipped += 1
+            unsupported |= unknown
+            continue
+        rate = float(row['rate'])
+        if rate <= 0:
+            raise ValueError(f'Rate for {base}/{quote} must be positive.')
+        day = _as_date(row['date'])
+        values[(day, base, quote)] = {'date': day, 'base': base, 'quote': quote, 'rate': rate}
+    values = list(values.values())
+    report = {'written': len(values), 'skipped': skipped, 'unsupported': sorted(unsupported)}
+    if not values:
+        return report
+
+    insert = upsert_insert(db.session.get_bind().dialect.name)
+    if insert is not None:
+        for start in range(0, len(values), IMPORT_CHUNK_SIZE):
+            statement = insert(ExchangeRate).values(values[start:start + IMPORT_CHUNK_SIZE])
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=['base', 'quote', 'date'], set_={'rate': statement.excluded.rate},
+            ))
+    else:
+        for value in values:
+            existing = ExchangeRate.query.filter_by(date=value['date'], base=value['base'], quote=value['quote']).first()
+            if existing is None:
+                db.session.add(ExchangeRate(**value))
+            else:
+                existing.rate = value['rate']
+    db.session.commit()
+    invalidate_rates()
+    from .forecast import invalidate_forecasts  # forecast.py imports this module
+    invalidate_forecasts()
+    return report
+
+
+def load_rates_file(path):
+    """
+    Read rates from a local CSV or JSON file.
+
+    CSV files need a ``date,base,quote,rate`` header. JSON files hold a list
+    of such objects, or one or more ``{"date": ..., "base": ..., "rates": {quote: rate}}``
+    snapshots as published by most rate providers.
+
+    Returns:
+        list: Row dictionaries for import_rates().
+    """
+    with open(path, newline='', encoding='utf-8') as handle:
+        if str(path).lower().endswith('.json'):
+            return list(_json_rows(json.load(handle)))
+        reader = csv.DictReader(handle)
+        missing = [column for column in RATE_COLUMNS if column not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Missing required column(s): {', '.join(missing)}.")
+        return [{column: row[column] for column in RATE_COLUMNS} for row in reader]
+
+
+def invalidate_rates():
+    """
+    Drop every cached rate lookup.
+    """
+    with _cache_lock:
+        _cache.clear()
+
+
+def _stored_rate(base, quote, day):
+    row = db.session.execute(
+        select(ExchangeRate.base, ExchangeRate.rate)
+        .where(
+            or_(
+                and_(ExchangeRate.base == base, ExchangeRate.quote == quote),
+                and_(ExchangeRate.base == quote, ExchangeRate.quote == base),
+            ),
+            ExchangeRate.date <= day,
+        )
+        .order_by(ExchangeRate.date.desc(), (ExchangeRate.base == base).desc())
+        .limit(1)
+    ).first()
+    if row is None:
+        return None
+    return row.rate if row.base == base else 1.0 / row.rate
+
+
+def _json_rows(data):
+    for item in data if isinstance(data, list) else [data]:
+        if 'rates' in item:
+            for quote, rate in item['rates'].items():
+                yield {'date': item['date'], 'base': item['base'], 'quote': quote, 'rate': rate}
+        else:
+            yield {column: item[column] for column in RATE_COLUMNS}
+
+
+def _as_date(value):
+    if value is None:
+        return datetime.utcnow().date()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
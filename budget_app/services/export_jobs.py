@@ -0,0 +1,252 @@
+# export_jobs.py
+# Renders PDF exports on a background thread pool and caches the finished files
+
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from ..models import User
+from .. import db
+from .exports import iter_export_rows
+
+JOB_ID_PATTERN = re.compile(r'^\d{8}-\d{8}-v\d+$')
+MAX_TRACKED_JOBS = 1000
+
+# Column title, x offset and width in points on a portrait letter page.
+PDF_COLUMNS = [
+    ('Type', 'type', 40, 55),
+    ('Category', 'category', 95, 100),
+    ('Description', 'description', 195, 170),
+    ('Currency', 'currency_code', 365, 55),
+    ('Amount', 'amount', 420, 75),
+    ('Date', 'date', 495, 75),
+]
+PDF_FONT = 'Helvetica'
+PDF_FONT_SIZE = 9
+PDF_ROW_HEIGHT = 16
+PDF_TOP = 720
+PDF_BOTTOM = 50
+
+_executor = None
+_executor_lock = threading.Lock()
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def export_cache_dir(app=None):
+    """
+    Return (and create) the directory holding finished PDF exports.
+    """
+    app = app or current_app
+    path = app.config['EXPORT_CACHE_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def job_id_for(start_date, end_date, data_version):
+    """
+    Build the job id for a range; it doubles as the cache key together with the user id.
+    """
+    return f"{start_date:%Y%m%d}-{end_date:%Y%m%d}-v{data_version}"
+
+
+def job_range(job_id):
+    """
+    Return the (start_date, end_date) a job id was built from, or None when it is malformed.
+    """
+    if not JOB_ID_PATTERN.match(job_id or ''):
+        return None
+    try:
+        start, end = (datetime.strptime(part, '%Y%m%d').date() for part in job_id.split('-')[:2])
+    except ValueError:
+        return None
+    return start, end
+
+
+def job_path(user_id, job_id, app=None):
+    """
+    Return the cache path for a user's job, or None when the job id is malformed.
+    """
+    if not JOB_ID_PATTERN.match(job_id or ''):
+        return None
+    return os.path.join(export_cache_dir(app), f"{user_id}-{job_id}.pdf")
+
+
+def submit_pdf_export(user, start_date, end_date):
+    """
+    Queue a PDF export and return its job id immediately.
+
+    If the user's data has not changed since a previous export of the same
+    range, the cached file is reused and no work is queued.
+
+    Args:
+        user (User): Owner of the export.
+        start_date (datetime.date): First day to include.
+        end_date (datetime.date): Last day to include.
+
+    Returns:
+        str: Job id to poll with job_status().
+    """
+    app = current_app._get_current_object()
+    data_version = db.session.query(User.data_version).filter(User.id == user.id).scalar() or 0
+    job_id = job_id_for(start_date, end_date, data_version)
+    path = job_path(user.id, job_id, app)
+    key = (user.id, job_id)
+
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job and job['status'] in ('queued', 'running'):
+            return job_id
+        if os.path.exists(path):
+            _jobs[key] = {'status': 'done', 'error': None}
+            return job_id
+        _prune_finished_jobs()
+        _jobs[key] = {'status': 'queued', 'error': None}
+
+    _get_executor(app).submit(
+        _run_pdf_export, app, key, user.id, user.username, start_date, end_date, path
+    )
+    return job_id
+
+
+def job_status(user_id, job_id):
+    """
+    Report the state of a user's export job.
+
+    The job registry lives in this process only. A job queued by another
+    worker, or lost to a restart, is 'done' once its file is in the cache
+    and unknown (None) until then; callers resubmit unknown jobs.
+
+    Returns:
+        str | None: 'queued', 'running', 'done' or 'failed'; None for unknown jobs.
+    """
+    path = job_path(user_id, job_id)
+    if path is None:
+        return None
+    with _jobs_lock:
+        job = _jobs.get((user_id, job_id))
+    # Finished files are shared by every worker and survive restarts; the registry is not.
+    if os.path.exists(path):
+        return 'done'
+    return job['status'] if job else None
+
+
+def render_pdf(path, title, subtitle, rows):
+    """
+    Draw export rows as a paginated table with a repeated header row.
+
+    Each row is drawn once at a fixed position, so rendering time grows
+    linearly with the number of rows.
+
+    Args:
+        path (str): Destination file.
+        title (str): Heading on the first page.
+        subtitle (str): Line under the heading.
+        rows (iterable): Export rows keyed by the PDF_COLUMNS field names.
+
+    Returns:
+        int: Number of pages written.
+    """
+    # reportlab is only needed by export workers; keep it out of web-process startup.
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.pdfgen import canvas
+
+    pdf = canvas.Canvas(path, pagesize=letter)
+    page = 1
+    pdf.setFont('Helvetica-Bold', 13)
+    pdf.drawString(40, 755, title)
+    pdf.setFont(PDF_FONT, PDF_FONT_SIZE)
+    pdf.drawString(40, 740, subtitle)
+    y = _draw_table_header(pdf, PDF_TOP)
+
+    for row in rows:
+        if y < PDF_BOTTOM:
+            _draw_page_number(pdf, page)
+            pdf.showPage()
+            page += 1
+            y = _draw_table_header(pdf, 750)
+        for _, field, x, width in PDF_COLUMNS:
+            value = row[field]
+            text = f"{value:.2f}" if field == 'amount' and value is not None else str(value if value is not None else '')
+            pdf.drawString(x, y, _fit(text, width, stringWidth))
+        y -= PDF_ROW_HEIGHT
+
+    _draw_page_number(pdf, page)
+    pdf.showPage()
+    pdf.save()
+    return page
+
+
+def _run_pdf_export(app, key, user_id, username, start_date, end_date, path):
+    with _jobs_lock:
+        _jobs[key]['status'] = 'running'
+    # Another worker may render the same job after a resubmit; each writes its own temp file.
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with app.app_context():
+            rows = iter_export_rows(user_id, start_date, end_date)
+            render_pdf(temp_path, f"Financial Data Export - {start_date} to {end_date}", f"User: {username}", rows)
+            db.session.remove()
+        os.replace(temp_path, path)
+        _remove_stale_versions(path)
+        status, error = 'done', None
+    except Exception as exc:  # reported through job_status
+        app.logger.exception('PDF export %s failed.', key)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        status, error = 'failed', str(exc)
+    with _jobs_lock:
+        _jobs[key] = {'status': status, 'error': error}
+
+
+def _prune_finished_jobs():
+    if len(_jobs) < MAX_TRACKED_JOBS:
+        return
+    for key in [key for key, job in _jobs.items() if job['status'] in ('done', 'failed')]:
+        del _jobs[key]
+
+
+def _remove_stale_versions(path):
+    directory, filename = os.path.split(path)
+    prefix = filename.rsplit('-v', 1)[0] + '-v'
+    for existing in os.listdir(directory):
+        if existing.startswith(prefix) and existing.endswith('.pdf') and existing != filename:
+            try:
+                os.remove(os.path.join(directory, existing))
+            except OSError:
+                pass
+
+
+def _draw_table_header(pdf, y):
+    pdf.setFont('Helvetica-Bold', PDF_FONT_SIZE)
+    for title, _, x, _ in PDF_COLUMNS:
+        pdf.drawString(x, y, title)
+    pdf.line(40, y - 4, 570, y - 4)
+    pdf.setFont(PDF_FONT, PDF_FONT_SIZE)
+    return y - PDF_ROW_HEIGHT
+
+
+def _draw_page_number(pdf, page):
+    pdf.drawRightString(570, 30, f"Page {page}")
+
+
+def _fit(text, width, string_width):
+    if string_width(text, PDF_FONT, PDF_FONT_SIZE) <= width - 4:
+        return text
+    while text and string_width(text + '...', PDF_FONT, PDF_FONT_SIZE) > width - 4:
+        text = text[:-1]
+    return text + '...'
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('EXPORT_JOB_WORKERS', 2),
+                thread_name_prefix='pdf-export',
+            )
+        return _executor
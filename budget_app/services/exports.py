@@ -0,0 +1,113 @@
+# exports.py
+# Streams income and expense rows for the /export route without materializing them
+
+import csv
+import json
+from datetime import datetime, timedelta
+from io import StringIO
+from sqlalchemy import select
+from ..models import Income, Expense
+from .. import db
+
+EXPORT_FIELDS = ['type', 'category', 'description', 'amount', 'currency_code', 'date']
+YIELD_PER = 1000
+FLUSH_BYTES = 64 * 1024
+
+
+def iter_export_rows(user_id, start_date, end_date, yield_per=YIELD_PER):
+    """
+    Yield export rows for a user's expenses and incomes within a date range.
+
+    Rows are fetched with ``yield_per`` (a server-side cursor on PostgreSQL),
+    so only one batch of rows is held in memory at a time.
+
+    Args:
+        user_id (int): Owner of the records.
+        start_date (datetime.date): First day to include.
+        end_date (datetime.date): Last day to include.
+        yield_per (int): Number of rows fetched from the database per batch.
+
+    Yields:
+        dict: One row keyed by EXPORT_FIELDS.
+    """
+    expense_query = (
+        select(Expense.category, Expense.description, Expense.amount, Expense.currency_code, Expense.date)
+        .where(
+            Expense.user_id == user_id,
+            Expense.date >= start_date,
+            Expense.date < end_date + timedelta(days=1),
+        )
+        .order_by(Expense.date, Expense.id)
+        .execution_options(yield_per=yield_per)
+    )
+    for category, description, amount, currency_code, entry_date in db.session.execute(expense_query):
+        yield {
+            'type': 'Expense',
+            'category': category,
+            'description': description or '',
+            'amount': amount,
+            'currency_code': currency_code or 'USD',
+            'date': _format_date(entry_date),
+        }
+
+    income_query = (
+        select(Income.source, Income.description, Income.amount, Income.currency_code, Income.date)
+        .where(
+            Income.user_id == user_id,
+            Income.date >= start_date,
+            Income.date <= end_date,
+        )
+        .order_by(Income.date, Income.id)
+        .execution_options(yield_per=yield_per)
+    )
+    for source, description, amount, currency_code, entry_date in db.session.execute(income_query):
+        yield {
+            'type': 'Income',
+            'category': source,
+            'description': description or '',
+            'amount': amount,
+            'currency_code': currency_code or 'USD',
+            'date': _format_date(entry_date),
+        }
+
+
+def stream_csv(rows, flush_bytes=FLUSH_BYTES):
+    """
+    Encode rows as CSV, yielding UTF-8 chunks of roughly ``flush_bytes``.
+    """
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= flush_bytes:
+            yield _drain(buffer)
+    if buffer.tell():
+        yield _drain(buffer)
+
+
+def stream_ndjson(rows, flush_bytes=FLUSH_BYTES):
+    """
+    Encode rows as newline-delimited JSON, yielding UTF-8 chunks of roughly ``flush_bytes``.
+    """
+    buffer = StringIO()
+    for row in rows:
+        buffer.write(json.dumps(row, default=str))
+        buffer.write('\n')
+        if buffer.tell() >= flush_bytes:
+            yield _drain(buffer)
+    if buffer.tell():
+        yield _drain(buffer)
+
+
+def _drain(buffer):
+    chunk = buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate(0)
+    return chunk
+
+
+def _format_date(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    return str(value)
@@ -0,0 +1,201 @@
+# forecast.py
+# Projects a user's daily balance from their recurring schedules with NumPy date arithmetic
+
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+import numpy as np
+from sqlalchemy import func, select
+from ..models import MonthlyRollup, RecurringTransaction, User
+from .. import db
+from .exchange_rates import convert_totals, rate_for
+from .recurring_expenses import add_months
+
+DEFAULT_FORECAST_MONTHS = 12
+MAX_FORECAST_MONTHS = 60
+FORECAST_CACHE_SIZE = 256
+SCHEDULE_CURRENCY = 'USD'  # recurring occurrences are posted in USD
+DAY_STEPS = {'daily': 1, 'weekly': 7}
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+_cache = OrderedDict()  # (user_id, data_version, start, months, currency_code) -> forecast dict
+_cache_lock = threading.Lock()
+
+
+def forecast_balances(user_id, months=DEFAULT_FORECAST_MONTHS, start=None, currency_code=SCHEDULE_CURRENCY):
+    """
+    Project a user's daily balance for the next ``months`` months.
+
+    The starting balance is income minus expenses from the monthly rollups,
+    converted per currency into ``currency_code`` with convert_totals();
+    currencies without a rate are left out and listed in ``missing_currencies``.
+    Recurring schedules are turned into per-day cash flows with vectorised
+    datetime64 arithmetic, one batch per interval (see _schedule_flows()), and
+    the balance is the running sum of those flows. There are no per-schedule
+    or per-day Python loops. Occurrences already due before ``start`` are
+    counted on the first day, since the next scheduler run posts them.
+
+    Results are cached per (user, data version, start, months, currency).
+    Rollup writes and scheduler runs bump the data version, and rate imports
+    clear the cache, so a cached forecast is never served after the user's
+    data or the rates have changed.
+
+    Args:
+        user_id (int): ID of the user whose balance is projected.
+        months (int): Forecast horizon, capped at MAX_FORECAST_MONTHS.
+        start (datetime.date | None): First forecast day; defaults to today (UTC).
+        currency_code (str): Currency to report in, usually the user's preferred one.
+            Without a rate from SCHEDULE_CURRENCY the forecast stays in SCHEDULE_CURRENCY.
+
+    Returns:
+        dict: ``dates`` (datetime64[D] array), ``balances`` (float array, end-of-day),
+        ``flows`` (float array, net change per day) and summary figures. The arrays are read-only.
+    """
+    months = max(1, min(int(months), MAX_FORECAST_MONTHS))
+    start = start or datetime.utcnow().date()
+    data_version = db.session.execute(select(User.data_version).where(User.id == user_id)).scalar() or 0
+    key = (user_id, data_version, start, months, currency_code)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+
+    forecast = build_forecast(user_id, start, months, currency_code)
+    with _cache_lock:
+        _cache[key] = forecast
+        _cache.move_to_end(key)
+        while len(_cache) > FORECAST_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return forecast
+
+
+def build_forecast(user_id, start, months, currency_code=SCHEDULE_CURRENCY):
+    """
+    Compute a forecast without the cache. See forecast_balances().
+    """
+    schedule_rate = rate_for(SCHEDULE_CURRENCY, currency_code, start)
+    if schedule_rate is None:
+        currency_code, schedule_rate = SCHEDULE_CURRENCY, 1.0
+    end = add_months(start, months)
+    first_day = np.datetime64(start, 'D')
+    days = int((np.datetime64(end, 'D') - first_day).astype(int))
+
+    schedules = db.session.execute(
+        select(RecurringTransaction.type, RecurringTransaction.amount, RecurringTransaction.interval,
+               RecurringTransaction.next_date, RecurringTransaction.anchor_day)
+        .where(RecurringTransaction.user_id == user_id, RecurringTransaction.next_date.is_not(None))
+    ).all()
+
+    income = np.zeros(days)
+    expenses = np.zeros(days)
+    if schedules:
+        kinds, amounts, intervals, next_dates, anchor_days = zip(*schedules)
+        is_income = np.array(kinds) == 'income'
+        amounts = np.array(amounts, dtype=float)
+        intervals = np.array(intervals)
+        # date -> datetime64[D] through day ordinals, much cheaper than converting date objects.
+        firsts = (np.fromiter((value.toordinal() for value in next_dates), np.int64, len(next_dates))
+                  - EPOCH_ORDINAL).astype('datetime64[D]')
+        anchors = np.array([day or 0 for day in anchor_days], dtype=np.int64)
+        for interval in ('daily', 'weekly', 'monthly'):
+            mask = intervals == interval
+            if not mask.any():
+                continue
+            income += _schedule_flows(interval, firsts[mask], np.where(is_income[mask], amounts[mask], 0.0),
+                                      first_day, days, anchors[mask])
+            expenses += _schedule_flows(interval, firsts[mask], np.where(is_income[mask], 0.0, amounts[mask]),
+                                        first_day, days, anchors[mask])
+
+    net_totals = {}
+    for kind, code, total in db.session.execute(
+        select(MonthlyRollup.kind, MonthlyRollup.currency_code, func.sum(MonthlyRollup.total))
+        .where(MonthlyRollup.user_id == user_id)
+        .group_by(MonthlyRollup.kind, MonthlyRollup.currency_code)
+    ):
+        net_totals[code] = net_totals.get(code, 0.0) + (total or 0.0) * (1 if kind == 'income' else -1)
+    starting_balance, missing_currencies = convert_totals(net_totals, currency_code, start)
+    income *= schedule_rate
+    expenses *= schedule_rate
+    flows = income - expenses
+    balances = starting_balance + np.cumsum(flows)
+    dates = first_day + np.arange(days)
+    lowest = int(np.argmin(balances))
+    for array in (dates, balances, flows):
+        array.flags.writeable = False
+
+    return {
+        'currency_code': currency_code,
+        'missing_currencies': missing_currencies,
+        'start': start,
+        'end': end,
+        'dates': dates,
+        'balances': balances,
+        'flows': flows,
+        'starting_balance': starting_balance,
+        'ending_balance': round(float(balances[-1]), 2),
+        'lowest_balance': round(float(balances[lowest]), 2),
+        'lowest_date': dates[lowest].astype(date),
+        'income': round(float(income.sum()), 2),
+        'expenses': round(float(expenses.sum()), 2),
+        'schedules': len(schedules),
+    }
+
+
+def invalidate_forecasts(user_id=None):
+    """
+    Drop cached forecasts for one user, or all of them.
+    """
+    with _cache_lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            for key in [key for key in _cache if key[0] == user_id]:
+                del _cache[key]
+
+
+def _schedule_flows(interval, firsts, amounts, first_day, days, anchors=None):
+    """
+    Sum the amounts of schedules sharing one interval per forecast day.
+
+    Daily and weekly schedules are never expanded: each adds its amount once
+    at its first day in the horizon, and a cumulative sum down the columns of
+    a (weeks, step) view repeats it every ``step`` days. Monthly schedules are
+    expanded to one occurrence per month (on the anchor day, or the first
+    occurrence's day when ``anchors`` holds 0, clamped to shorter months, matching
+    recurring_expenses.due_occurrences()). Occurrences
+    before ``first_day`` are counted, not expanded, and land on day 0.
+
+    Returns:
+        numpy.ndarray: ``days`` floats.
+    """
+    if interval in DAY_STEPS:
+        step = DAY_STEPS[interval]
+        offsets = (firsts - first_day).astype(np.int64)
+        overdue = np.maximum(-offsets + step - 1, 0) // step
+        first_index = offsets + step * overdue
+        upcoming = first_index < days
+        rows = -(-days // step)
+        starts = np.bincount(first_index[upcoming], weights=amounts[upcoming], minlength=rows * step)
+        flows = starts.reshape(rows, step).cumsum(axis=0).ravel()[:days]
+        flows[0] += float(np.dot(overdue, amounts))
+        return flows
+
+    first_months = firsts.astype('datetime64[M]')
+    day_of_month = (firsts - first_months.astype('datetime64[D]')).astype(np.int64)
+    if anchors is not None:
+        day_of_month = np.where(anchors > 0, anchors - 1, day_of_month)
+    start_month = first_day.astype('datetime64[M]')
+    end_month = (first_day + days).astype('datetime64[M]')
+    skip = np.maximum((start_month - first_months).astype(np.int64), 0)
+    counts = np.maximum((end_month - first_months).astype(np.int64) + 1 - skip, 0)
+    owners = np.repeat(np.arange(len(firsts)), counts)
+    k = np.arange(len(owners)) - np.repeat(np.cumsum(counts) - counts, counts) + skip[owners]
+    month = first_months[owners] + k
+    month_start = month.astype('datetime64[D]')
+    month_length = ((month + 1).astype('datetime64[D]') - month_start).astype(np.int64)
+    day_index = (month_start + np.minimum(day_of_month[owners], month_length - 1) - first_day).astype(np.int64)
+    keep = day_index < days
+    flows = np.bincount(np.maximum(day_index[keep], 0), weights=amounts[owners[keep]], minlength=days)
+    flows[0] += float(np.dot(skip, amounts))
+    return flows
@@ -0,0 +1,397 @@
+# group_balances.py
+# Group members, the running balance ledger and the expense feed, loaded with a constant number of queries
+
+from collections import defaultdict
+from sqlalchemy import and_, case, delete, func, literal, or_, select, union_all, update
+from sqlalchemy.orm import joinedload
+from ..models import User, Group, GroupMember, SharedExpense, ExpenseShare, GroupBalance, to_minor
+from .. import db
+from .upserts import upsert_insert
+from .user_loader import user_loader
+
+CHECK_CHUNK_SIZE = 500
+
+
+def group_members(group_id):
+    """
+    Load a group's memberships with their users in one joined query and
+    register those users with the request's UserLoader.
+
+    User ids already primed on the loader that are not members (payers who
+    have left the group, for example) are then fetched in one IN query.
+
+    Args:
+        group_id (int): Group to load.
+
+    Returns:
+        list: GroupMember rows in insertion order, each with ``user`` already loaded.
+    """
+    query = (
+        select(GroupMember)
+        .options(joinedload(GroupMember.user))
+        .where(GroupMember.group_id == group_id)
+        .order_by(GroupMember.id)
+    )
+    members = list(db.session.execute(query).scalars())
+    loader = user_loader()
+    for member in members:
+        loader.add(member.user)
+    loader.get_many(member.user_id for member in members)
+    return members
+
+
+def compute_group_balances(group_ids):
+    """
+    Recompute net balances for a set of groups from SharedExpense and ExpenseShare.
+
+    A payer is credited with the full expense amount and every share holder
+    is debited with their share, so positive balances are owed money and
+    negative balances owe money. Everything is summed in one aggregate query,
+    in integer cents.
+
+    Args:
+        group_ids (list[int]): Groups to aggregate.
+
+    Returns:
+        dict: (group_id, user_id, currency_code) keys mapped to net amounts.
+    """
+    paid = (
+        select(
+            SharedExpense.group_id.label('group_id'),
+            SharedExpense.paid_by.label('user_id'),
+            func.coalesce(SharedExpense.currency_code, 'USD').label('currency_code'),
+            SharedExpense.amount.label('amount'),
+        )
+        .where(SharedExpense.group_id.in_(group_ids))
+    )
+    owed = (
+        select(
+            SharedExpense.group_id.label('group_id'),
+            ExpenseShare.user_id.label('user_id'),
+            func.coalesce(SharedExpense.currency_code, 'USD').label('currency_code'),
+            (-ExpenseShare.amount_owed).label('amount'),
+        )
+        .join(SharedExpense, SharedExpense.id == ExpenseShare.expense_id)
+        .where(SharedExpense.group_id.in_(group_ids))
+    )
+    movements = union_all(paid, owed).subquery()
+    query = (
+        select(movements.c.group_id, movements.c.user_id, movements.c.currency_code, func.sum(movements.c.amount))
+        .group_by(movements.c.group_id, movements.c.user_id, movements.c.currency_code)
+    )
+    return {
+        (group_id, user_id, currency_code): total or 0.0
+        for group_id, user_id, currency_code, total in db.session.execute(query)
+    }
+
+
+# -------------------- Balance ledger --------------------
+
+def track_shared_expense(expense, split_map, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) a shared expense from the group's balance ledger.
+    Must be called in the same transaction as the SharedExpense/ExpenseShare writes.
+
+    Args:
+        expense (SharedExpense): The expense; its payer is credited with the amount.
+        split_map (dict): user_id -> amount owed by that member.
+        sign (int): 1 to add the expense, -1 to remove it.
+    """
+    currency_code = expense.currency_code or 'USD'
+    deltas = defaultdict(float)
+    deltas[(expense.paid_by, currency_code)] += sign * (expense.amount or 0.0)
+    for user_id, amount_owed in split_map.items():
+        deltas[(user_id, currency_code)] -= sign * (amount_owed or 0.0)
+    apply_balance_deltas(expense.group_id, deltas)
+
+
+def apply_balance_deltas(group_id, deltas):
+    """
+    Adjust ledger rows for one group, creating them on first use.
+    Balances are added in integer cents, so they never pick up float drift.
+
+    On PostgreSQL and SQLite the amounts are added in SQL with one INSERT ...
+    ON CONFLICT DO UPDATE, so concurrent writers never overwrite each other's
+    balance. The group row is locked first, so two writers cannot both decide
+    to backfill the same group.
+
+    A group with no ledger rows yet (a new group, or one recorded before the
+    ledger existed) is backfilled from its raw shares instead. Must be called
+    after the change's SharedExpense/ExpenseShare writes, which the backfill
+    then already includes.
+
+    Args:
+        group_id (int): Group whose ledger changes.
+        deltas (dict): (user_id, currency_code) keys mapped to amounts to add.
+    """
+    # SQLite ignores FOR UPDATE; its writers already hold the database write lock here.
+    db.session.execute(select(Group.id).where(Group.id == group_id).with_for_update())
+    if db.session.query(GroupBalance.id).filter_by(group_id=group_id).first() is None:
+        _add_balances([
+            {'group_id': group_id, 'user_id': user_id, 'currency_code': code, 'balance': balance}
+            for (_, user_id, code), balance in sorted(compute_group_balances([group_id]).items())
+        ])
+        return
+
+    _add_balances([
+        {'group_id': group_id, 'user_id': user_id, 'currency_code': currency_code, 'balance': amount}
+        for (user_id, currency_code), amount in sorted(deltas.items())
+    ])
+
+
+def _add_balances(rows):
+    if not rows:
+        return
+    table = GroupBalance.__table__
+
+    insert = upsert_insert(db.session.get_bind().dialect.name)
+    if insert is not None:
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=['group_id', 'user_id', 'currency_code'],
+            set_={'balance': table.c.balance + statement.excluded.balance},
+        )
+        db.session.execute(statement, rows)
+        return
+
+    for row in rows:
+        result = db.session.execute(
+            update(table)
+            .where(table.c.group_id == row['group_id'], table.c.user_id == row['user_id'],
+                   table.c.currency_code == row['currency_code'])
+            .values(balance=table.c.balance + row['balance'])
+        )
+        if result.rowcount == 0:
+            db.session.execute(table.insert().values(**row))
+
+
+def ledger_balances(group_id):
+    """
+    Read a group's balances from the ledger, one row per (member, currency).
+
+    Groups that have expenses but no ledger rows yet (recorded before the
+    ledger existed) are summed from the raw shares instead; reading never
+    writes. Their ledger is backfilled by their next expense or by
+    ``flask groups check-balances --repair``.
+
+    Returns:
+        dict: {user_id: {currency_code: balance}}.
+    """
+    balances = defaultdict(dict)
+    rows = GroupBalance.query.filter_by(group_id=group_id).all()
+    if rows:
+        for row in rows:
+            balances[row.user_id][row.currency_code] = row.balance
+        return balances
+
+    for (_, user_id, currency_code), balance in compute_group_balances([group_id]).items():
+        balances[user_id][currency_code] = balance
+    return balances
+
+
+def merge_user_balances(from_user_id, to_user_id):
+    """
+    Move every ledger balance of one user onto another, e.g. when a guest invite is claimed.
+
+    On PostgreSQL and SQLite this is one INSERT ... SELECT ... ON CONFLICT DO
+    UPDATE that adds the balances onto any rows the target already has,
+    followed by one DELETE. Other backends fall back to adjusting row by row.
+    """
+    insert = upsert_insert(db.session.get_bind().dialect.name)
+    if insert is None:
+        for row in GroupBalance.query.filter_by(user_id=from_user_id).order_by(GroupBalance.id).all():
+            apply_balance_deltas(row.group_id, {(to_user_id, row.currency_code): row.balance})
+            db.session.delete(row)
+        return
+
+    moved = (
+        select(GroupBalance.group_id, literal(to_user_id), GroupBalance.currency_code, GroupBalance.balance)
+        .where(GroupBalance.user_id == from_user_id)
+        .order_by(GroupBalance.id)
+    )
+    statement = insert(GroupBalance).from_select(['group_id', 'user_id', 'currency_code', 'balance'], moved)
+    statement = statement.on_conflict_do_update(
+        index_elements=['group_id', 'user_id', 'currency_code'],
+        set_={'balance': GroupBalance.balance + statement.excluded.balance},
+    )
+    db.session.execute(statement)
+    db.session.execute(
+        delete(GroupBalance).where(GroupBalance.user_id == from_user_id).execution_options(synchronize_session=False)
+    )
+
+
+def check_group_balances(chunk_size=CHECK_CHUNK_SIZE, repair=False, group_ids=None):
+    """
+    Compare the ledger with balances recomputed from the raw shares, one chunk
+    of groups at a time, and optionally rewrite drifted groups.
+
+    Args:
+        chunk_size (int): Number of groups recomputed per transaction.
+        repair (bool): Rewrite the ledger of groups with drift when True.
+        group_ids (list[int] | None): Restrict the run to these groups.
+
+    Returns:
+        dict: Counters for groups scanned, groups with drift and drifted keys.
+    """
+    report = {'groups': 0, 'drifted_groups': 0, 'drifted_keys': 0}
+    last_id = 0
+
+    while True:
+        query = db.session.query(Group.id).filter(Group.id > last_id)
+        if group_ids is not None:
+            query = query.filter(Group.id.in_(group_ids))
+        chunk = [row.id for row in query.order_by(Group.id).limit(chunk_size).all()]
+        if not chunk:
+            break
+        last_id = chunk[-1]
+        report['groups'] += len(chunk)
+
+        expected = compute_group_balances(chunk)
+        actual = {
+            (row.group_id, row.user_id, row.currency_code): row.balance
+            for row in GroupBalance.query.filter(GroupBalance.group_id.in_(chunk)).all()
+        }
+        drifted_keys = {
+            key for key in set(expected) | set(actual)
+            if to_minor(expected.get(key)) != to_minor(actual.get(key)) or (key in expected and key not in actual)
+        }
+        drifted_groups = sorted({key[0] for key in drifted_keys})
+        report['drifted_keys'] += len(drifted_keys)
+        report['drifted_groups'] += len(drifted_groups)
+
+        if repair and drifted_groups:
+            GroupBalance.query.filter(GroupBalance.group_id.in_(drifted_groups)).delete(synchronize_session=False)
+            rows = [
+                {'group_id': group_id, 'user_id': user_id, 'currency_code': code, 'balance': balance}
+                for (group_id, user_id, code), balance in expected.items()
+                if group_id in drifted_groups
+            ]
+            if rows:
+                db.session.execute(GroupBalance.__table__.insert(), rows)
+        db.session.commit()
+
+    return report
+
+
+# -------------------- Feed and summaries --------------------
+
+def group_expense_feed(group_id):
+    """
+    Return a group's expenses, newest first, with their share totals aggregated in SQL.
+
+    Args:
+        group_id (int): Group to read.
+
+    Returns:
+        list: Rows with the SharedExpense columns plus ``share_total`` and ``share_count``.
+    """
+    query = (
+        select(
+            SharedExpense.id,
+            SharedExpense.description,
+            SharedExpense.amount,
+            SharedExpense.currency_code,
+            SharedExpense.split_method,
+            SharedExpense.paid_by,
+            SharedExpense.created_at,
+            func.coalesce(func.sum(ExpenseShare.amount_owed), 0.0).label('share_total'),
+            func.count(ExpenseShare.id).label('share_count'),
+        )
+        .outerjoin(ExpenseShare, ExpenseShare.expense_id == SharedExpense.id)
+        .where(SharedExpense.group_id == group_id)
+        .group_by(SharedExpense.id)
+        .order_by(SharedExpense.created_at.desc().nulls_last(), SharedExpense.id)
+    )
+    return db.session.execute(query).all()
+
+
+def group_summaries(user_id):
+    """
+    Summarize every group a user belongs to or created, in one grouped statement.
+
+    The statement returns one row per (group, currency); groups without
+    expenses come back as a single row with no currency. The rows are folded
+    into one summary per group here.
+
+    Args:
+        user_id (int): User whose groups are listed.
+
+    Returns:
+        list: Dicts with ``id``, ``name``, ``created_at``, ``member_count``,
+        ``expense_count``, ``currencies`` and ``net`` ({currency_code: amount},
+        positive when the user is owed money), ordered by group id.
+    """
+    visible = (
+        select(Group.id)
+        .where(or_(
+            Group.created_by == user_id,
+            Group.id.in_(select(GroupMember.group_id).where(GroupMember.user_id == user_id)),
+        ))
+        .cte('visible_groups')
+    )
+    member_counts = (
+        select(GroupMember.group_id, func.count(GroupMember.id).label('member_count'))
+        .join(User, User.id == GroupMember.user_id)
+        .where(GroupMember.group_id.in_(select(visible.c.id)))
+        .group_by(GroupMember.group_id)
+        .subquery()
+    )
+    currency_code = func.coalesce(SharedExpense.currency_code, 'USD')
+    expense_stats = (
+        select(
+            SharedExpense.group_id,
+            currency_code.label('currency_code'),
+            func.count(SharedExpense.id).label('expense_count'),
+            func.sum(case((SharedExpense.paid_by == user_id, SharedExpense.amount), else_=0.0)).label('paid'),
+        )
+        .where(SharedExpense.group_id.in_(select(visible.c.id)))
+        .group_by(SharedExpense.group_id, currency_code)
+        .subquery()
+    )
+    owed_stats = (
+        select(
+            SharedExpense.group_id,
+            currency_code.label('currency_code'),
+            func.sum(ExpenseShare.amount_owed).label('owed'),
+        )
+        .join(SharedExpense, SharedExpense.id == ExpenseShare.expense_id)
+        .where(ExpenseShare.user_id == user_id, SharedExpense.group_id.in_(select(visible.c.id)))
+        .group_by(SharedExpense.group_id, currency_code)
+        .subquery()
+    )
+    query = (
+        select(
+            Group.id,
+            Group.name,
+            Group.created_at,
+            func.coalesce(member_counts.c.member_count, 0),
+            expense_stats.c.currency_code,
+            func.coalesce(expense_stats.c.expense_count, 0),
+            func.coalesce(expense_stats.c.paid, 0.0) - func.coalesce(owed_stats.c.owed, 0.0),
+        )
+        .outerjoin(member_counts, member_counts.c.group_id == Group.id)
+        .outerjoin(expense_stats, expense_stats.c.group_id == Group.id)
+        .outerjoin(owed_stats, and_(
+            owed_stats.c.group_id == expense_stats.c.group_id,
+            owed_stats.c.currency_code == expense_stats.c.currency_code,
+        ))
+        .where(Group.id.in_(select(visible.c.id)))
+        .order_by(Group.id, expense_stats.c.currency_code)
+    )
+
+    summaries = {}
+    for group_id, name, created_at, member_count, code, expense_count, net in db.session.execute(query):
+        summary = summaries.setdefault(group_id, {
+            'id': group_id,
+            'name': name,
+            'created_at': created_at,
+            'member_count': member_count,
+            'expense_count': 0,
+            'currencies': [],
+            'net': {},
+        })
+        if code is not None:
+            summary['expense_count'] += expense_count
+            summary['currencies'].append(code)
+            summary['net'][code] = net or 0.0
+    return list(summaries.values())
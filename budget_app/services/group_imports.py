@@ -0,0 +1,202 @@
+# group_imports.py
+# Validates a CSV of shared expenses in full, then inserts every row in one transaction
+
+import csv
+import math
+from collections import defaultdict
+from datetime import datetime
+from io import StringIO
+from sqlalchemy import insert
+from ..currencies import CURRENCY_SYMBOLS
+from ..models import SharedExpense, ExpenseShare, from_minor, to_minor
+from .. import db
+from .group_balances import apply_balance_deltas, group_members
+from .splits import SPLIT_METHODS, compute_split
+
+MAX_IMPORT_ROWS = 5000
+REQUIRED_COLUMNS = ('description', 'amount', 'paid_by')
+OPTIONAL_COLUMNS = ('currency_code', 'split_method', 'shares', 'date')
+
+
+def import_shared_expenses(group, data, default_currency='USD', dry_run=False):
+    """
+    Import shared expenses for a group from CSV.
+
+    Columns: description, amount, paid_by (member username or display name)
+    and optionally currency_code, split_method (equal/percentage/exact),
+    shares ("alice=40; bob=60", required for percentage and exact splits) and
+    date (YYYY-MM-DD).
+
+    Every row is validated and split before anything is written. If any row
+    is invalid nothing is imported and the errors are reported per line.
+    Otherwise all expenses, their shares and the balance ledger are written
+    with bulk INSERTs in a single transaction. Expense ids come back through
+    an ordered RETURNING, which is batched on PostgreSQL and runs per row on
+    SQLite (it has no insert sentinel to re-sort batched results by).
+
+    Args:
+        group (Group): Group receiving the expenses.
+        data (str | bytes): CSV text, including the header row.
+        default_currency (str): Currency for rows without one.
+        dry_run (bool): Validate only.
+
+    Returns:
+        dict: ``rows`` parsed, ``imported`` count and ``errors`` as (line, message) pairs.
+    """
+    members = [member for member in group_members(group.id) if member.user]
+    rows, errors = parse_rows(data, members, default_currency)
+    report = {'rows': len(rows) + len(errors), 'imported': 0, 'errors': errors, 'dry_run': dry_run}
+    if errors or dry_run or not rows:
+        return report
+
+    expense_ids = db.session.scalars(
+        insert(SharedExpense).returning(SharedExpense.id, sort_by_parameter_order=True),
+        [
+            {
+                'group_id': group.id,
+                'description': row['description'],
+                'amount': row['amount'],
+                'currency_code': row['currency_code'],
+                'split_method': row['split_method'],
+                'paid_by': row['paid_by'],
+                'created_at': row['created_at'],
+            }
+            for row in rows
+        ],
+    ).all()
+
+    share_rows = []
+    deltas = defaultdict(float)
+    for expense_id, row in zip(expense_ids, rows):
+        currency_code = row['currency_code']
+        deltas[(row['paid_by'], currency_code)] += row['amount']
+        for user_id, amount_owed in row['split_map'].items():
+            share_rows.append({'expense_id': expense_id, 'user_id': user_id, 'amount_owed': amount_owed})
+            deltas[(user_id, currency_code)] -= amount_owed
+    db.session.execute(insert(ExpenseShare), share_rows)
+    apply_balance_deltas(group.id, deltas)
+    db.session.commit()
+
+    report['imported'] = len(rows)
+    return report
+
+
+def parse_rows(data, members, default_currency='USD'):
+    """
+    Parse and validate CSV rows against a group's members without touching the database.
+
+    Returns:
+        tuple: (rows, errors). Each row is a dict ready for insertion with its
+        ``split_map``; errors are (line, message) pairs.
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    reader = csv.DictReader(StringIO(data))
+    columns = [name.strip().lower() for name in reader.fieldnames or []]
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        return [], [(1, f"Missing required column(s): {', '.join(missing)}.")]
+    reader.fieldnames = columns
+
+    lookup = _member_lookup(members)
+    member_ids = [member.user_id for member in members]
+    rows = []
+    errors = []
+    for line, raw in enumerate(reader, start=2):
+        if line - 1 > MAX_IMPORT_ROWS:
+            errors.append((line, f'Imports are limited to {MAX_IMPORT_ROWS} rows.'))
+            break
+        values = {key: (value or '').strip() for key, value in raw.items() if key}
+        if not any(values.values()):
+            continue
+        row, error = _parse_row(values, lookup, member_ids, default_currency)
+        if error:
+            errors.append((line, error))
+        else:
+            rows.append(row)
+    return rows, errors
+
+
+def _parse_row(values, lookup, member_ids, default_currency):
+    description = values.get('description', '')
+    if not description or len(description) > 255:
+        return None, 'Description is required and must be at most 255 characters.'
+
+    try:
+        cents = to_minor(_number(values.get('amount', '')))
+    except ValueError:
+        return None, f"Amount '{values.get('amount', '')}' is not a number."
+    if cents < 1:
+        return None, 'Amount must be at least 0.01.'
+    amount = from_minor(cents)
+
+    currency_code = (values.get('currency_code') or default_currency).upper()
+    if currency_code not in CURRENCY_SYMBOLS:
+        return None, f"Unknown currency '{currency_code}'."
+
+    paid_by, error = _resolve_member(values.get('paid_by', ''), lookup)
+    if error:
+        return None, error
+
+    split_method = (values.get('split_method') or 'equal').lower()
+    if split_method not in SPLIT_METHODS:
+        return None, f"Unknown split method '{split_method}'."
+
+    shares = {}
+    if split_method != 'equal':
+        for part in filter(None, (item.strip() for item in values.get('shares', '').split(';'))):
+            name, _, raw_value = part.rpartition('=')
+            user_id, error = _resolve_member(name, lookup)
+            if error:
+                return None, error
+            try:
+                shares[user_id] = _number(raw_value)
+            except ValueError:
+                return None, f"Share '{part}' is not a number."
+    split_map, error = compute_split(amount, split_method, member_ids, shares)
+    if error:
+        return None, error
+
+    created_at = datetime.utcnow()
+    if values.get('date'):
+        try:
+            created_at = datetime.strptime(values['date'], '%Y-%m-%d')
+        except ValueError:
+            return None, f"Date '{values['date']}' is not in YYYY-MM-DD format."
+
+    return {
+        'description': description,
+        'amount': amount,
+        'currency_code': currency_code,
+        'split_method': split_method,
+        'paid_by': paid_by,
+        'created_at': created_at,
+        'split_map': split_map,
+    }, None
+
+
+def _number(raw):
+    # float() accepts 'inf', 'nan' and '1e400', which no amount can hold.
+    value = float(raw)
+    if not math.isfinite(value):
+        raise ValueError(raw)
+    return value
+
+
+def _member_lookup(members):
+    lookup = defaultdict(set)
+    for member in members:
+        user = member.user
+        for name in (user.username, user.name):
+            if name:
+                lookup[name.strip().lower()].add(member.user_id)
+    return lookup
+
+
+def _resolve_member(name, lookup):
+    matches = lookup.get((name or '').strip().lower(), set())
+    if not matches:
+        return None, f"'{name}' is not a member of this group."
+    if len(matches) > 1:
+        return None, f"'{name}' matches more than one member; use their username."
+    return next(iter(matches)), None
@@ -0,0 +1,81 @@
+# guest_invites.py
+# Merges a guest member into the account that claims their invite with a fixed number of set-based statements
+
+from sqlalchemy import and_, delete, exists, func, select, update
+from sqlalchemy.orm import aliased
+from ..models import User, GroupMember, SharedExpense, ExpenseShare
+from .. import db
+from .group_balances import merge_user_balances
+
+
+def merge_guest_account(guest_id, user_id):
+    """
+    Move a guest's memberships, payments, shares and ledger balances onto a user.
+
+    Memberships in groups the user already belongs to are dropped; shares on
+    expenses the user already has a share in are added onto that share. The
+    work is a fixed number of UPDATE/DELETE/INSERT statements, however many
+    rows the guest has, and runs in the caller's transaction. The caller
+    deletes the guest and commits.
+
+    Both user rows are locked first, in id order, and the tables are then
+    written in a fixed order, so two claims touching the same accounts
+    cannot deadlock. (SQLite ignores FOR UPDATE; its write lock covers the
+    whole database.)
+
+    Args:
+        guest_id (int): The guest user being claimed.
+        user_id (int): The account claiming the invite.
+    """
+    db.session.execute(
+        select(User.id).where(User.id.in_([guest_id, user_id])).order_by(User.id).with_for_update()
+    ).all()
+
+    existing_member = aliased(GroupMember)
+    _execute(
+        delete(GroupMember).where(
+            GroupMember.user_id == guest_id,
+            exists().where(existing_member.group_id == GroupMember.group_id, existing_member.user_id == user_id),
+        )
+    )
+    _execute(update(GroupMember).where(GroupMember.user_id == guest_id).values(user_id=user_id))
+
+    _execute(update(SharedExpense).where(SharedExpense.paid_by == guest_id).values(paid_by=user_id))
+
+    # Shares on expenses the user already takes part in are added onto the user's (first) share.
+    guest_share = aliased(ExpenseShare)
+    user_share = aliased(ExpenseShare)
+    target_shares = (
+        select(func.min(user_share.id))
+        .where(user_share.user_id == user_id)
+        .group_by(user_share.expense_id)
+    )
+    guest_total = (
+        select(func.sum(guest_share.amount_owed))
+        .where(guest_share.expense_id == ExpenseShare.expense_id, guest_share.user_id == guest_id)
+        .scalar_subquery()
+    )
+    _execute(
+        update(ExpenseShare)
+        .where(
+            ExpenseShare.id.in_(target_shares),
+            exists().where(guest_share.expense_id == ExpenseShare.expense_id, guest_share.user_id == guest_id),
+        )
+        .values(amount_owed=ExpenseShare.amount_owed + guest_total)
+    )
+    existing_share = aliased(ExpenseShare)
+    _execute(
+        delete(ExpenseShare).where(
+            ExpenseShare.user_id == guest_id,
+            exists().where(and_(existing_share.expense_id == ExpenseShare.expense_id, existing_share.user_id == user_id)),
+        )
+    )
+    _execute(update(ExpenseShare).where(ExpenseShare.user_id == guest_id).values(user_id=user_id))
+
+    merge_user_balances(guest_id, user_id)
+    # Objects loaded before the bulk statements no longer match their rows.
+    db.session.expire_all()
+
+
+def _execute(statement):
+    return db.session.execute(statement.execution_options(synchronize_session=False))
@@ -0,0 +1,96 @@
+# import_profile.py
+# Measures what importing the web process costs, for the import-time command and the cold-start budget test
+
+import json
+import os
+import subprocess
+import sys
+
+# What api/index.py and create_app() import before the first request.
+WEB_MODULES = ('budget_app', 'budget_app.models', 'budget_app.routes', 'budget_app.commands')
+# Loaded only by the code paths that use them: picture upload, PDF export, categorization, forecasts.
+HEAVY_MODULES = ('PIL', 'cloudinary', 'reportlab', 'sklearn', 'scipy', 'numpy')
+IMPORT_TIME_BUDGET = float(os.environ.get('IMPORT_TIME_BUDGET', 1.5))  # seconds
+IMPORT_MODULE_BUDGET = int(os.environ.get('IMPORT_MODULE_BUDGET', 500))
+PACKAGE_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_PROBE = """
+import json, sys, time
+before = set(sys.modules)
+started = time.perf_counter()
+for name in sys.argv[1:]:
+    __import__(name)
+print(json.dumps({'seconds': time.perf_counter() - started, 'modules': sorted(set(sys.modules) - before)}))
+"""
+
+
+def profile_imports(modules=WEB_MODULES):
+    """
+    Import ``modules`` in a fresh interpreter and report what it cost.
+
+    The import runs in a subprocess with ``-X importtime``, so modules the
+    caller already imported (pytest, the flask CLI) cannot hide any cost.
+    Times include the small overhead of ``-X importtime`` itself.
+
+    Args:
+        modules (Sequence[str]): Modules to import, in order.
+
+    Returns:
+        dict: ``seconds`` (wall time of the imports), ``modules`` (newly
+        imported module names), ``packages`` ((top-level package, seconds,
+        module count) tuples, slowest first) and ``heavy`` (HEAVY_MODULES that
+        were imported).
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (PACKAGE_ROOT, env.get('PYTHONPATH'))))
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE, *modules],
+        capture_output=True, text=True, env=env, cwd=PACKAGE_ROOT,
+    )
+    if completed.returncode:
+        raise RuntimeError(f'Importing {", ".join(modules)} failed:\n{completed.stderr[-2000:]}')
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    imported = set(result['modules'])
+    packages = {}
+    for line in completed.stderr.splitlines():
+        # "import time:  <self us> | <cumulative us> | <indented module name>"
+        fields = line.split('|')
+        if not line.startswith('import time:') or len(fields) != 3 or not fields[0].split(':')[1].strip().isdigit():
+            continue
+        name = fields[2].strip()
+        if name not in imported:
+            continue
+        root = name.split('.')[0]
+        seconds, count = packages.get(root, (0.0, 0))
+        packages[root] = (seconds + int(fields[0].split(':')[1]) / 1e6, count + 1)
+
+    return {
+        'seconds': result['seconds'],
+        'modules': result['modules'],
+        'packages': sorted(((root, *totals) for root, totals in packages.items()), key=lambda item: -item[1]),
+        'heavy': sorted(root for root in HEAVY_MODULES if root in imported),
+    }
+
+
+def budget_problems(profile, time_budget=IMPORT_TIME_BUDGET, module_budget=IMPORT_MODULE_BUDGET):
+    """
+    Compare a profile_imports() result with the cold-start budget.
+
+    Args:
+        profile (dict): A profile_imports() result.
+        time_budget (float | None): Seconds the imports may take; None skips the
+            wall-clock check, which depends on the machine running it.
+        module_budget (int): Number of modules the imports may load.
+
+    Returns:
+        list: Messages describing each exceeded budget; empty when within budget.
+    """
+    problems = []
+    if time_budget is not None and profile['seconds'] > time_budget:
+        problems.append(f"import took {profile['seconds']:.3f}s, budget {time_budget:.3f}s")
+    if len(profile['modules']) > module_budget:
+        problems.append(f"{len(profile['modules'])} modules imported, budget {module_budget}")
+    if profile['heavy']:
+        problems.append(f"heavy dependencies imported at startup: {', '.join(profile['heavy'])}")
+    return problems
@@ -0,0 +1,87 @@
+# ledgers.py
+# Keyset (date, id) pagination for the income and expense ledgers
+
+import base64
+from datetime import date, datetime
+from sqlalchemy import and_, or_
+from .. import db
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(entry_date, entry_id):
+    """
+    Encode the (date, id) position of the last row on a page as an opaque URL token.
+    """
+    raw = f"{entry_date.isoformat() if entry_date else ''}|{entry_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, date_type=date):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): Opaque cursor from the query string.
+        date_type (type): datetime.date or datetime.datetime, matching the model's date column.
+
+    Returns:
+        tuple | None: (date, id), or None when the cursor is missing or malformed.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw_date, raw_id = base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8').split('|', 1)
+        entry_date = date_type.fromisoformat(raw_date) if raw_date else None
+        return entry_date, int(raw_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def keyset_page(model, user_id, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Fetch one ledger page ordered by (date DESC, id DESC), undated rows last.
+
+    The cursor turns into a WHERE clause on (date, id), so the database seeks
+    straight to the page instead of skipping OFFSET rows, and page N costs the
+    same as page 1. Rows without a date are read after every dated row, by id
+    alone, so they neither depend on a backend's NULL ordering nor send a
+    cursor back to the first page.
+
+    Args:
+        model (db.Model): Income or Expense.
+        user_id (int): Owner of the ledger.
+        cursor (str | None): Cursor returned for the previous page.
+        page_size (int): Number of rows per page.
+
+    Returns:
+        tuple: (rows, next_cursor); next_cursor is None on the last page.
+    """
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    date_type = datetime if isinstance(model.date.type, db.DateTime) else date
+
+    query = model.query.filter(model.user_id == user_id)
+    position = decode_cursor(cursor, date_type)
+    rows = []
+    if position is None or position[0] is not None:
+        dated = query.filter(model.date.isnot(None))
+        if position is not None:
+            last_date, last_id = position
+            dated = dated.filter(or_(
+                model.date < last_date,
+                and_(model.date == last_date, model.id < last_id),
+            ))
+        rows = dated.order_by(model.date.desc(), model.id.desc()).limit(page_size + 1).all()
+    if len(rows) <= page_size:
+        undated = query.filter(model.date.is_(None))
+        if position is not None and position[0] is None:
+            undated = undated.filter(model.id < position[1])
+        rows += undated.order_by(model.id.desc()).limit(page_size + 1 - len(rows)).all()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1].date, rows[-1].id)
+    return rows, next_cursor
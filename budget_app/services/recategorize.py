@@ -0,0 +1,106 @@
+# recategorize.py
+# Bulk re-categorization of existing expenses with one vectorized prediction per chunk
+
+import time
+from sqlalchemy import select, update
+from ..models import Expense
+from .. import db
+from ..ml_utils import category_model
+from .category_rules import matcher_for_user
+from .rollups import apply_deltas, period_for
+
+DEFAULT_CHUNK_SIZE = 5000
+DIFF_SAMPLE_LIMIT = 50
+PREVIEW_MAX_CHUNKS = 10  # the admin endpoint previews at most this many chunks per request
+DEFAULT_CATEGORIES = ('Other',)  # categories users left to the app; their own choices are kept unless asked
+
+
+def recategorize_expenses(user_id=None, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=True,
+                          only_categories=DEFAULT_CATEGORIES, diff_limit=DIFF_SAMPLE_LIMIT, max_chunks=None):
+    """
+    Re-run the category model over existing expenses and write back the changes.
+
+    By default this is a dry run over expenses still filed under 'Other';
+    overwriting categories users chose themselves takes an explicit
+    ``only_categories=None``.
+
+    Expenses are read in primary-key order, ``chunk_size`` rows at a time.
+    Each chunk costs one ``vectorizer.transform`` + ``model.predict`` call and
+    one bulk UPDATE, and is committed together with its rollup adjustments.
+    Category rules take precedence over the model, as in predict_category().
+
+    Args:
+        user_id (int | None): Only process this user's expenses; all users when None.
+        chunk_size (int): Rows per chunk.
+        dry_run (bool): Report the changes without writing them; pass False to write.
+        only_categories (list[str] | None): Only reconsider expenses currently in these
+            categories; None reconsiders every expense.
+        diff_limit (int): Maximum number of example changes returned in the report.
+        max_chunks (int | None): Stop after this many chunks; ``complete`` is then
+            False in the report. None processes every chunk.
+
+    Returns:
+        dict: Counters, throughput, ``complete`` and a sample of (id, old, new) changes.
+    """
+    loaded = category_model.get()
+    if loaded is None:
+        raise RuntimeError('No category model is available; train one with `python -m budget_app.ml_utils`.')
+    model, vectorizer = loaded
+
+    report = {'scanned': 0, 'changed': 0, 'chunks': 0, 'dry_run': dry_run, 'complete': True, 'diff': []}
+    started = time.perf_counter()
+    last_id = 0
+
+    while True:
+        query = (
+            select(Expense.id, Expense.user_id, Expense.description, Expense.category,
+                   Expense.amount, Expense.currency_code, Expense.date)
+            .where(Expense.id > last_id, Expense.description.isnot(None), Expense.description != '')
+            .order_by(Expense.id)
+            .limit(chunk_size)
+        )
+        if user_id is not None:
+            query = query.where(Expense.user_id == user_id)
+        if only_categories:
+            query = query.where(Expense.category.in_(only_categories))
+
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+        if max_chunks is not None and report['chunks'] >= max_chunks:
+            report['complete'] = False
+            break
+        last_id = rows[-1].id
+        report['chunks'] += 1
+        report['scanned'] += len(rows)
+
+        predictions = model.predict(vectorizer.transform([row.description for row in rows]))
+        changes = []
+        deltas = {}
+        for row, predicted in zip(rows, predictions):
+            predicted = matcher_for_user(row.user_id).match(row.description) or str(predicted)
+            if predicted == row.category:
+                continue
+            changes.append({'id': row.id, 'category': predicted})
+            if len(report['diff']) < diff_limit:
+                report['diff'].append((row.id, row.category, predicted))
+            period = period_for(row.date)
+            currency_code = row.currency_code or 'USD'
+            amount = row.amount or 0.0
+            for category, sign in ((row.category or 'Other', -1), (predicted, 1)):
+                key = (row.user_id, period, currency_code, category, 'expense')
+                previous_amount, previous_count = deltas.get(key, (0.0, 0))
+                deltas[key] = (previous_amount + sign * amount, previous_count + sign)
+        report['changed'] += len(changes)
+
+        if changes and not dry_run:
+            db.session.execute(update(Expense), changes)
+            apply_deltas(deltas)
+            db.session.commit()
+        else:
+            db.session.rollback()
+
+    elapsed = time.perf_counter() - started
+    report['seconds'] = round(elapsed, 3)
+    report['rows_per_second'] = round(report['scanned'] / elapsed, 1) if elapsed else 0.0
+    return report
@@ -1,9 +1,251 @@
 # recurring_expenses.py
 # Handles logic for recurring incomes and expenses (e.g., monthly rent, salary)
 
+import calendar
+import itertools
+import os
+import socket
+import time
+import uuid
 from datetime import datetime, timedelta
+from sqlalchemy import bindparam, func, or_, select, update
 from ..models import RecurringTransaction, Income, Expense
 from .. import db
+from .rollups import apply_deltas, period_for
+
+DEFAULT_CHUNK_SIZE = 5000
+MAX_OCCURRENCES_PER_RUN = 1000
+DEFAULT_LEASE_SECONDS = 300
+INTERVALS = ('daily', 'weekly', 'monthly')
+
+
+def run_recurring(now=None, chunk_size=DEFAULT_CHUNK_SIZE, user_id=None,
+                  max_occurrences=MAX_OCCURRENCES_PER_RUN, owner=None, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Generate every due occurrence of every recurring entry, across all users.
+
+    Any number of workers can run this at once. Each chunk of up to
+    ``chunk_size`` due entries is first claimed with claim_due(), which
+    leases the rows to this worker; other workers skip leased rows until the
+    lease expires. Each entry then emits one Income/Expense per missed
+    period, dated on the period it belongs to, so a schedule that was not
+    run for three months catches up with three entries. A chunk costs one
+    claim, one lease check, one bulk INSERT per table, one executemany
+    UPDATE of next_date, one batched rollup update and one commit.
+
+    Before posting, held_leases() writes the claim token back onto the
+    chunk's rows and reads back the ids this worker still holds. That write
+    locks them until the commit, and only those rows are posted and
+    advanced, so an occurrence is posted exactly once even if part of a
+    lease ran out and was taken over (the other worker posts those rows) or
+    a worker crashes (its lease expires and another worker takes the rows
+    over). This does not depend on executemany row counts, which some
+    drivers (psycopg2 in batch mode) do not report. next_date still only
+    moves forward with a compare-and-set on its old value and the claim
+    token, in the same transaction as the inserts. Entries capped by
+    ``max_occurrences`` are not claimed again by the same run, so they
+    continue on the next one.
+
+    Args:
+        now (datetime | None): Generate occurrences due at or before this time; defaults to utcnow().
+        chunk_size (int): Recurring entries per transaction.
+        user_id (int | None): Only process this user's entries.
+        max_occurrences (int): Occurrences emitted per entry per run; the rest follow on the next run.
+        owner (str | None): Worker name recorded in lease_owner; defaults to host:pid.
+        lease_seconds (float): How long a claimed chunk stays reserved for this worker.
+
+    Returns:
+        dict: Counters and throughput for the run.
+    """
+    now = now or datetime.utcnow()
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    report = {
+        'due': 0, 'occurrences': 0, 'incomes': 0, 'expenses': 0, 'skipped': 0,
+        'chunks': 0, 'lost_leases': 0,
+    }
+    started = time.perf_counter()
+    run_id = f"{owner[:40]}#{uuid.uuid4().hex[:12]}"
+
+    for sequence in itertools.count(1):
+        token = f"{run_id}#{sequence}"
+        entries = claim_due(token, now, chunk_size, user_id=user_id, lease_seconds=lease_seconds, run_id=run_id)
+        if not entries:
+            break
+        held = held_leases(token, [entry.id for entry in entries])
+        if len(held) < len(entries):
+            # Part of the claim expired and was taken over; the other worker posts those rows.
+            report['lost_leases'] += 1
+            entries = [entry for entry in entries if entry.id in held]
+
+        incomes, expenses, advances, deltas = [], [], [], {}
+        now_utc = datetime.utcnow()
+        for entry in entries:
+            # Schedules saved before anchor_day existed are anchored on their current day of month.
+            anchor_day = entry.anchor_day or (entry.next_date.day if entry.interval == 'monthly' else None)
+            occurrences, next_date = due_occurrences(
+                entry.next_date, entry.interval, now, max_occurrences, anchor_day=anchor_day
+            )
+            for occurred_at in occurrences:
+                if entry.type == 'income':
+                    row = {
+                        'amount': entry.amount, 'source': entry.category or 'Recurring Income',
+                        'date': occurred_at.date(), 'currency_code': 'USD', 'is_recurring': True,
+                        'frequency': entry.interval, 'user_id': entry.user_id,
+                    }
+                    incomes.append(row)
+                    key = (entry.user_id, period_for(occurred_at), 'USD', row['source'], 'income')
+                else:
+                    row = {
+                        'amount': entry.amount, 'category': entry.category or 'Recurring Expense',
+                        'date': occurred_at, 'currency_code': 'USD', 'is_recurring': True,
+                        'frequency': entry.interval, 'user_id': entry.user_id,
+                    }
+                    expenses.append(row)
+                    key = (entry.user_id, period_for(occurred_at), 'USD', row['category'], 'expense')
+                amount, count = deltas.get(key, (0.0, 0))
+                deltas[key] = (amount + (entry.amount or 0.0), count + 1)
+            # Entries still due after a capped catch-up keep this run's token (with an expired
+            # lease), so this run does not claim them again but any later run can.
+            released = next_date > now
+            advances.append({
+                'b_id': entry.id, 'b_old': entry.next_date, 'b_new': next_date, 'b_anchor': anchor_day,
+                'b_token': token, 'b_owner': None if released else token, 'b_expires': None if released else now_utc,
+            })
+
+        table = RecurringTransaction.__table__
+        if advances:
+            db.session.execute(
+                update(table)
+                .where(
+                    table.c.id == bindparam('b_id'),
+                    table.c.next_date == bindparam('b_old'),
+                    table.c.lease_owner == bindparam('b_token'),
+                )
+                .values(next_date=bindparam('b_new'), anchor_day=bindparam('b_anchor'),
+                        lease_owner=bindparam('b_owner'), lease_expires_at=bindparam('b_expires')),
+                advances,
+            )
+        if incomes:
+            db.session.execute(Income.__table__.insert(), incomes)
+        if expenses:
+            db.session.execute(Expense.__table__.insert(), expenses)
+        apply_deltas(deltas)
+        db.session.commit()
+
+        report['chunks'] += 1
+        report['due'] += len(advances)
+        report['incomes'] += len(incomes)
+        report['expenses'] += len(expenses)
+        report['occurrences'] += len(incomes) + len(expenses)
+
+    skipped = select(func.count(RecurringTransaction.id)).where(
+        RecurringTransaction.next_date <= now, RecurringTransaction.interval.notin_(INTERVALS)
+    )
+    if user_id is not None:
+        skipped = skipped.where(RecurringTransaction.user_id == user_id)
+    report['skipped'] = db.session.execute(skipped).scalar_one()
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    report['schedules_per_second'] = round(report['due'] / report['seconds']) if report['seconds'] else report['due']
+    return report
+
+
+def claim_due(token, now, limit, user_id=None, lease_seconds=DEFAULT_LEASE_SECONDS, run_id=None):
+    """
+    Lease up to ``limit`` due, unleased entries to a worker and return them.
+
+    The claim is one conditional UPDATE whose subquery picks due rows in
+    (next_date, id) order that nobody holds an unexpired lease on. On
+    PostgreSQL the subquery locks its rows FOR UPDATE SKIP LOCKED, so
+    concurrent workers pick disjoint chunks without waiting on each other;
+    on SQLite the single UPDATE statement is atomic under the database
+    write lock, so a row can only be leased by one of them.
+
+    Args:
+        token (str): Claim token stored in lease_owner; unique per claim.
+        now (datetime): Only entries due at or before this time are claimed.
+        limit (int): Maximum number of entries to claim.
+        user_id (int | None): Only claim this user's entries.
+        lease_seconds (float): Lease length, measured from the current UTC time.
+        run_id (str | None): Skip rows whose lease_owner was set by this run (token prefix).
+
+    Returns:
+        list: Rows with the entry columns and ``lease_expires_at``, in (next_date, id) order.
+    """
+    clock = datetime.utcnow()
+    expires_at = clock + timedelta(seconds=lease_seconds)
+    candidates = (
+        select(RecurringTransaction.id)
+        .where(
+            RecurringTransaction.next_date <= now,
+            RecurringTransaction.interval.in_(INTERVALS),
+            or_(RecurringTransaction.lease_expires_at.is_(None), RecurringTransaction.lease_expires_at < clock),
+        )
+        .order_by(RecurringTransaction.next_date, RecurringTransaction.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if user_id is not None:
+        candidates = candidates.where(RecurringTransaction.user_id == user_id)
+    if run_id is not None:
+        candidates = candidates.where(or_(
+            RecurringTransaction.lease_owner.is_(None),
+            ~RecurringTransaction.lease_owner.startswith(f"{run_id}#", autoescape=True),
+        ))
+
+    columns = (
+        RecurringTransaction.id, RecurringTransaction.type, RecurringTransaction.amount,
+        RecurringTransaction.category, RecurringTransaction.interval, RecurringTransaction.next_date,
+        RecurringTransaction.anchor_day, RecurringTransaction.user_id, RecurringTransaction.lease_expires_at,
+    )
+    claim = (
+        update(RecurringTransaction)
+        .where(RecurringTransaction.id.in_(candidates.scalar_subquery()))
+        # Re-checked by the UPDATE itself in case the row was leased after the subquery read it.
+        .where(or_(RecurringTransaction.lease_expires_at.is_(None), RecurringTransaction.lease_expires_at < clock))
+        .values(lease_owner=token, lease_expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.get_bind().dialect.update_returning:
+        entries = db.session.execute(claim.returning(*columns)).all()
+    else:
+        db.session.execute(claim)
+        entries = db.session.execute(select(*columns).where(RecurringTransaction.lease_owner == token)).all()
+    db.session.commit()
+    return sorted(entries, key=lambda entry: (entry.next_date, entry.id))
+
+
+def held_leases(token, entry_ids):
+    """
+    Return the ids among ``entry_ids`` that are still leased under ``token``.
+
+    The check is an UPDATE that writes the token back onto the rows it still
+    holds. Within the caller's transaction that write keeps those rows from
+    being claimed by another worker (row locks on PostgreSQL, the database
+    write lock on SQLite) until the caller commits or rolls back.
+
+    Args:
+        token (str): Claim token passed to claim_due().
+        entry_ids (list[int]): Ids returned by that claim.
+
+    Returns:
+        set: Ids this worker may post.
+    """
+    if not entry_ids:
+        return set()
+    check = (
+        update(RecurringTransaction)
+        .where(RecurringTransaction.id.in_(entry_ids), RecurringTransaction.lease_owner == token)
+        .values(lease_owner=token)
+        .execution_options(synchronize_session=False)
+    )
+    if db.session.get_bind().dialect.update_returning:
+        return set(db.session.execute(check.returning(RecurringTransaction.id)).scalars())
+    db.session.execute(check)
+    return set(db.session.execute(
+        select(RecurringTransaction.id)
+        .where(RecurringTransaction.id.in_(entry_ids), RecurringTransaction.lease_owner == token)
+    ).scalars())
+
 
 def process_recurring_entries(user_id):
     """
@@ -11,44 +253,63 @@ def process_recurring_entries(user_id):
 
     Args:
         user_id (int): ID of the user whose recurring entries will be processed.
+
+    Returns:
+        dict: The run report from run_recurring().
     """
-    today = datetime.utcnow()
-    
-    # Get all recurring transactions for the user
-    recurring_entries = RecurringTransaction.query.filter_by(user_id=user_id).all()
-
-    for entry in recurring_entries:
-        # Check if it's time to add the next entry
-        if entry.next_date <= today:
-            if entry.type == 'income':
-                new_entry = Income(
-                    amount=entry.amount,
-                    source=entry.category or 'Recurring Income',
-                    date=today.date(),
-                    is_recurring=True,
-                    frequency=entry.interval,
-                    user_id=user_id
-                )
-            else:
-                new_entry = Expense(
-                    amount=entry.amount,
-                    category=entry.category or 'Recurring Expense',
-                    date=today,
-                    is_recurring=True,
-                    frequency=entry.interval,
-                    user_id=user_id
-                )
-            db.session.add(new_entry)
+    return run_recurring(user_id=user_id)
 
-            # Update the next due date based on the frequency
-            if entry.interval == 'daily':
-                entry.next_date += timedelta(days=1)
-            elif entry.interval == 'weekly':
-                entry.next_date += timedelta(weeks=1)
-            elif entry.interval == 'monthly':
-                entry.next_date = add_month(entry.next_date)
 
-    db.session.commit()
+def due_occurrences(start, interval, now, limit=MAX_OCCURRENCES_PER_RUN, anchor_day=None):
+    """
+    List the occurrences of a schedule from ``start`` up to ``now``.
+
+    Monthly occurrences fall on ``anchor_day`` (``start``'s day by default),
+    clamped to shorter months, so a schedule on the 31st falls on the last
+    day of February and returns to the 31st afterwards, within a run and
+    across runs that resume from a clamped next_date.
+
+    Args:
+        start (datetime): The schedule's next due date.
+        interval (str): 'daily', 'weekly' or 'monthly'.
+        now (datetime): Upper bound, inclusive.
+        limit (int): Maximum number of occurrences to return.
+        anchor_day (int | None): Day of month for monthly schedules.
+
+    Returns:
+        tuple: (occurrences, next_date) where next_date is the first occurrence not returned.
+    """
+    occurrences = []
+    step = 0
+    current = start
+    while current <= now and len(occurrences) < limit:
+        occurrences.append(current)
+        step += 1
+        if interval == 'daily':
+            current = start + timedelta(days=step)
+        elif interval == 'weekly':
+            current = start + timedelta(weeks=step)
+        else:
+            current = add_months(start, step, day=anchor_day)
+    return occurrences, current
+
+
+def add_months(date, months, day=None):
+    """
+    Add calendar months to a date, clamping the day to the target month's length.
+
+    Args:
+        date (datetime.date | datetime.datetime): The starting date.
+        months (int): Number of months to add.
+        day (int | None): Day of month to land on instead of ``date``'s own.
+
+    Returns:
+        Same type as ``date``.
+    """
+    month_index = date.month - 1 + months
+    year = date.year + month_index // 12
+    month = month_index % 12 + 1
+    return date.replace(year=year, month=month, day=min(day or date.day, calendar.monthrange(year, month)[1]))
 
 
 def add_month(date):
@@ -59,9 +320,6 @@ def add_month(date):
         date (datetime.date): The current date.
 
     Returns:
-        datetime.date: Date incremented by one month.
+        datetime.date: Date incremented by one month (Jan 31 becomes Feb 28/29).
     """
-    if date.month == 12:
-        return date.replace(year=date.year + 1, month=1)
-    else:
-        return date.replace(month=date.month + 1)
+    return add_months(date, 1)
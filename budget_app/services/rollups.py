@@ -0,0 +1,301 @@
+# rollups.py
+# Maintains the per-user monthly rollup table and rebuilds it from the base tables
+
+from sqlalchemy import delete, extract, func, select, update
+from ..models import Income, Expense, MonthlyRollup, User, from_minor, minor_units
+from .. import db
+from .upserts import upsert_insert
+
+REBUILD_CHUNK_SIZE = 500
+ROLLUP_KEY = ('user_id', 'period', 'currency_code', 'category', 'kind')  # uq_monthly_rollup_key
+# Period of entries without a date. It must never change, or their rollup key would move every month.
+UNDATED_PERIOD = '0000-00'
+
+
+def period_for(value):
+    """
+    Return the YYYY-MM rollup period for a date or datetime.
+
+    Args:
+        value (datetime.date | datetime.datetime | None): Entry date.
+
+    Returns:
+        str: Period string; UNDATED_PERIOD for entries without a date.
+    """
+    if value is None:
+        return UNDATED_PERIOD
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def track_income(income, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) an income entry from the user's rollups.
+    Must be called in the same transaction as the Income write.
+    """
+    bump_data_version(income.user_id)
+    apply_delta(
+        income.user_id, period_for(income.date), income.currency_code or 'USD',
+        income.source or 'Other', 'income', sign * (income.amount or 0.0), sign
+    )
+
+
+def track_expense(expense, sign=1):
+    """
+    Add (sign=1) or remove (sign=-1) an expense entry from the user's rollups.
+    Must be called in the same transaction as the Expense write.
+    """
+    bump_data_version(expense.user_id)
+    apply_delta(
+        expense.user_id, period_for(expense.date), expense.currency_code or 'USD',
+        expense.category or 'Other', 'expense', sign * (expense.amount or 0.0), sign
+    )
+
+
+def apply_delta(user_id, period, currency_code, category, kind, amount, count):
+    """
+    Adjust one rollup row, creating it on first use and removing it once empty.
+
+    The row is changed with an atomic ``total = total + amount`` upsert, so
+    concurrent writers to the same key never lose each other's updates.
+
+    Args:
+        user_id (int): Owner of the entry.
+        period (str): YYYY-MM period.
+        currency_code (str): Currency of the entry.
+        category (str): Expense category or income source.
+        kind (str): 'income' or 'expense'.
+        amount (float): Amount to add to the running total.
+        count (int): Number of entries to add to the running count.
+    """
+    _write_deltas({(user_id, period, currency_code, category, kind): (amount, count)})
+
+
+def apply_deltas(deltas):
+    """
+    Apply many rollup changes at once, e.g. after a bulk UPDATE or INSERT.
+
+    Every key is added onto its row with one executemany INSERT ... ON
+    CONFLICT DO UPDATE, rows that become empty are removed with one DELETE
+    per chunk of users, and every affected user's data version is bumped
+    with one UPDATE per chunk.
+
+    Args:
+        deltas (dict): (user_id, period, currency_code, category, kind) keys mapped
+            to (amount, count) changes.
+    """
+    deltas = {key: change for key, change in deltas.items() if change[0] or change[1]}
+    _write_deltas(deltas)
+
+    user_ids = sorted({key[0] for key in deltas})
+    for start in range(0, len(user_ids), REBUILD_CHUNK_SIZE):
+        bump_data_version(user_ids[start:start + REBUILD_CHUNK_SIZE])
+
+
+def _write_deltas(deltas):
+    if not deltas:
+        return
+    table = MonthlyRollup.__table__
+    rows = [
+        {'user_id': user_id, 'period': period, 'currency_code': currency_code, 'category': category,
+         'kind': kind, 'total': amount, 'entry_count': count}
+        for (user_id, period, currency_code, category, kind), (amount, count) in sorted(deltas.items())
+    ]
+
+    insert = upsert_insert(db.session.get_bind().dialect.name)
+    if insert is not None:
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(ROLLUP_KEY),
+            set_={'total': table.c.total + statement.excluded.total,
+                  'entry_count': table.c.entry_count + statement.excluded.entry_count},
+        )
+        db.session.execute(statement, rows)
+    else:
+        for row in rows:
+            result = db.session.execute(
+                update(table).where(*(table.c[column] == row[column] for column in ROLLUP_KEY))
+                .values(total=table.c.total + row['total'], entry_count=table.c.entry_count + row['entry_count'])
+            )
+            if result.rowcount == 0:
+                db.session.execute(table.insert().values(**row))
+
+    user_ids = sorted({row['user_id'] for row in rows})
+    periods = sorted({row['period'] for row in rows})
+    for start in range(0, len(user_ids), REBUILD_CHUNK_SIZE):
+        db.session.execute(delete(table).where(
+            table.c.user_id.in_(user_ids[start:start + REBUILD_CHUNK_SIZE]),
+            table.c.period.in_(periods),
+            table.c.entry_count <= 0,
+        ))
+
+
+def bump_data_version(user_ids):
+    """
+    Increment data versions so caches keyed on them (exports, forecasts) go stale.
+
+    Args:
+        user_ids (int | list[int]): One user or a list of users.
+    """
+    if isinstance(user_ids, int):
+        user_ids = [user_ids]
+    db.session.execute(
+        update(User).where(User.id.in_(user_ids)).values(data_version=User.data_version + 1),
+        execution_options={'synchronize_session': False},
+    )
+
+
+# -------------------- Rollup reads --------------------
+
+def rollup_currency_totals(user_id, kind):
+    """
+    Sum a user's rollups per currency.
+
+    Returns:
+        dict: Currency code mapped to the total amount, sorted by currency code.
+    """
+    rows = (
+        db.session.query(MonthlyRollup.currency_code, func.sum(MonthlyRollup.total))
+        .filter(MonthlyRollup.user_id == user_id, MonthlyRollup.kind == kind)
+        .group_by(MonthlyRollup.currency_code)
+        .all()
+    )
+    return dict(sorted((code, total or 0.0) for code, total in rows))
+
+
+def rollup_monthly_totals(user_id, start_period=None, end_period=None):
+    """
+    Sum income and expense per month across all currencies and categories.
+    Entries without a date belong to no month and are left out.
+
+    Returns:
+        dict: (year, month) tuples mapped to {'income': float, 'expense': float}.
+    """
+    query = (
+        db.session.query(MonthlyRollup.period, MonthlyRollup.kind, func.sum(MonthlyRollup.total))
+        .filter(MonthlyRollup.user_id == user_id, MonthlyRollup.period != UNDATED_PERIOD)
+    )
+    if start_period:
+        query = query.filter(MonthlyRollup.period >= start_period)
+    if end_period:
+        query = query.filter(MonthlyRollup.period <= end_period)
+
+    buckets = {}
+    for period, kind, total in query.group_by(MonthlyRollup.period, MonthlyRollup.kind).all():
+        key = (int(period[:4]), int(period[5:7]))
+        buckets.setdefault(key, {'income': 0.0, 'expense': 0.0})[kind] = total or 0.0
+    return buckets
+
+
+def rollup_category_totals(user_id, kind='expense'):
+    """
+    Sum a user's rollups per (category, currency).
+
+    Returns:
+        list: (category, currency_code, total, entry_count) tuples.
+    """
+    rows = (
+        db.session.query(
+            MonthlyRollup.category, MonthlyRollup.currency_code,
+            func.sum(MonthlyRollup.total), func.sum(MonthlyRollup.entry_count)
+        )
+        .filter(MonthlyRollup.user_id == user_id, MonthlyRollup.kind == kind)
+        .group_by(MonthlyRollup.category, MonthlyRollup.currency_code)
+        .order_by(MonthlyRollup.category, MonthlyRollup.currency_code)
+        .all()
+    )
+    return [(category, code, total or 0.0, int(count or 0)) for category, code, total, count in rows]
+
+
+# -------------------- Rebuild / verify --------------------
+
+def compute_rollups(user_ids):
+    """
+    Recompute rollup values for a set of users directly from Income and Expense.
+    Totals are summed in integer cents.
+
+    Args:
+        user_ids (list[int]): Users to recompute.
+
+    Returns:
+        dict: Rollup key tuples mapped to (total, entry_count).
+    """
+    expected = {}
+    sources = (
+        ('income', Income, func.coalesce(Income.source, 'Other')),
+        ('expense', Expense, func.coalesce(Expense.category, 'Other')),
+    )
+    for kind, model, category in sources:
+        year = extract('year', model.date)
+        month = extract('month', model.date)
+        currency_code = func.coalesce(model.currency_code, 'USD')
+        rows = (
+            db.session.query(
+                model.user_id, year, month, currency_code, category,
+                func.sum(minor_units(model.amount)), func.count(model.id)
+            )
+            .filter(model.user_id.in_(user_ids))
+            .group_by(model.user_id, year, month, currency_code, category)
+            .all()
+        )
+        for user_id, row_year, row_month, code, name, total, count in rows:
+            if row_year is None:
+                period = UNDATED_PERIOD
+            else:
+                period = f"{int(row_year):04d}-{int(row_month):02d}"
+            key = (user_id, period, code, name, kind)
+            previous_total, previous_count = expected.get(key, (0, 0))
+            expected[key] = (previous_total + int(total or 0), previous_count + count)
+    return {key: (from_minor(total), count) for key, (total, count) in expected.items()}
+
+
+def rebuild_rollups(chunk_size=REBUILD_CHUNK_SIZE, repair=True, user_ids=None):
+    """
+    Compare stored rollups with the base tables, one chunk of users at a time,
+    and optionally replace drifted rows.
+
+    Args:
+        chunk_size (int): Number of users recomputed per transaction.
+        repair (bool): Rewrite rollups for users with drift when True.
+        user_ids (list[int] | None): Restrict the run to these users.
+
+    Returns:
+        dict: Counters for users scanned, users with drift and drifted keys.
+    """
+    report = {'users': 0, 'drifted_users': 0, 'drifted_keys': 0}
+    last_id = 0
+
+    while True:
+        query = db.session.query(User.id).filter(User.id > last_id)
+        if user_ids is not None:
+            query = query.filter(User.id.in_(user_ids))
+        chunk = [row.id for row in query.order_by(User.id).limit(chunk_size).all()]
+        if not chunk:
+            break
+        last_id = chunk[-1]
+        report['users'] += len(chunk)
+
+        expected = compute_rollups(chunk)
+        actual = {
+            (row.user_id, row.period, row.currency_code, row.category, row.kind): (row.total, row.entry_count)
+            for row in MonthlyRollup.query.filter(MonthlyRollup.user_id.in_(chunk)).all()
+        }
+        drifted_keys = {key for key in set(expected) | set(actual) if expected.get(key) != actual.get(key)}
+        drifted_users = sorted({key[0] for key in drifted_keys})
+        report['drifted_keys'] += len(drifted_keys)
+        report['drifted_users'] += len(drifted_users)
+
+        if repair and drifted_users:
+            MonthlyRollup.query.filter(MonthlyRollup.user_id.in_(drifted_users)).delete(synchronize_session=False)
+            rows = [
+                {
+                    'user_id': user_id, 'period': period, 'currency_code': code,
+                    'category': category, 'kind': kind, 'total': total, 'entry_count': count,
+                }
+                for (user_id, period, code, category, kind), (total, count) in expected.items()
+                if user_id in drifted_users
+            ]
+            if rows:
+                db.session.execute(MonthlyRollup.__table__.insert(), rows)
+        db.session.commit()
+
+    return report
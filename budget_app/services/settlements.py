@@ -0,0 +1,147 @@
+# settlements.py
+# Minimum-transfer settlement of group balances in integer cents, with a bounded compute time
+
+import heapq
+import time
+from ..models import to_minor
+
+EXACT_MEMBER_LIMIT = 12
+# The DP allocates two 2**n lists before it can check the time budget.
+MAX_EXACT_MEMBERS = 20
+TIME_BUDGET_SECONDS = 0.05
+_DEADLINE_CHECK_EVERY = 4096
+
+
+class _OutOfTime(Exception):
+    pass
+
+
+def to_cents(amount):
+    """
+    Convert a currency amount to integer cents, rounding half away from zero.
+    """
+    return to_minor(amount)
+
+
+def minimize_transfers(balances, exact_limit=EXACT_MEMBER_LIMIT, time_budget=TIME_BUDGET_SECONDS):
+    """
+    Find a minimum (or near-minimum) set of transfers that settles everyone's balance.
+
+    A set of n non-zero balances that splits into k disjoint zero-sum subsets
+    can be settled with n - k transfers, and no fewer. Up to ``exact_limit``
+    participants, a subset DP finds the largest such k exactly; beyond that,
+    or when the DP would exceed ``time_budget`` seconds, equal and opposite
+    balances are paired first and the rest are settled largest-first.
+
+    The output only depends on the input (participants are ordered by their
+    key wherever amounts tie), so the same balances always give the same
+    suggestions as long as the time budget is not hit.
+
+    Args:
+        balances (dict): participant -> balance in integer cents; positive is owed money.
+        exact_limit (int): Largest number of non-zero balances solved exactly,
+            capped at MAX_EXACT_MEMBERS.
+        time_budget (float): Seconds the exact search may take before falling back.
+
+    Returns:
+        list: (debtor, creditor, cents) tuples.
+    """
+    participants = sorted((key, int(value)) for key, value in balances.items() if value)
+    if len(participants) < 2:
+        return []
+
+    if len(participants) <= min(exact_limit, MAX_EXACT_MEMBERS):
+        deadline = time.perf_counter() + time_budget
+        try:
+            groups = _zero_sum_partition([value for _, value in participants], deadline)
+        except _OutOfTime:
+            groups = None
+        if groups is not None:
+            transfers = []
+            for group in groups:
+                transfers.extend(_settle_largest_first([participants[index] for index in group]))
+            return transfers
+
+    return _settle_heuristic(participants)
+
+
+def _zero_sum_partition(values, deadline):
+    # dp[mask] is the largest number of zero-sum blocks a settlement order of
+    # the members in `mask` passes through; walking it back splits the members
+    # into that many zero-sum groups.
+    count = len(values)
+    full = (1 << count) - 1
+    sums = [0] * (full + 1)
+    dp = [0] * (full + 1)
+    for mask in range(1, full + 1):
+        if not mask % _DEADLINE_CHECK_EVERY and time.perf_counter() > deadline:
+            raise _OutOfTime()
+        low_bit = mask & -mask
+        sums[mask] = sums[mask ^ low_bit] + values[low_bit.bit_length() - 1]
+        best = 0
+        remaining = mask
+        while remaining:
+            bit = remaining & -remaining
+            remaining ^= bit
+            if dp[mask ^ bit] > best:
+                best = dp[mask ^ bit]
+        dp[mask] = best + (1 if sums[mask] == 0 else 0)
+
+    groups = []
+    current = []
+    mask = full
+    while mask:
+        target = dp[mask] - (1 if sums[mask] == 0 else 0)
+        for index in range(count):
+            bit = 1 << index
+            if mask & bit and dp[mask ^ bit] == target:
+                break
+        current.append(index)
+        mask ^= bit
+        if sums[mask] == 0:
+            groups.append(sorted(current))
+            current = []
+    if current:
+        groups.append(sorted(current))
+    return groups
+
+
+def _settle_largest_first(participants):
+    # Repeatedly settle the largest debtor against the largest creditor. Each
+    # transfer clears at least one side, so a group of n needs at most n - 1.
+    creditors = [(-value, key) for key, value in participants if value > 0]
+    debtors = [(value, key) for key, value in participants if value < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
+
+
+def _settle_heuristic(participants):
+    # Equal and opposite balances form two-member zero-sum groups; pairing
+    # them first is where largest-first alone most often wastes transfers.
+    creditors_by_amount = {}
+    for key, value in participants:
+        if value > 0:
+            creditors_by_amount.setdefault(value, []).append(key)
+
+    transfers = []
+    paired = set()
+    for key, value in participants:
+        if value < 0 and creditors_by_amount.get(-value):
+            creditor = creditors_by_amount[-value].pop(0)
+            transfers.append((key, creditor, -value))
+            paired.update((key, creditor))
+
+    transfers.extend(_settle_largest_first([item for item in participants if item[0] not in paired]))
+    return transfers
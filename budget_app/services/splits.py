@@ -0,0 +1,54 @@
+# splits.py
+# Pure split computation for shared expenses, used by the expense form and bulk imports
+
+from ..models import from_minor, to_minor
+
+SPLIT_METHODS = ('equal', 'percentage', 'exact')
+PERCENTAGE_TOLERANCE = 0.05
+
+
+def compute_split(amount, split_method, member_ids, values=None):
+    """
+    Work out how much each member owes for one shared expense.
+
+    The split is done in integer cents: every share is rounded to a cent once
+    and any remainder is assigned to the first member, so the shares always
+    add up to ``amount`` exactly. Exact splits must add up to the cent.
+
+    Args:
+        amount (float): Total expense amount.
+        split_method (str): 'equal', 'percentage' or 'exact'.
+        member_ids (list[int]): Members sharing the expense, in a stable order.
+        values (dict | None): user_id -> percentage or exact amount; required
+            for every member unless the split is equal.
+
+    Returns:
+        tuple: (split_map, error) where split_map maps user_id -> amount owed
+        and error is None or a message describing why the split is invalid.
+    """
+    if not member_ids:
+        return {}, 'Group has no members.'
+
+    total = to_minor(amount)
+    if split_method == 'equal':
+        # Half-up division, so 200.00 / 3 is 66.67 each with the first member adjusted.
+        share = (2 * total + len(member_ids)) // (2 * len(member_ids))
+        cents = {user_id: share for user_id in member_ids}
+    else:
+        if split_method not in SPLIT_METHODS:
+            return {}, 'Unsupported split method selected.'
+        values = values or {}
+        if any(user_id not in values for user_id in member_ids):
+            return {}, 'Enter a split value for every member.'
+
+        if split_method == 'percentage':
+            if abs(sum(values[user_id] for user_id in member_ids) - 100) > PERCENTAGE_TOLERANCE:
+                return {}, 'Percentage split must total 100.'
+            cents = {user_id: to_minor(amount * values[user_id] / 100) for user_id in member_ids}
+        else:
+            cents = {user_id: to_minor(values[user_id]) for user_id in member_ids}
+            if sum(cents.values()) != total:
+                return {}, 'Exact split amounts must match the total expense.'
+
+    cents[member_ids[0]] += total - sum(cents.values())
+    return {user_id: from_minor(value) for user_id, value in cents.items()}, None
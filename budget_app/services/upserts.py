@@ -0,0 +1,22 @@
+# upserts.py
+# Dialect-specific INSERT constructs for INSERT ... ON CONFLICT DO UPDATE statements
+
+
+def upsert_insert(dialect_name):
+    """
+    Return the ``insert`` construct that supports ``on_conflict_do_update`` for a dialect.
+
+    Args:
+        dialect_name (str): ``db.session.get_bind().dialect.name``.
+
+    Returns:
+        callable | None: The PostgreSQL or SQLite ``insert``; None for other
+        backends, which fall back to row-by-row writes.
+    """
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert
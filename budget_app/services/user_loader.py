@@ -0,0 +1,87 @@
+# user_loader.py
+# Request-scoped user cache: collect the user ids a request needs, then fetch them with one IN query
+
+from flask import g
+from ..models import User
+from .. import db
+
+LOAD_CHUNK_SIZE = 900
+
+
+class UserLoader:
+    """
+    Identity map of users for one request.
+
+    Ids are queued with prime() and fetched together the first time any
+    user is read, so a page that needs every member of a 500-member group
+    issues one ``user.id IN (...)`` query instead of 500 primary-key lookups.
+    Ids that do not exist are remembered as missing and never re-queried.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._pending = set()
+
+    def prime(self, user_ids):
+        """
+        Queue user ids to be fetched with the next batch.
+        """
+        for user_id in user_ids:
+            if user_id is not None and user_id not in self._users:
+                self._pending.add(user_id)
+        return self
+
+    def add(self, user):
+        """
+        Seed the map with a user that is already loaded, e.g. the logged-in user.
+        """
+        if user is not None and getattr(user, 'id', None) is not None:
+            self._users[user.id] = user
+            self._pending.discard(user.id)
+        return self
+
+    def get(self, user_id):
+        """
+        Return one user, or None when it does not exist.
+        """
+        if user_id is None:
+            return None
+        if user_id not in self._users:
+            self._pending.add(user_id)
+            self._load()
+        return self._users.get(user_id)
+
+    def get_many(self, user_ids):
+        """
+        Return {user_id: user} for the ids that exist, in the order given.
+        """
+        user_ids = list(user_ids)
+        self.prime(user_ids)
+        self._load()
+        return {user_id: self._users[user_id] for user_id in user_ids if self._users.get(user_id) is not None}
+
+    def _load(self):
+        pending = sorted(self._pending)
+        self._pending.clear()
+        for start in range(0, len(pending), LOAD_CHUNK_SIZE):
+            chunk = pending[start:start + LOAD_CHUNK_SIZE]
+            found = {user.id: user for user in db.session.scalars(db.select(User).where(User.id.in_(chunk)))}
+            for user_id in chunk:
+                self._users[user_id] = found.get(user_id)
+
+
+def user_loader():
+    """
+    Return the UserLoader for the current request (or app context), creating it on first use.
+    """
+    loader = g.get('_user_loader')
+    if loader is None:
+        loader = g._user_loader = UserLoader()
+    return loader
+
+
+def reset_user_loader():
+    """
+    Drop the current loader so the next lookup starts from an empty map.
+    """
+    g.pop('_user_loader', None)
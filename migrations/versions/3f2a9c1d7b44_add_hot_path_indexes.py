@@ -0,0 +1,47 @@
+"""add hot path indexes
+
+Revision ID: 3f2a9c1d7b44
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7b44'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_income_user_date', 'income', ['user_id', 'date', 'id'], False),
+    ('ix_expense_user_date', 'expense', ['user_id', 'date', 'id'], False),
+    ('ix_recurring_transaction_user_id', 'recurring_transaction', ['user_id'], False),
+    ('ix_user_profile_user_id', 'user_profile', ['user_id'], False),
+    ('ix_group_created_by', 'group', ['created_by'], False),
+    ('uq_group_member_group_user', 'group_member', ['group_id', 'user_id'], True),
+    ('ix_group_member_user_id', 'group_member', ['user_id'], False),
+    ('ix_shared_expense_group_created', 'shared_expense', ['group_id', 'created_at'], False),
+    ('ix_shared_expense_paid_by', 'shared_expense', ['paid_by'], False),
+    ('ix_expense_share_expense_user', 'expense_share', ['expense_id', 'user_id'], False),
+    ('ix_expense_share_user_id', 'expense_share', ['user_id'], False),
+]
+
+
+def upgrade():
+    # Duplicate memberships would block the unique index; keep the oldest row of each pair.
+    op.execute(sa.text(
+        'DELETE FROM group_member WHERE id NOT IN '
+        '(SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM group_member GROUP BY group_id, user_id) AS keepers)'
+    ))
+
+    for name, table, columns, unique in INDEXES:
+        op.create_index(name, table, columns, unique=unique, if_not_exists=True)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
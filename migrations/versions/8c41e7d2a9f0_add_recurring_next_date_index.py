@@ -0,0 +1,26 @@
+"""add recurring next_date index
+
+Revision ID: 8c41e7d2a9f0
+Revises: 3f2a9c1d7b44
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41e7d2a9f0'
+down_revision = '3f2a9c1d7b44'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The recurring scheduler selects due entries across all users by (next_date, id).
+    op.create_index(
+        'ix_recurring_transaction_next_date', 'recurring_transaction', ['next_date', 'id'], if_not_exists=True
+    )
+
+
+def downgrade():
+    op.drop_index('ix_recurring_transaction_next_date', table_name='recurring_transaction', if_exists=True)
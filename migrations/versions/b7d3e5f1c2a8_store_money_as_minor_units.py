@@ -0,0 +1,74 @@
+"""store money as minor units
+
+Revision ID: b7d3e5f1c2a8
+Revises: 8c41e7d2a9f0
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e5f1c2a8'
+down_revision = '8c41e7d2a9f0'
+branch_labels = None
+depends_on = None
+
+
+MONEY_COLUMNS = [
+    ('income', 'amount'),
+    ('expense', 'amount'),
+    ('recurring_transaction', 'amount'),
+    ('shared_expense', 'amount'),
+    ('expense_share', 'amount_owed'),
+    ('monthly_rollup', 'total'),
+    ('group_balance', 'balance'),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    for table, column in MONEY_COLUMNS:
+        # Tables created by db.create_all() already hold cents; converting them again would scale them by 100.
+        if not _stored_as(inspector, table, column, sa.Float):
+            continue
+        if bind.dialect.name == 'postgresql':
+            # NUMERIC rounds half away from zero, like budget_app.models.to_minor().
+            op.alter_column(
+                table, column, type_=sa.BigInteger(), existing_type=sa.Float(),
+                postgresql_using=f'ROUND(CAST({column} AS NUMERIC) * 100)::BIGINT',
+            )
+            continue
+        # The epsilon matches to_minor(): 10.005 is stored as 10.00499..., and should become 1001.
+        op.execute(sa.text(
+            f'UPDATE "{table}" SET {column} = '
+            f'ROUND({column} * 100 + CASE WHEN {column} < 0 THEN -0.0000001 ELSE 0.0000001 END)'
+        ))
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, type_=sa.BigInteger(), existing_type=sa.Float())
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    for table, column in MONEY_COLUMNS:
+        if not _stored_as(inspector, table, column, sa.Integer):
+            continue
+        if bind.dialect.name == 'postgresql':
+            op.alter_column(
+                table, column, type_=sa.Float(), existing_type=sa.BigInteger(),
+                postgresql_using=f'{column} / 100.0',
+            )
+            continue
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(column, type_=sa.Float(), existing_type=sa.BigInteger())
+        op.execute(sa.text(f'UPDATE "{table}" SET {column} = {column} / 100.0'))
+
+
+def _stored_as(inspector, table, column, type_class):
+    if not inspector.has_table(table):
+        return False
+    types = {info['name']: info['type'] for info in inspector.get_columns(table)}
+    return isinstance(types.get(column), type_class)
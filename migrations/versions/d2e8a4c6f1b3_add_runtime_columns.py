@@ -0,0 +1,55 @@
+"""add runtime columns
+
+Revision ID: d2e8a4c6f1b3
+Revises: b7d3e5f1c2a8
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2e8a4c6f1b3'
+down_revision = 'b7d3e5f1c2a8'
+branch_labels = None
+depends_on = None
+
+
+# Columns added to existing tables after their first release. These used to be
+# ALTERed on every app start; databases created by db.create_all() already have them.
+COLUMNS = [
+    ('user', lambda: sa.Column('is_guest', sa.Boolean(), server_default=sa.false(), nullable=False)),
+    ('user', lambda: sa.Column('invite_token', sa.String(length=64), nullable=True)),
+    ('user', lambda: sa.Column('data_version', sa.Integer(), server_default='0', nullable=False)),
+    ('income', lambda: sa.Column('currency_code', sa.String(length=3), server_default='USD', nullable=False)),
+    ('expense', lambda: sa.Column('currency_code', sa.String(length=3), server_default='USD', nullable=False)),
+    ('recurring_transaction', lambda: sa.Column('lease_owner', sa.String(length=64), nullable=True)),
+    ('recurring_transaction', lambda: sa.Column('lease_expires_at', sa.DateTime(), nullable=True)),
+    ('shared_expense', lambda: sa.Column('currency_code', sa.String(length=3), server_default='USD', nullable=False)),
+    ('shared_expense', lambda: sa.Column('split_method', sa.String(length=20), server_default='equal', nullable=False)),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, column in COLUMNS:
+        column = column()
+        if inspector.has_table(table) and column.name not in _column_names(inspector, table):
+            op.add_column(table, column)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    for table, column in reversed(COLUMNS):
+        name = column().name
+        if inspector.has_table(table) and name in _column_names(inspector, table):
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.drop_column(name)
+    # The app re-checks the schema on its next start.
+    if inspector.has_table('schema_version'):
+        op.execute(sa.text('DELETE FROM schema_version'))
+
+
+def _column_names(inspector, table):
+    return {info['name'] for info in inspector.get_columns(table)}
@@ -0,0 +1,69 @@
+"""backfill monthly rollups
+
+Revision ID: e9c1f3a5b7d2
+Revises: d2e8a4c6f1b3
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9c1f3a5b7d2'
+down_revision = 'd2e8a4c6f1b3'
+branch_labels = None
+depends_on = None
+
+
+# budget_app.services.rollups.UNDATED_PERIOD: the fixed period of entries without a date.
+UNDATED_PERIOD = '0000-00'
+
+SOURCES = [
+    # (kind, table, category column)
+    ('income', 'income', 'source'),
+    ('expense', 'expense', 'category'),
+]
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table('monthly_rollup'):
+        op.create_table(
+            'monthly_rollup',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('period', sa.String(length=7), nullable=False),
+            sa.Column('currency_code', sa.String(length=3), nullable=False),
+            sa.Column('category', sa.String(length=100), nullable=False),
+            sa.Column('kind', sa.String(length=10), nullable=False),
+            sa.Column('total', sa.BigInteger(), nullable=False),
+            sa.Column('entry_count', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'period', 'currency_code', 'category', 'kind', name='uq_monthly_rollup_key'),
+        )
+
+    # Rollups are derived data. Tables created by db.create_all() on an existing
+    # database start empty, or hold only the writes made since, so rebuild them
+    # from the base tables. Amounts are already integer cents here.
+    if bind.dialect.name == 'postgresql':
+        period = "to_char(date, 'YYYY-MM')"
+    else:
+        period = "strftime('%Y-%m', date)"
+    op.execute(sa.text('DELETE FROM monthly_rollup'))
+    for kind, table, category in SOURCES:
+        if not inspector.has_table(table):
+            continue
+        op.execute(sa.text(
+            'INSERT INTO monthly_rollup (user_id, period, currency_code, category, kind, total, entry_count) '
+            f"SELECT user_id, COALESCE({period}, :undated_period), COALESCE(currency_code, 'USD'), "
+            f"COALESCE({category}, 'Other'), :kind, SUM(amount), COUNT(*) "
+            f'FROM "{table}" GROUP BY 1, 2, 3, 4'
+        ).bindparams(undated_period=UNDATED_PERIOD, kind=kind))
+
+
+def downgrade():
+    # The rollups stay valid for the previous revision; "flask rollups rebuild" re-checks them.
+    pass
@@ -0,0 +1,36 @@
+"""add recurring anchor day
+
+Revision ID: f1a3c5e7b9d0
+Revises: e9c1f3a5b7d2
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a3c5e7b9d0'
+down_revision = 'e9c1f3a5b7d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    # Rows keep NULL: the scheduler anchors them on their next_date's day the first time it advances them.
+    if inspector.has_table('recurring_transaction') and 'anchor_day' not in _column_names(inspector, 'recurring_transaction'):
+        op.add_column('recurring_transaction', sa.Column('anchor_day', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if inspector.has_table('recurring_transaction') and 'anchor_day' in _column_names(inspector, 'recurring_transaction'):
+        with op.batch_alter_table('recurring_transaction') as batch_op:
+            batch_op.drop_column('anchor_day')
+    if inspector.has_table('schema_version'):
+        op.execute(sa.text('DELETE FROM schema_version'))
+
+
+def _column_names(inspector, table):
+    return {info['name'] for info in inspector.get_columns(table)}
@@ -0,0 +1,18 @@
+# tests/conftest.py
+
+"""
+Shared test setup: keep model artifacts out of the checkout.
+"""
+
+import pytest
+
+@pytest.fixture(scope='session')
+def category_model_path(tmp_path_factory):
+    return str(tmp_path_factory.mktemp('models') / 'model.pkl')
+
+@pytest.fixture(autouse=True)
+def isolated_model_artifacts(monkeypatch, category_model_path):
+    # create_app() trains a missing model at startup. Point it, and every
+    # subprocess that inherits the environment, at a temporary path shared by
+    # the session so the model is trained once and never lands in the repository.
+    monkeypatch.setenv('CATEGORY_MODEL_PATH', category_model_path)
@@ -0,0 +1,122 @@
+# tests/test_category_rules.py
+
+"""
+Tests for the compiled category rule matcher and its per-user cache.
+"""
+
+import pytest
+from sqlalchemy import event
+from budget_app import create_app, db, ml_utils
+from budget_app.models import User, CategoryRule
+from budget_app.services import category_rules
+from budget_app.services.category_rules import RuleMatcher, default_matcher, matcher_for_user, match_rules
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    monkeypatch.setenv('CATEGORY_MODEL_PATH', str(tmp_path / 'model.pkl'))
+    monkeypatch.setenv('ADMIN_USERNAMES', 'admin')
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    category_rules.invalidate_rules()
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    category_rules.invalidate_rules()
+
+@pytest.fixture
+def users(app):
+    admin = User(username='admin', email='admin@example.com', password='x')
+    member = User(username='member', email='member@example.com', password='x')
+    db.session.add_all([admin, member])
+    db.session.commit()
+    return admin, member
+
+def _login(app, user):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    return client
+
+def test_highest_priority_rule_wins_regardless_of_position():
+    matcher = RuleMatcher([('amzn prime', 'Entertainment'), ('amzn', 'Shopping'), ('uber', 'Transport')])
+
+    assert matcher.match('UBER trip, paid with AMZN card') == 'Shopping'
+    assert matcher.match('AMZN Prime renewal') == 'Entertainment'
+    assert matcher.match('a+b (literal) text') is None
+
+def test_rules_inside_a_longer_match_are_still_seen():
+    matcher = RuleMatcher([('zon', 'Personal'), ('amazon', 'Global')])
+    assert matcher.match('amazon order') == 'Personal'
+    assert RuleMatcher([('amazon', 'Global'), ('zon', 'Personal')]).match('amazon order') == 'Global'
+
+    matcher = RuleMatcher([('rain', 'Weather'), ('uber', 'Transport'), ('train', 'Transport')])
+    assert matcher.match('train ticket') == 'Weather'
+    assert matcher.match('subercharge') == 'Transport'
+
+def test_default_rules_keep_keyword_priority():
+    assert default_matcher.match('Pizza on the train') == 'Food'
+    assert default_matcher.match('Doctor visit') == 'Health'
+    assert default_matcher.match('Rent') is None
+
+def test_user_rules_override_global_rules(users):
+    admin, member = users
+    db.session.add_all([
+        CategoryRule(user_id=None, pattern='AMZN', category='Shopping'),
+        CategoryRule(user_id=member.id, pattern='amzn', category='Books'),
+    ])
+    db.session.commit()
+
+    assert match_rules('AMZN Mktp US', member.id) == 'Books'
+    assert match_rules('AMZN Mktp US', admin.id) == 'Shopping'
+    assert ml_utils.predict_category('AMZN Mktp US', member.id) == 'Books'
+
+def test_matchers_are_cached_until_invalidated(users):
+    member_id = users[1].id
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    assert match_rules('Starbucks', member_id) is None
+    assert match_rules('Starbucks', member_id) is None
+    assert len(statements) == 1
+
+    db.session.add(CategoryRule(user_id=member_id, pattern='starbucks', category='Coffee'))
+    db.session.commit()
+    assert match_rules('Starbucks', member_id) is None
+
+    category_rules.invalidate_rules(member_id)
+    assert match_rules('Starbucks', member_id) == 'Coffee'
+
+def test_rules_page_saves_and_invalidates(app, users):
+    _, member = users
+    assert match_rules('AMZN order', member.id) is None
+    client = _login(app, member)
+
+    response = client.post('/rules', data={'pattern': 'AMZN', 'category': 'Shopping', 'is_global': 'y'})
+    assert response.status_code == 302
+    rule = CategoryRule.query.one()
+    # Only admins may create global rules.
+    assert rule.user_id == member.id
+    assert match_rules('AMZN order', member.id) == 'Shopping'
+
+    client.post('/rules', data={'pattern': 'AMZN', 'category': 'Household'})
+    assert CategoryRule.query.count() == 1
+    assert match_rules('AMZN order', member.id) == 'Household'
+
+    client.post(f'/rules/{rule.id}/delete')
+    assert CategoryRule.query.count() == 0
+    assert match_rules('AMZN order', member.id) is None
+
+def test_admin_can_create_global_rules(app, users):
+    admin, member = users
+    client = _login(app, admin)
+
+    client.post('/rules', data={'pattern': 'Netflix', 'category': 'Entertainment', 'is_global': 'y'})
+
+    assert CategoryRule.query.one().user_id is None
+    assert match_rules('NETFLIX.COM', member.id) == 'Entertainment'
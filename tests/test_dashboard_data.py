@@ -0,0 +1,73 @@
+# tests/test_dashboard_data.py
+
+"""
+Tests for the SQL-side dashboard aggregation service.
+"""
+
+from datetime import date, datetime
+
+import pytest
+from budget_app import create_app, db
+from budget_app.models import User, Income, Expense
+from budget_app.services.dashboard_data import load_dashboard_data, top_categories, recent_transactions
+from budget_app.services.rollups import rebuild_rollups
+
+@pytest.fixture
+def app_context(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def user(app_context):
+    user = User(username='dash', email='dash@example.com', password='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def test_currency_totals_group_by_currency(user):
+    db.session.add_all([
+        Income(amount=100, source='Job', date=date(2024, 1, 5), currency_code='INR', user_id=user.id),
+        Income(amount=50, source='Gift', date=date(2024, 2, 5), currency_code='INR', user_id=user.id),
+        Income(amount=10, source='Refund', date=date(2024, 2, 6), currency_code='EUR', user_id=user.id),
+    ])
+    db.session.commit()
+    rebuild_rollups()
+
+    data = load_dashboard_data(user.id)
+    assert data['income_totals'] == {'EUR': 10, 'INR': 150}
+    assert data['expense_totals'] == {}
+
+def test_monthly_totals_and_top_categories(user):
+    db.session.add_all([
+        Income(amount=100, source='Job', date=date(2024, 1, 5), user_id=user.id),
+        Expense(amount=30, category='Food', date=datetime(2024, 1, 9), user_id=user.id),
+        Expense(amount=20, category='Food', date=datetime(2024, 2, 1), user_id=user.id),
+        Expense(amount=45, category='Transport', date=datetime(2024, 2, 3), user_id=user.id),
+    ])
+    db.session.commit()
+    rebuild_rollups()
+
+    assert load_dashboard_data(user.id)['monthly_totals'] == {
+        (2024, 1): {'income': 100, 'expense': 30},
+        (2024, 2): {'income': 0.0, 'expense': 65},
+    }
+    assert top_categories(user.id) == [('Food', 50), ('Transport', 45)]
+
+def test_recent_transactions_merges_latest_rows(user):
+    for day in range(1, 11):
+        db.session.add(Income(amount=day, source='Job', date=date(2024, 3, day), user_id=user.id))
+        db.session.add(Expense(amount=day, category='Food', date=datetime(2024, 3, day, 12), user_id=user.id))
+    db.session.commit()
+
+    timeline = recent_transactions(user.id)
+    assert len(timeline) == 8
+    assert [item['kind'] for item in timeline[:2]] == ['expense', 'income']
+    assert timeline[0]['amount'] == 10
+    assert timeline[-1]['amount'] == 7
@@ -0,0 +1,169 @@
+# tests/test_exchange_rates.py
+
+"""
+Tests for cached exchange-rate lookups, vectorised conversion and converted dashboard totals.
+"""
+
+import json
+import math
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+from budget_app import create_app, db
+from budget_app.models import User, UserProfile, Income, Expense, ExchangeRate
+from budget_app.services.exchange_rates import (
+    convert_amounts, convert_totals, import_rates, invalidate_rates, load_rates_file, rate_for
+)
+from budget_app.services.rollups import rebuild_rollups
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        invalidate_rates()
+        yield app
+        invalidate_rates()
+        db.session.remove()
+        db.drop_all()
+
+RATES = [
+    {'date': '2024-01-01', 'base': 'USD', 'quote': 'INR', 'rate': 83.0},
+    {'date': '2024-02-01', 'base': 'USD', 'quote': 'INR', 'rate': 84.0},
+    {'date': '2024-01-01', 'base': 'EUR', 'quote': 'USD', 'rate': 1.1},
+]
+
+def _count_queries():
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    return statements
+
+def test_rates_are_read_direct_inverted_and_crossed(app):
+    assert import_rates(RATES) == {'written': 3, 'skipped': 0, 'unsupported': []}
+
+    assert rate_for('USD', 'USD') == 1.0
+    assert rate_for('USD', 'INR', date(2024, 1, 15)) == 83.0
+    assert rate_for('USD', 'INR', date(2024, 3, 1)) == 84.0
+    assert rate_for('INR', 'USD', date(2024, 2, 1)) == pytest.approx(1 / 84.0)
+    assert rate_for('EUR', 'INR', date(2024, 2, 1)) == pytest.approx(1.1 * 84.0)
+    assert rate_for('USD', 'INR', date(2023, 12, 31)) is None
+    assert rate_for('GBP', 'INR', date(2024, 2, 1)) is None
+
+def test_lookups_are_cached_until_rates_are_imported(app):
+    import_rates(RATES)
+    rate_for('USD', 'INR', date(2024, 1, 15))
+    rate_for('GBP', 'INR', date(2024, 1, 15))
+
+    statements = _count_queries()
+    assert rate_for('USD', 'INR', date(2024, 1, 15)) == 83.0
+    assert rate_for('GBP', 'INR', date(2024, 1, 15)) is None
+    assert statements == []
+
+    import_rates([{'date': '2024-01-10', 'base': 'USD', 'quote': 'INR', 'rate': 82.5},
+                  {'date': '2024-01-01', 'base': 'GBP', 'quote': 'USD', 'rate': 1.25}])
+    assert rate_for('USD', 'INR', date(2024, 1, 15)) == 82.5
+    assert rate_for('GBP', 'INR', date(2024, 1, 15)) == pytest.approx(1.25 * 82.5)
+
+def test_reimporting_a_rate_updates_it(app):
+    import_rates(RATES)
+    import_rates([{'date': date(2024, 1, 1), 'base': 'usd', 'quote': 'inr', 'rate': 83.5}])
+
+    assert ExchangeRate.query.count() == 3
+    assert rate_for('USD', 'INR', date(2024, 1, 1)) == 83.5
+    with pytest.raises(ValueError):
+        import_rates([{'date': '2024-01-01', 'base': 'USD', 'quote': 'EUR', 'rate': 0}])
+    with pytest.raises(ValueError):
+        import_rates([{'date': 'yesterday', 'base': 'USD', 'quote': 'EUR', 'rate': 0.9}])
+
+def test_unsupported_currencies_are_skipped_and_counted(app):
+    report = import_rates([
+        {'date': '2024-01-01', 'base': 'USD', 'quote': 'JPY', 'rate': 141.0},
+        {'date': '2024-01-01', 'base': 'USD', 'quote': 'INR', 'rate': 83.0},
+        {'date': '2024-01-01', 'base': 'CHF', 'quote': 'JPY', 'rate': 165.0},
+    ])
+
+    assert report == {'written': 1, 'skipped': 2, 'unsupported': ['CHF', 'JPY']}
+    assert ExchangeRate.query.count() == 1
+    assert rate_for('USD', 'INR', date(2024, 1, 1)) == 83.0
+
+def test_convert_amounts_looks_up_each_currency_once(app):
+    import_rates(RATES)
+    amounts = np.tile([10.0, 20.0, 5.0, 1.0], 2500)
+    codes = np.tile(['USD', 'EUR', 'INR', 'GBP'], 2500)
+
+    statements = _count_queries()
+    converted = convert_amounts(amounts, codes, 'INR', date(2024, 2, 1))
+
+    # At most a direct and a cross-rate lookup per foreign currency, however many rows.
+    assert len(statements) <= 2 * 3
+    assert converted[:3] == pytest.approx([840.0, 20 * 1.1 * 84.0, 5.0])
+    assert math.isnan(converted[3])
+
+    total, missing = convert_totals({'USD': 10.0, 'INR': 5.0, 'GBP': 3.0}, 'INR', date(2024, 2, 1))
+    assert total == 845.0
+    assert missing == ['GBP']
+    assert convert_totals({}, 'INR') == (0.0, [])
+
+def test_rates_files_and_cli_import(app, tmp_path):
+    csv_path = tmp_path / 'rates.csv'
+    csv_path.write_text('date,base,quote,rate\n2024-01-01,USD,INR,83.0\n2024-01-01,EUR,USD,1.1\n')
+    json_path = tmp_path / 'rates.json'
+    json_path.write_text(json.dumps({'date': '2024-01-02', 'base': 'USD', 'rates': {'GBP': 0.79, 'SGD': 1.34}}))
+
+    assert len(load_rates_file(csv_path)) == 2
+    assert load_rates_file(json_path)[0] == {'date': '2024-01-02', 'base': 'USD', 'quote': 'GBP', 'rate': 0.79}
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['rates', 'import', str(csv_path)])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 2 exchange rates.' in result.output
+    result = runner.invoke(args=['rates', 'import', str(json_path)])
+    assert 'Imported 2 exchange rates.' in result.output
+    assert ExchangeRate.query.count() == 4
+
+    json_path.write_text(json.dumps({'date': '2024-01-03', 'base': 'USD', 'rates': {'GBP': 0.78, 'JPY': 141.0}}))
+    result = runner.invoke(args=['rates', 'import', str(json_path)])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 1 exchange rates.' in result.output
+    assert 'Skipped 1 rates in unsupported currencies: JPY.' in result.output
+
+    bad_path = tmp_path / 'bad.csv'
+    bad_path.write_text('date,base,rate\n2024-01-01,USD,1\n')
+    result = runner.invoke(args=['rates', 'import', str(bad_path)])
+    assert result.exit_code != 0
+    assert 'Missing required column(s): quote' in result.output
+
+def test_dashboard_and_graph_show_converted_totals(app):
+    user = User(username='alice', email='alice@example.com', password='x')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add_all([
+        UserProfile(user_id=user.id, currency='INR'),
+        Income(source='Salary', amount=1000, date=date(2024, 1, 1), currency_code='USD', user_id=user.id),
+        Income(source='Gift', amount=5000, date=date(2024, 1, 1), currency_code='INR', user_id=user.id),
+        Expense(category='Food', amount=100, date=datetime(2024, 1, 2), currency_code='EUR', user_id=user.id),
+        Expense(category='Food', amount=10, date=datetime(2024, 1, 2), currency_code='GBP', user_id=user.id),
+    ])
+    db.session.commit()
+    rebuild_rollups()
+    import_rates([{'date': '2000-01-01', 'base': 'USD', 'quote': 'INR', 'rate': 80.0},
+                  {'date': '2000-01-01', 'base': 'EUR', 'quote': 'USD', 'rate': 1.1}])
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+
+    page = client.get('/dashboard').get_data(as_text=True)
+    # 80000 + 5000 income, 100 EUR = 8800 INR expense; GBP has no rate.
+    assert 'Rs76200.00 net balance across all currencies' in page
+    assert 'No exchange rate for GBP' in page
+    assert '89.6%' in page
+
+    page = client.get('/graph').get_data(as_text=True)
+    assert 'Rs85000.00' in page
+    assert 'Rs8800.00' in page
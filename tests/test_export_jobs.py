@@ -0,0 +1,105 @@
+# tests/test_export_jobs.py
+
+"""
+Tests for background PDF export jobs and the export cache.
+"""
+
+import time
+from datetime import date
+
+import pytest
+from budget_app import create_app, db
+from budget_app.models import User, Income
+from budget_app.services import export_jobs
+from budget_app.services.export_jobs import render_pdf
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    monkeypatch.setenv('EXPORT_CACHE_DIR', str(tmp_path / 'exports'))
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    user = User(username='pdf', email='pdf@example.com', password='x')
+    db.session.add(user)
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    return client
+
+def _wait_until_done(client, job):
+    for _ in range(100):
+        status = client.get(job['status_url']).get_json()
+        if status['status'] in ('done', 'failed'):
+            return status
+        time.sleep(0.05)
+    raise AssertionError('export job did not finish')
+
+def test_pdf_export_runs_in_background_and_is_cached(client, tmp_path):
+    form = {'export_format': 'pdf', 'start_date': '2024-01-01', 'end_date': '2024-12-31'}
+    client.post('/add_income', data={
+        'amount': '900', 'source': 'Job', 'currency_code': 'INR', 'date': '2024-05-01', 'frequency': 'none',
+    })
+
+    response = client.post('/export', data=form, headers={'Accept': 'application/json'})
+    assert response.status_code == 202
+    job = response.get_json()
+
+    status = _wait_until_done(client, job)
+    assert status['status'] == 'done'
+    download = client.get(status['download_url'])
+    assert download.data.startswith(b'%PDF')
+
+    # Same range and unchanged data: served straight from the cache.
+    again = client.post('/export', data=form, headers={'Accept': 'application/json'}).get_json()
+    assert again['job_id'] == job['job_id']
+    assert again['status'] == 'done'
+
+    # New data bumps the data version, so the old file is replaced by a new job.
+    client.post('/add_income', data={
+        'amount': '5', 'source': 'Gift', 'currency_code': 'INR', 'date': '2024-06-01', 'frequency': 'none',
+    })
+    fresh = client.post('/export', data=form, headers={'Accept': 'application/json'}).get_json()
+    assert fresh['job_id'] != job['job_id']
+    assert _wait_until_done(client, fresh)['status'] == 'done'
+    assert len(list((tmp_path / 'exports').glob('*.pdf'))) == 1
+
+def test_jobs_unknown_to_this_worker_are_resubmitted(client):
+    # Queued by another worker, or before a restart: this process has no record of it.
+    response = client.get('/export/jobs/20240101-20241231-v0')
+    assert response.status_code == 200
+    job = response.get_json()
+    assert job['job_id'] == '20240101-20241231-v0'
+    assert _wait_until_done(client, job)['status'] == 'done'
+
+    # A finished file is enough to report the job as done.
+    export_jobs._jobs.clear()
+    assert client.get(job['status_url']).get_json()['status'] == 'done'
+
+    # Data changed since: the range is exported again under the current version.
+    assert client.get('/export/jobs/20240101-20241231-v99').get_json()['job_id'] == '20240101-20241231-v0'
+
+def test_malformed_jobs_are_rejected(client):
+    assert client.get('/export/jobs/..%2F..%2Fetc').status_code == 404
+    assert client.get('/export/jobs/20241301-20241231-v0').status_code == 404
+
+def test_render_pdf_paginates_large_tables(tmp_path):
+    rows = [
+        {'type': 'Expense', 'category': 'Food', 'description': 'x' * 200, 'currency_code': 'USD',
+         'amount': float(index), 'date': '2024-01-01'}
+        for index in range(1000)
+    ]
+    pages = render_pdf(str(tmp_path / 'big.pdf'), 'Title', 'Subtitle', rows)
+    # 41 rows fit under the title on page one, 43 on each following page.
+    assert pages == 24
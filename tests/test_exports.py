@@ -0,0 +1,115 @@
+# tests/test_exports.py
+
+"""
+Tests for the streaming CSV/NDJSON export.
+"""
+
+import csv
+import io
+import json
+import os
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+import pytest
+from budget_app import create_app, db
+from budget_app.models import User, Income, Expense
+from budget_app.services.exports import iter_export_rows, stream_csv, stream_ndjson
+
+# The memory check streams EXPORT_TEST_ROWS rows (20,000 by default) on every run;
+# set EXPORT_STRESS_TEST=1 to also stream the full million-row export.
+STRESS_ROWS = int(os.environ.get('EXPORT_TEST_ROWS', 20_000))
+FULL_STRESS_ROWS = 1_000_000
+RUN_FULL_STRESS = os.environ.get('EXPORT_STRESS_TEST', '').lower() in ('1', 'true', 'yes')
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def user(app):
+    user = User(username='export', email='export@example.com', password='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def test_export_route_streams_csv_and_ndjson(app, user):
+    db.session.add_all([
+        Expense(amount=12.5, category='Food', description='Lunch', date=datetime(2024, 4, 30, 18), user_id=user.id),
+        Income(amount=900, source='Job', date=date(2024, 4, 1), currency_code='INR', user_id=user.id),
+        Income(amount=1, source='Late', date=date(2024, 5, 1), user_id=user.id),
+    ])
+    db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+
+    form = {'start_date': '2024-04-01', 'end_date': '2024-04-30'}
+    response = client.post('/export', data=dict(form, export_format='csv'))
+    assert response.is_streamed
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [(row['type'], row['category'], row['date']) for row in rows] == [
+        ('Expense', 'Food', '2024-04-30'),
+        ('Income', 'Job', '2024-04-01'),
+    ]
+
+    response = client.post('/export', data=dict(form, export_format='ndjson'))
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[1] == {
+        'type': 'Income', 'category': 'Job', 'description': '', 'amount': 900.0,
+        'currency_code': 'INR', 'date': '2024-04-01',
+    }
+
+@pytest.mark.parametrize('rows', [
+    STRESS_ROWS,
+    pytest.param(FULL_STRESS_ROWS, marks=pytest.mark.skipif(
+        not RUN_FULL_STRESS, reason='set EXPORT_STRESS_TEST=1 for the million-row export')),
+])
+def test_streaming_memory_is_bounded(user, rows):
+    start = datetime(2015, 1, 1)
+    batch = []
+    for index in range(rows):
+        batch.append({
+            'amount': index % 500, 'category': 'Food', 'description': f'row {index}',
+            'date': start + timedelta(hours=index), 'currency_code': 'USD', 'user_id': user.id,
+        })
+        if len(batch) == 50_000:
+            db.session.execute(Expense.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Expense.__table__.insert(), batch)
+    db.session.commit()
+    del batch
+
+    for encoder in (stream_csv, stream_ndjson):
+        # Export a quarter of the rows, then all of them: only one fetch batch and
+        # one output chunk should ever be alive, so the peak must stay flat.
+        small_rows, small_peak = _stream_peak(encoder, user.id, start, rows // 4)
+        full_rows, full_peak = _stream_peak(encoder, user.id, start, rows)
+
+        assert full_rows >= rows > small_rows
+        # Building every row (e.g. .all()) costs hundreds of bytes per row.
+        assert full_peak - small_peak < 256 * 1024 + 16 * (full_rows - small_rows)
+
+def _stream_peak(encoder, user_id, start, hours):
+    end_date = (start + timedelta(hours=hours)).date()
+    row_count = 0
+    tracemalloc.start()
+    try:
+        for chunk in encoder(iter_export_rows(user_id, start.date(), end_date, yield_per=100)):
+            row_count += chunk.count(b'\n')
+        return row_count, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
@@ -0,0 +1,195 @@
+# tests/test_forecast.py
+
+"""
+Tests for the vectorised cash-flow forecast and its endpoint.
+"""
+
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+from budget_app import create_app, db
+from budget_app.models import User, UserProfile, Income, Expense, RecurringTransaction
+from budget_app.services.exchange_rates import import_rates, invalidate_rates
+from budget_app.services.forecast import build_forecast, forecast_balances
+from budget_app.services.recurring_expenses import add_months, due_occurrences, run_recurring
+from budget_app.services.rollups import bump_data_version, rebuild_rollups
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+START = date(2024, 1, 15)
+
+def _user(username='alice'):
+    user = User(username=username, email=f'{username}@example.com', password='x')
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+def _reference_flows(user_id, start, months):
+    """Per-day flows built one occurrence at a time with the scheduler's own date arithmetic."""
+    end = add_months(start, months)
+    flows = np.zeros((end - start).days)
+    horizon = datetime.combine(end, datetime.min.time()) - timedelta(microseconds=1)
+    for entry in RecurringTransaction.query.filter_by(user_id=user_id):
+        if entry.interval not in ('daily', 'weekly', 'monthly'):
+            continue
+        occurrences, _ = due_occurrences(entry.next_date, entry.interval, horizon, limit=10 ** 6, anchor_day=entry.anchor_day)
+        for occurred_at in occurrences:
+            day = max((occurred_at.date() - start).days, 0)
+            flows[day] += entry.amount if entry.type == 'income' else -entry.amount
+    return flows
+
+def test_forecast_matches_occurrence_by_occurrence_expansion(app):
+    user = _user()
+    rng = random.Random(7)
+    for _ in range(200):
+        entry = RecurringTransaction(
+            type=rng.choice(['income', 'expense']), amount=rng.randint(1, 500),
+            interval=rng.choice(['daily', 'weekly', 'monthly', 'yearly']),
+            next_date=datetime(2024, 1, 31) + timedelta(days=rng.randint(-90, 500)), user_id=user.id,
+        )
+        if entry.interval == 'monthly' and rng.random() < 0.3:
+            # Anchored past the end of a short month, as the scheduler leaves it.
+            entry.anchor_day = rng.choice([29, 30, 31])
+            entry.next_date = add_months(entry.next_date, 0, day=entry.anchor_day)
+        db.session.add(entry)
+    db.session.commit()
+
+    forecast = build_forecast(user.id, START, 24)
+
+    assert len(forecast['dates']) == (date(2026, 1, 15) - START).days
+    assert forecast['dates'][0] == np.datetime64('2024-01-15')
+    np.testing.assert_allclose(forecast['flows'], _reference_flows(user.id, START, 24), atol=1e-6)
+
+def test_monthly_schedules_clamp_and_overdue_occurrences_land_on_day_one(app):
+    user = _user()
+    db.session.add_all([
+        Income(source='Salary', amount=1000, date=date(2024, 1, 1), currency_code='USD', user_id=user.id),
+        Expense(category='Food', amount=250, date=datetime(2024, 1, 2), currency_code='USD', user_id=user.id),
+        Expense(category='Food', amount=99, date=datetime(2024, 1, 2), currency_code='EUR', user_id=user.id),
+        RecurringTransaction(type='expense', amount=100, category='Rent', interval='monthly',
+                             next_date=datetime(2024, 1, 31), user_id=user.id),
+        RecurringTransaction(type='income', amount=40, category='Refund', interval='weekly',
+                             next_date=datetime(2023, 12, 30), user_id=user.id),
+    ])
+    db.session.commit()
+    rebuild_rollups()
+
+    forecast = build_forecast(user.id, START, 3)
+    by_day = dict(zip(forecast['dates'].astype(date), forecast['flows']))
+
+    assert forecast['starting_balance'] == 750
+    assert forecast['missing_currencies'] == ['EUR']
+    # Dec 30, Jan 6 and Jan 13 are overdue; the next refund is Jan 20.
+    assert by_day[START] == 120
+    assert by_day[date(2024, 1, 20)] == 40
+    assert by_day[date(2024, 1, 31)] == -100
+    assert by_day[date(2024, 2, 29)] == -100
+    assert by_day[date(2024, 3, 31)] == -100
+    assert forecast['expenses'] == 300
+    assert forecast['ending_balance'] == round(750 + forecast['income'] - 300, 2)
+    assert forecast['balances'][-1] == forecast['ending_balance']
+
+def test_forecast_converts_every_currency_into_the_users_currency(app):
+    user = _user()
+    db.session.add_all([
+        Income(source='Salary', amount=1000, date=date(2024, 1, 1), currency_code='USD', user_id=user.id),
+        Income(source='Gift', amount=5000, date=date(2024, 1, 1), currency_code='INR', user_id=user.id),
+        Expense(category='Food', amount=100, date=datetime(2024, 1, 2), currency_code='EUR', user_id=user.id),
+        Expense(category='Food', amount=10, date=datetime(2024, 1, 2), currency_code='GBP', user_id=user.id),
+        RecurringTransaction(type='expense', amount=10, category='Phone', interval='monthly',
+                             next_date=datetime(2024, 2, 1), user_id=user.id),
+    ])
+    db.session.commit()
+    rebuild_rollups()
+    import_rates([{'date': '2024-01-01', 'base': 'USD', 'quote': 'INR', 'rate': 80.0},
+                  {'date': '2024-01-01', 'base': 'EUR', 'quote': 'USD', 'rate': 1.1}])
+
+    try:
+        forecast = build_forecast(user.id, START, 3, currency_code='INR')
+        assert forecast['currency_code'] == 'INR'
+        assert forecast['starting_balance'] == 1000 * 80 + 5000 - 100 * 1.1 * 80
+        assert forecast['missing_currencies'] == ['GBP']
+        assert forecast['expenses'] == 3 * 10 * 80
+        assert forecast['ending_balance'] == round(forecast['starting_balance'] - 2400, 2)
+
+        # Without a rate for the schedules' currency the forecast stays in USD.
+        forecast = build_forecast(user.id, START, 3, currency_code='AUD')
+        assert forecast['currency_code'] == 'USD'
+        assert forecast['missing_currencies'] == ['GBP']
+        assert forecast['starting_balance'] == round(1000 + 5000 / 80 - 110, 2)
+    finally:
+        invalidate_rates()
+
+def test_forecast_is_cached_until_the_data_version_changes(app):
+    user = _user()
+    db.session.add(RecurringTransaction(type='expense', amount=10, interval='daily',
+                                        next_date=datetime(2024, 1, 1), user_id=user.id))
+    db.session.commit()
+
+    first = forecast_balances(user.id, 6, start=START)
+    assert forecast_balances(user.id, 6, start=START) is first
+    assert forecast_balances(user.id, 12, start=START) is not first
+
+    run_recurring(now=datetime(2024, 1, 20))
+    refreshed = forecast_balances(user.id, 6, start=START)
+    assert refreshed is not first
+    assert refreshed['starting_balance'] == -200
+
+    bump_data_version(user.id)
+    db.session.commit()
+    assert forecast_balances(user.id, 6, start=START) is not refreshed
+
+def test_24_month_forecast_for_hundreds_of_schedules_is_fast(app):
+    user = _user()
+    rng = random.Random(3)
+    db.session.execute(RecurringTransaction.__table__.insert(), [
+        {
+            'type': rng.choice(['income', 'expense']), 'amount': rng.uniform(1, 500),
+            'interval': rng.choice(['daily', 'weekly', 'monthly']),
+            'next_date': datetime(2024, 1, 1) + timedelta(days=rng.randint(0, 60)), 'user_id': user.id,
+        }
+        for _ in range(500)
+    ])
+    db.session.commit()
+
+    build_forecast(user.id, START, 24)
+    timings = []
+    for _ in range(5):
+        started = time.perf_counter()
+        build_forecast(user.id, START, 24)
+        timings.append(time.perf_counter() - started)
+    assert min(timings) < 0.05
+
+def test_forecast_endpoint(app):
+    user = _user()
+    db.session.add(RecurringTransaction(type='income', amount=50, interval='weekly',
+                                        next_date=datetime.utcnow() + timedelta(days=1), user_id=user.id))
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+
+    response = client.get('/forecast?months=24')
+
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload['currency_code'] == 'USD'
+    assert len(payload['dates']) == len(payload['balances'])
+    assert len(payload['dates']) > 700
+    assert payload['dates'][0] == datetime.utcnow().date().isoformat()
+    assert payload['ending_balance'] == payload['balances'][-1]
+    assert payload['income'] == payload['ending_balance']
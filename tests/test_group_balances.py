@@ -0,0 +1,149 @@
+# tests/test_group_balances.py
+
+"""
+Tests for the persisted group balance ledger and its consistency checker.
+"""
+
+import pytest
+from sqlalchemy import text
+from budget_app import create_app, db
+from budget_app.models import User, Group, GroupMember, SharedExpense, ExpenseShare, GroupBalance
+from budget_app.services.group_balances import (
+    check_group_balances, compute_group_balances, ledger_balances, track_shared_expense
+)
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    monkeypatch.setenv('CATEGORY_MODEL_PATH', str(tmp_path / 'model.pkl'))
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def group(app):
+    owner = User(username='owner', email='owner@example.com', password='x')
+    guest = User(username='guest_abc', email='guest_abc@example.com', password='x', is_guest=True, invite_token='tok')
+    friend = User(username='friend', email='friend@example.com', password='x')
+    db.session.add_all([owner, guest, friend])
+    db.session.flush()
+    group = Group(name='Trip', created_by=owner.id)
+    db.session.add(group)
+    db.session.flush()
+    db.session.add_all([GroupMember(group_id=group.id, user_id=owner.id), GroupMember(group_id=group.id, user_id=guest.id)])
+    db.session.commit()
+    return group, owner, guest, friend
+
+def _login(app, user):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    return client
+
+def _add_expense(group, payer, amount, split_map, currency_code='USD'):
+    expense = SharedExpense(group_id=group.id, description='Dinner', amount=amount, currency_code=currency_code, paid_by=payer.id)
+    db.session.add(expense)
+    db.session.flush()
+    db.session.add_all([ExpenseShare(expense_id=expense.id, user_id=user_id, amount_owed=owed) for user_id, owed in split_map.items()])
+    track_shared_expense(expense, split_map)
+    db.session.commit()
+
+def _ledger(group_id):
+    return {
+        (row.group_id, row.user_id, row.currency_code): row.balance
+        for row in GroupBalance.query.filter_by(group_id=group_id)
+    }
+
+def test_add_shared_expense_updates_ledger(app, group):
+    group, owner, guest, _ = group
+    client = _login(app, owner)
+
+    response = client.post(f'/add_shared_expense/{group.id}', data={
+        'description': 'Hotel', 'amount': '100', 'currency_code': 'EUR', 'split_method': 'equal', 'paid_by': owner.id,
+    })
+
+    assert response.status_code == 302
+    assert _ledger(group.id) == {(group.id, owner.id, 'EUR'): 50.0, (group.id, guest.id, 'EUR'): -50.0}
+    assert _ledger(group.id) == compute_group_balances([group.id])
+
+def test_claim_invite_moves_guest_balances(app, group):
+    group, owner, guest, friend = group
+    _add_expense(group, owner, 30.0, {owner.id: 15.0, guest.id: 15.0})
+    _add_expense(group, guest, 10.0, {owner.id: 5.0, guest.id: 5.0})
+    friend_id = friend.id
+
+    response = _login(app, friend).get('/invite/tok')
+
+    assert response.status_code == 302
+    assert ledger_balances(group.id) == {owner.id: {'USD': 10.0}, friend_id: {'USD': -10.0}}
+    assert check_group_balances()['drifted_keys'] == 0
+
+def test_checker_reports_and_repairs_drift(app, group):
+    group, owner, guest, _ = group
+    _add_expense(group, owner, 30.0, {owner.id: 15.0, guest.id: 15.0})
+    GroupBalance.query.filter_by(user_id=guest.id).update({'balance': 99.0})
+    db.session.commit()
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['groups', 'check-balances'])
+    assert result.exit_code == 1
+    assert 'Groups with drift: 1' in result.output
+
+    result = runner.invoke(args=['groups', 'check-balances', '--repair', '--chunk-size', '1'])
+    assert result.exit_code == 0
+    assert _ledger(group.id) == compute_group_balances([group.id])
+    assert check_group_balances()['drifted_keys'] == 0
+
+def test_groups_without_ledger_rows_are_read_from_shares(app, group):
+    group, owner, guest, _ = group
+    expense = SharedExpense(group_id=group.id, description='Taxi', amount=20.0, currency_code='USD', paid_by=guest.id)
+    db.session.add(expense)
+    db.session.flush()
+    db.session.add_all([
+        ExpenseShare(expense_id=expense.id, user_id=owner.id, amount_owed=10.0),
+        ExpenseShare(expense_id=expense.id, user_id=guest.id, amount_owed=10.0),
+    ])
+    db.session.commit()
+
+    assert ledger_balances(group.id) == {owner.id: {'USD': -10.0}, guest.id: {'USD': 10.0}}
+    # Reading never writes; the next expense or check-balances --repair backfills.
+    assert GroupBalance.query.count() == 0
+    assert check_group_balances(repair=True)['drifted_groups'] == 1
+    assert GroupBalance.query.count() == 2
+
+def test_legacy_groups_are_backfilled_before_their_first_new_expense(app, group):
+    group, owner, guest, _ = group
+    # Recorded before the ledger existed: the guest owes the owner 50.
+    expense = SharedExpense(group_id=group.id, description='Hotel', amount=100.0, currency_code='USD', paid_by=owner.id)
+    db.session.add(expense)
+    db.session.flush()
+    db.session.add_all([
+        ExpenseShare(expense_id=expense.id, user_id=owner.id, amount_owed=50.0),
+        ExpenseShare(expense_id=expense.id, user_id=guest.id, amount_owed=50.0),
+    ])
+    db.session.commit()
+
+    _add_expense(group, guest, 10.0, {owner.id: 5.0, guest.id: 5.0})
+
+    assert ledger_balances(group.id) == {owner.id: {'USD': 45.0}, guest.id: {'USD': -45.0}}
+    assert check_group_balances()['drifted_keys'] == 0
+
+def test_balances_are_added_in_sql_not_from_loaded_rows(app, group):
+    group, owner, guest, _ = group
+    _add_expense(group, owner, 30.0, {owner.id: 15.0, guest.id: 15.0})
+    loaded = GroupBalance.query.filter_by(group_id=group.id).all()
+    assert len(loaded) == 2
+
+    # Another writer's expense lands after those rows were read.
+    db.session.execute(text('UPDATE group_balance SET balance = balance - 500 WHERE user_id = :id'), {'id': guest.id})
+    db.session.execute(text('UPDATE group_balance SET balance = balance + 500 WHERE user_id = :id'), {'id': owner.id})
+    _add_expense(group, owner, 10.0, {owner.id: 5.0, guest.id: 5.0})
+
+    assert _ledger(group.id) == {(group.id, owner.id, 'USD'): 25.0, (group.id, guest.id, 'USD'): -25.0}
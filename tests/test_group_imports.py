@@ -0,0 +1,140 @@
+# tests/test_group_imports.py
+
+"""
+Tests for bulk CSV imports of shared expenses and the pure split computation.
+"""
+
+import pytest
+from sqlalchemy import event
+from budget_app import create_app, db
+from budget_app.models import User, Group, GroupMember, SharedExpense, ExpenseShare, GroupBalance
+from budget_app.services.group_balances import compute_group_balances
+from budget_app.services.group_imports import import_shared_expenses
+from budget_app.services.splits import compute_split
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    monkeypatch.setenv('CATEGORY_MODEL_PATH', str(tmp_path / 'model.pkl'))
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def group(app):
+    alice = User(username='alice', email='alice@example.com', password='x')
+    bob = User(username='bob', email='bob@example.com', password='x')
+    guest = User(username='guest_x1', email='guest_x1@example.com', password='x', name='Carol', is_guest=True)
+    db.session.add_all([alice, bob, guest])
+    db.session.flush()
+    group = Group(name='Trip', created_by=alice.id)
+    db.session.add(group)
+    db.session.flush()
+    db.session.add_all([GroupMember(group_id=group.id, user_id=user.id) for user in (alice, bob, guest)])
+    db.session.commit()
+    return group
+
+VALID_CSV = """description,amount,paid_by,currency_code,split_method,shares,date
+Hotel,100,alice,EUR,equal,,2024-05-01
+Dinner,90,Carol,,exact,alice=30; bob=30; carol=30,
+Museum,60,BOB,USD,percentage,alice=50; bob=25; Carol=25,2024-05-02
+"""
+
+def test_import_writes_expenses_shares_and_ledger(group):
+    report = import_shared_expenses(group, VALID_CSV, default_currency='USD')
+
+    assert report == {'rows': 3, 'imported': 3, 'errors': [], 'dry_run': False}
+    expenses = SharedExpense.query.order_by(SharedExpense.id).all()
+    assert [(expense.description, expense.currency_code, expense.split_method) for expense in expenses] == [
+        ('Hotel', 'EUR', 'equal'), ('Dinner', 'USD', 'exact'), ('Museum', 'USD', 'percentage'),
+    ]
+    assert [share.amount_owed for share in expenses[0].shares] == [33.34, 33.33, 33.33]
+    assert sorted(share.amount_owed for share in expenses[2].shares) == [15.0, 15.0, 30.0]
+    ledger = {(row.group_id, row.user_id, row.currency_code): row.balance for row in GroupBalance.query}
+    assert ledger == compute_group_balances([group.id])
+
+def test_invalid_rows_are_reported_and_nothing_is_written(group):
+    data = VALID_CSV + "Taxi,abc,alice,,,,\nBoat,40,dave,,,,\nTrain,30,alice,,exact,alice=10; bob=10,\n"
+
+    report = import_shared_expenses(group, data)
+
+    assert report['imported'] == 0
+    assert [line for line, _ in report['errors']] == [5, 6, 7]
+    assert "'dave' is not a member" in report['errors'][1][1]
+    assert SharedExpense.query.count() == 0
+    assert ExpenseShare.query.count() == 0
+    assert GroupBalance.query.count() == 0
+
+def test_non_finite_numbers_are_row_errors(group):
+    data = ("description,amount,paid_by,split_method,shares\n"
+            "Taxi,inf,alice,,\nBoat,1e400,alice,,\nTrain,nan,alice,,\n"
+            "Bus,30,alice,exact,alice=inf; bob=10\nTram,30,alice,percentage,alice=nan; bob=50\n")
+
+    report = import_shared_expenses(group, data)
+
+    assert report['errors'] == [
+        (2, "Amount 'inf' is not a number."),
+        (3, "Amount '1e400' is not a number."),
+        (4, "Amount 'nan' is not a number."),
+        (5, "Share 'alice=inf' is not a number."),
+        (6, "Share 'alice=nan' is not a number."),
+    ]
+    assert SharedExpense.query.count() == 0
+
+def test_missing_columns_are_rejected(group):
+    report = import_shared_expenses(group, "description,amount\nHotel,100\n")
+    assert report['errors'] == [(1, 'Missing required column(s): paid_by.')]
+
+def test_bulk_import_uses_batched_inserts(app, group):
+    data = 'description,amount,paid_by\n' + ''.join(f'Item {index},{index + 1},alice\n' for index in range(500))
+    inserts = []
+    listener = lambda conn, cursor, statement, *args: inserts.append(statement) if statement.startswith('INSERT') else None
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        report = import_shared_expenses(group, data)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert report['imported'] == 500
+    assert ExpenseShare.query.count() == 1500
+    # Expense ids come back through ordered RETURNING (batched where the backend supports it);
+    # shares and ledger rows are always written in batches.
+    assert len([statement for statement in inserts if 'INTO expense_share' in statement]) == 1
+    assert len([statement for statement in inserts if 'INTO group_balance' in statement]) <= 3
+
+def test_import_route_and_cli(app, group):
+    alice = User.query.filter_by(username='alice').one()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(alice.id)
+        session['_fresh'] = True
+
+    response = client.post(f'/group/{group.id}/import', data={'csv_text': VALID_CSV, 'dry_run': 'y'})
+    assert response.status_code == 200
+    assert SharedExpense.query.count() == 0
+
+    response = client.post(f'/group/{group.id}/import', data={'csv_text': VALID_CSV})
+    assert response.status_code == 302
+    assert SharedExpense.query.count() == 3
+
+def test_cli_reports_errors(app, group, tmp_path):
+    path = tmp_path / 'expenses.csv'
+    path.write_text("description,amount,paid_by\nTaxi,-5,alice\n")
+
+    result = app.test_cli_runner().invoke(args=['groups', 'import-expenses', str(group.id), str(path)])
+
+    assert result.exit_code == 1
+    assert 'line 2: Amount must be at least 0.01.' in result.output
+
+def test_compute_split_is_pure_and_balances_to_the_cent():
+    assert compute_split(10, 'equal', [1, 2, 3]) == ({1: 3.34, 2: 3.33, 3: 3.33}, None)
+    assert compute_split(10, 'percentage', [1, 2], {1: 33.3, 2: 66.7}) == ({1: 3.33, 2: 6.67}, None)
+    assert compute_split(10, 'exact', [1, 2], {1: 4, 2: 5})[1] == 'Exact split amounts must match the total expense.'
+    assert compute_split(10, 'percentage', [1, 2], {1: 100})[1] == 'Enter a split value for every member.'
+    assert compute_split(10, 'equal', []) == ({}, 'Group has no members.')
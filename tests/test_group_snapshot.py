@@ -0,0 +1,127 @@
+# tests/test_group_snapshot.py
+
+"""
+Tests that group snapshots are built from a constant number of queries.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import pytest
+from flask import g
+from sqlalchemy import event
+from budget_app import create_app, db
+from budget_app.models import User, Group, GroupMember, SharedExpense, ExpenseShare
+from budget_app.routes import _build_group_snapshot
+from budget_app.services.group_balances import check_group_balances
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    monkeypatch.setenv('CATEGORY_MODEL_PATH', str(tmp_path / 'model.pkl'))
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def _make_group(member_count, expense_count):
+    users = [
+        User(username=f'user{index}', email=f'user{index}@example.com', password='x', is_guest=index % 3 == 2)
+        for index in range(member_count)
+    ]
+    db.session.add_all(users)
+    db.session.flush()
+    group = Group(name='Trip', created_by=users[0].id)
+    db.session.add(group)
+    db.session.flush()
+    db.session.add_all([GroupMember(group_id=group.id, user_id=user.id) for user in users])
+
+    started = datetime(2024, 1, 1)
+    for index in range(expense_count):
+        amount = 10.0 + index
+        expense = SharedExpense(
+            group_id=group.id,
+            description=f'Expense {index}',
+            amount=amount,
+            currency_code='EUR' if index % 4 == 0 else 'USD',
+            split_method='equal',
+            paid_by=users[index % member_count].id,
+            created_at=started + timedelta(hours=index % 7),
+        )
+        db.session.add(expense)
+        db.session.flush()
+        # Leave some expenses without shares to cover the fallback split.
+        if index % 5:
+            db.session.add_all([
+                ExpenseShare(expense_id=expense.id, user_id=user.id, amount_owed=round(amount / member_count, 2))
+                for user in users
+            ])
+    db.session.commit()
+    check_group_balances(repair=True)
+    return group, users
+
+def _legacy_balances(group):
+    balances = defaultdict(lambda: defaultdict(float))
+    for expense in group.expenses:
+        for share in expense.shares:
+            balances[share.user_id][expense.currency_code] -= share.amount_owed
+        balances[expense.paid_by][expense.currency_code] += expense.amount
+    return balances
+
+def _count_view_queries(app, group, viewer):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(viewer.id)
+        session['_fresh'] = True
+    db.session.expire_all()
+    # The fixture's app context outlives requests; make every request load its user.
+    g.pop('_login_user', None)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(f'/view_group/{group.id}')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert response.status_code == 200
+    return len(statements)
+
+def test_snapshot_matches_legacy_balances(app):
+    group, users = _make_group(member_count=4, expense_count=12)
+    snapshot = _build_group_snapshot(group)
+    legacy = _legacy_balances(group)
+
+    assert list(snapshot['member_users']) == [user.id for user in users]
+    for row in snapshot['member_balance_rows']:
+        expected = legacy[row['user'].id]
+        assert row['balances'].keys() == expected.keys()
+        for currency_code, value in expected.items():
+            assert row['balances'][currency_code] == pytest.approx(value)
+
+    feed = snapshot['expense_feed']
+    assert len(feed) == 12
+    assert [item['created_at'] for item in feed] == sorted((item['created_at'] for item in feed), reverse=True)
+    unsplit = next(item for item in feed if item['description'] == 'Expense 0')
+    assert unsplit['split_amount'] == pytest.approx(10.0 / 4)
+
+def test_view_group_query_count_is_constant(app):
+    small_group, small_users = _make_group(member_count=3, expense_count=3)
+    small = _count_view_queries(app, small_group, small_users[0])
+
+    db.session.query(ExpenseShare).delete()
+    db.session.query(SharedExpense).delete()
+    db.session.query(GroupMember).delete()
+    db.session.query(Group).delete()
+    db.session.query(User).delete()
+    db.session.commit()
+
+    large_group, large_users = _make_group(member_count=40, expense_count=200)
+    large = _count_view_queries(app, large_group, large_users[0])
+
+    assert large == small
+    assert large <= 6
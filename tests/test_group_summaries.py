@@ -0,0 +1,111 @@
+# tests/test_group_summaries.py
+
+"""
+Tests for the one-statement group summaries behind /groups.
+"""
+
+from collections import defaultdict
+
+import pytest
+from flask import g
+from sqlalchemy import event
+from budget_app import create_app, db
+from budget_app.models import User, Group, GroupMember, SharedExpense, ExpenseShare
+from budget_app.services.group_balances import group_summaries
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    monkeypatch.setenv('CATEGORY_MODEL_PATH', str(tmp_path / 'model.pkl'))
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def users(app):
+    users = [User(username=f'user{index}', email=f'user{index}@example.com', password='x') for index in range(3)]
+    db.session.add_all(users)
+    db.session.commit()
+    return users
+
+def _add_groups(owner, others, count):
+    for index in range(count):
+        group = Group(name=f'Group {index}', created_by=owner.id)
+        db.session.add(group)
+        db.session.flush()
+        members = [owner] + others
+        db.session.add_all([GroupMember(group_id=group.id, user_id=user.id) for user in members])
+        for expense_index in range(index % 3):
+            expense = SharedExpense(
+                group_id=group.id,
+                description='Dinner',
+                amount=30.0,
+                currency_code='EUR' if expense_index else 'USD',
+                paid_by=members[expense_index].id,
+            )
+            db.session.add(expense)
+            db.session.flush()
+            db.session.add_all([ExpenseShare(expense_id=expense.id, user_id=user.id, amount_owed=10.0) for user in members])
+    db.session.commit()
+
+def _legacy_net(group, user_id):
+    net = defaultdict(float)
+    for expense in group.expenses:
+        currency_code = expense.currency_code or 'USD'
+        net[currency_code] += 0.0
+        if expense.paid_by == user_id:
+            net[currency_code] += expense.amount
+        for share in expense.shares:
+            if share.user_id == user_id:
+                net[currency_code] -= share.amount_owed
+    return dict(net)
+
+def test_summaries_match_group_contents(users):
+    owner, member, outsider = users
+    _add_groups(owner, [member], 5)
+    # A group the member created without adding themselves still shows up.
+    db.session.add(Group(name='Solo', created_by=member.id))
+    db.session.commit()
+
+    summaries = group_summaries(member.id)
+
+    groups = Group.query.filter(Group.id.in_([summary['id'] for summary in summaries])).order_by(Group.id).all()
+    assert [summary['name'] for summary in summaries] == [group.name for group in groups]
+    for summary, group in zip(summaries, groups):
+        assert summary['member_count'] == len(group.members)
+        assert summary['expense_count'] == len(group.expenses)
+        assert summary['currencies'] == sorted({expense.currency_code for expense in group.expenses})
+        assert summary['net'] == pytest.approx(_legacy_net(group, member.id))
+    assert group_summaries(outsider.id) == []
+
+def _count_queries(app, user):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    g.pop('_login_user', None)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get('/groups')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert response.status_code == 200
+    return len(statements)
+
+def test_groups_page_query_count_is_constant(app, users):
+    owner, member, outsider = users
+    _add_groups(owner, [member], 3)
+    few_groups = _count_queries(app, member)
+
+    _add_groups(outsider, [member, owner], 300)
+    many_groups = _count_queries(app, member)
+
+    assert many_groups == few_groups <= 2
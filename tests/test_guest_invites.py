@@ -0,0 +1,138 @@
+# tests/test_guest_invites.py
+
+"""
+Tests that claiming a guest invite merges the guest's data with set-based statements
+and ends in the same state as the original row-by-row merge.
+"""
+
+import pytest
+from flask import g
+from sqlalchemy import event
+from budget_app import create_app, db
+from budget_app.models import User, Group, GroupMember, SharedExpense, ExpenseShare, GroupBalance
+from budget_app.services.group_balances import apply_balance_deltas, compute_group_balances, track_shared_expense
+from budget_app.services.guest_invites import merge_guest_account
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    monkeypatch.setenv('CATEGORY_MODEL_PATH', str(tmp_path / 'model.pkl'))
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def _build(extra_shares=0):
+    owner = User(username='owner', email='owner@example.com', password='x')
+    guest = User(username='guest_abc', email='guest_abc@example.com', password='x', name='Sam', is_guest=True, invite_token='tok')
+    friend = User(username='friend', email='friend@example.com', password='x')
+    db.session.add_all([owner, guest, friend])
+    db.session.flush()
+    shared = Group(name='Flat', created_by=owner.id)
+    trip = Group(name='Trip', created_by=friend.id)
+    db.session.add_all([shared, trip])
+    db.session.flush()
+    db.session.add_all([
+        GroupMember(group_id=shared.id, user_id=owner.id),
+        GroupMember(group_id=shared.id, user_id=guest.id),
+        GroupMember(group_id=shared.id, user_id=friend.id),
+        GroupMember(group_id=trip.id, user_id=friend.id),
+        GroupMember(group_id=trip.id, user_id=guest.id),
+    ])
+
+    def add(group, payer, amount, split_map, currency_code='USD'):
+        expense = SharedExpense(group_id=group.id, description='Item', amount=amount, currency_code=currency_code, paid_by=payer.id)
+        db.session.add(expense)
+        db.session.flush()
+        db.session.add_all([ExpenseShare(expense_id=expense.id, user_id=user_id, amount_owed=owed) for user_id, owed in split_map.items()])
+        track_shared_expense(expense, split_map)
+
+    add(shared, owner, 90.0, {owner.id: 30.0, guest.id: 30.0, friend.id: 30.0})
+    add(shared, guest, 40.5, {owner.id: 20.25, guest.id: 20.25}, 'EUR')
+    add(shared, friend, 10.0, {owner.id: 5.0, friend.id: 5.0})
+    add(trip, guest, 60.0, {guest.id: 30.0, friend.id: 30.0})
+    add(trip, friend, 25.0, {guest.id: 12.5, friend.id: 12.5}, 'EUR')
+    for index in range(extra_shares):
+        add(trip, friend, 2.0, {guest.id: 1.0, friend.id: 1.0})
+    db.session.commit()
+    return owner.id, guest.id
+
+def _legacy_merge(guest_id, user_id):
+    # The per-row merge claim_invite used to run, kept as the reference behaviour.
+    for membership in GroupMember.query.filter_by(user_id=guest_id).all():
+        if GroupMember.query.filter_by(group_id=membership.group_id, user_id=user_id).first():
+            db.session.delete(membership)
+        else:
+            membership.user_id = user_id
+    for expense in SharedExpense.query.filter_by(paid_by=guest_id).all():
+        expense.paid_by = user_id
+    for share in ExpenseShare.query.filter_by(user_id=guest_id).all():
+        existing_share = ExpenseShare.query.filter_by(expense_id=share.expense_id, user_id=user_id).first()
+        if existing_share:
+            existing_share.amount_owed += share.amount_owed
+            db.session.delete(share)
+        else:
+            share.user_id = user_id
+    for row in GroupBalance.query.filter_by(user_id=guest_id).order_by(GroupBalance.id).all():
+        apply_balance_deltas(row.group_id, {(user_id, row.currency_code): row.balance})
+        db.session.delete(row)
+
+def _state():
+    return {
+        'members': sorted((row.group_id, row.user_id) for row in GroupMember.query),
+        'payers': sorted((row.id, row.paid_by) for row in SharedExpense.query),
+        'shares': sorted((row.expense_id, row.user_id, round(row.amount_owed, 2)) for row in ExpenseShare.query),
+        'ledger': sorted((row.group_id, row.user_id, row.currency_code, round(row.balance, 2)) for row in GroupBalance.query),
+    }
+
+def _reset():
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+def test_set_based_merge_matches_row_by_row_merge(app):
+    owner_id, guest_id = _build()
+    _legacy_merge(guest_id, owner_id)
+    db.session.commit()
+    expected = _state()
+
+    _reset()
+    owner_id, guest_id = _build()
+    merge_guest_account(guest_id, owner_id)
+    db.session.commit()
+    merged = _state()
+
+    assert merged == expected
+    assert not any(user_id == guest_id for _, user_id in merged['members'])
+    ledger = {(group_id, user_id, code): balance for group_id, user_id, code, balance in merged['ledger']}
+    assert ledger == compute_group_balances([1, 2])
+
+def test_claim_invite_runs_a_constant_number_of_statements(app):
+    counts = []
+    for extra_shares in (0, 300):
+        _reset()
+        owner_id, guest_id = _build(extra_shares)
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(owner_id)
+            session['_fresh'] = True
+        db.session.expire_all()
+        g.pop('_login_user', None)
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = client.get('/invite/tok')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert response.status_code == 302
+        assert db.session.get(User, guest_id) is None
+        assert ExpenseShare.query.filter_by(user_id=guest_id).count() == 0
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1]
@@ -0,0 +1,68 @@
+# tests/test_import_budget.py
+
+"""
+Cold-start budget for the web process: import time, module count and heavy dependencies.
+"""
+
+import os
+
+import pytest
+from budget_app import create_app
+from budget_app.services.import_profile import IMPORT_TIME_BUDGET, budget_problems, profile_imports
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+def test_web_import_stays_within_budget():
+    profile = profile_imports()
+    # Wall-clock time depends on the machine, so it is only checked when IMPORT_TIME_BUDGET is set.
+    time_budget = IMPORT_TIME_BUDGET if os.environ.get('IMPORT_TIME_BUDGET') else None
+
+    assert budget_problems(profile, time_budget=time_budget) == [], profile['packages'][:10]
+
+def test_heavy_dependencies_load_on_their_code_paths():
+    profile = profile_imports(('budget_app.routes', 'budget_app.services.forecast', 'budget_app.ml_utils'))
+    assert profile['heavy'] == ['numpy']
+
+    profile = profile_imports(('budget_app.services.export_jobs', 'budget_app.ml_online'))
+    assert {'numpy', 'sklearn'} <= set(profile['heavy'])
+    assert 'reportlab' not in profile['heavy']
+
+def test_budget_problems_name_each_overrun():
+    profile = {'seconds': 2.0, 'modules': ['m'] * 10, 'packages': [], 'heavy': ['sklearn']}
+
+    assert budget_problems(profile, time_budget=1.0, module_budget=5) == [
+        'import took 2.000s, budget 1.000s',
+        '10 modules imported, budget 5',
+        'heavy dependencies imported at startup: sklearn',
+    ]
+    assert budget_problems(profile, time_budget=None, module_budget=5) == [
+        '10 modules imported, budget 5',
+        'heavy dependencies imported at startup: sklearn',
+    ]
+
+def test_import_time_command(app):
+    result = app.test_cli_runner().invoke(args=['import-time', '--top', '3'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Heavy dependencies loaded: none' in result.output
+    assert len([line for line in result.output.splitlines() if line.startswith('  ')]) == 3
+
+    result = app.test_cli_runner().invoke(args=['import-time', '--module-budget', '10'])
+    assert result.exit_code == 1
+    assert 'Over budget:' in result.output
+
+def test_serverless_defaults_skip_migrations_and_warm_up(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    monkeypatch.setenv('VERCEL', '1')
+    monkeypatch.setenv('CATEGORY_MODEL_PATH', '/nonexistent/model.pkl')
+
+    app = create_app()
+
+    assert app.config['CATEGORY_MODEL_WARM_UP'] == 'lazy'
+    assert app.config['ENABLE_MIGRATIONS'] is False
+    assert 'migrate' not in app.extensions
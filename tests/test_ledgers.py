@@ -0,0 +1,96 @@
+# tests/test_ledgers.py
+
+"""
+Tests for keyset pagination of the income and expense ledgers.
+"""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from budget_app import create_app, db
+from budget_app.models import User, Income, Expense
+from budget_app.services.ledgers import keyset_page, decode_cursor
+
+@pytest.fixture
+def app_context(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def user(app_context):
+    user = User(username='ledger', email='ledger@example.com', password='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+def test_keyset_pages_cover_every_row_in_order(user):
+    start = datetime(2024, 1, 1, 9)
+    for index in range(25):
+        # Several rows share a timestamp so the id tie-breaker matters.
+        db.session.add(Expense(amount=index, category='Food', date=start + timedelta(days=index // 3), user_id=user.id))
+    db.session.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        rows, cursor = keyset_page(Expense, user.id, cursor=cursor, page_size=10)
+        seen.extend(rows)
+        if cursor is None:
+            break
+
+    expected = Expense.query.order_by(Expense.date.desc(), Expense.id.desc()).all()
+    assert [row.id for row in seen] == [row.id for row in expected]
+
+def test_later_pages_seek_instead_of_offset(user):
+    for day in range(1, 21):
+        db.session.add(Income(amount=day, source='Job', date=date(2024, 2, day), user_id=user.id))
+    db.session.commit()
+
+    _, cursor = keyset_page(Income, user.id, page_size=5)
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[3]))
+    rows, _ = keyset_page(Income, user.id, cursor=cursor, page_size=5)
+
+    assert [row.date.day for row in rows] == [15, 14, 13, 12, 11]
+    assert len(statements) == 1
+    # The only LIMIT/OFFSET parameters are the page size and a zero offset.
+    assert tuple(statements[0][-2:]) == (6, 0)
+
+def test_malformed_cursor_falls_back_to_first_page(user):
+    assert decode_cursor('not-a-cursor') is None
+    db.session.add(Income(amount=1, source='Job', date=date(2024, 2, 1), user_id=user.id))
+    db.session.commit()
+    rows, cursor = keyset_page(Income, user.id, cursor='%%%')
+    assert len(rows) == 1 and cursor is None
+
+def test_undated_rows_follow_dated_rows_across_page_boundaries(user):
+    for day in range(1, 7):
+        db.session.add(Expense(amount=day, category='Food', date=datetime(2024, 3, day), user_id=user.id))
+    db.session.commit()
+    db.session.execute(Expense.__table__.insert(), [
+        {'amount': 100 + index, 'category': 'Misc', 'date': None, 'currency_code': 'USD', 'user_id': user.id}
+        for index in range(5)
+    ])
+    db.session.commit()
+    undated = [row.id for row in Expense.query.filter(Expense.date.is_(None)).order_by(Expense.id.desc())]
+    dated = [row.id for row in Expense.query.filter(Expense.date.isnot(None)).order_by(Expense.date.desc())]
+
+    # Page size 3 ends a page on the last dated row; page size 4 ends one on an undated row.
+    for page_size in (3, 4):
+        seen, pages, cursor = [], 0, None
+        while True:
+            rows, cursor = keyset_page(Expense, user.id, cursor=cursor, page_size=page_size)
+            seen.extend(row.id for row in rows)
+            pages += 1
+            assert pages <= 4
+            if cursor is None:
+                break
+        assert seen == dated + undated
@@ -0,0 +1,67 @@
+# tests/test_ml_utils.py
+
+"""
+Tests for the process-wide category model holder.
+"""
+
+import os
+import pickle
+
+import pytest
+from budget_app import ml_utils
+from budget_app.ml_utils import CategoryModelHolder, train_model
+
+@pytest.fixture
+def holder(tmp_path, monkeypatch):
+    holder = CategoryModelHolder(str(tmp_path / 'model.pkl'), check_interval=0)
+    monkeypatch.setattr(ml_utils, 'category_model', holder)
+    return holder
+
+def test_model_is_unpickled_once(holder, monkeypatch):
+    holder.warm_up()
+    loads = []
+    real_load = pickle.load
+    monkeypatch.setattr(pickle, 'load', lambda f: loads.append(1) or real_load(f))
+
+    for _ in range(20):
+        assert ml_utils.predict_category('Pizza') == 'Food'
+    assert loads == []
+
+def test_reloads_when_artifact_changes(holder):
+    holder.warm_up()
+    first_version = holder.version
+
+    new_version = train_model(holder.path)
+    # Make sure the signature changes even on filesystems with coarse mtimes.
+    stat = os.stat(holder.path)
+    os.utime(holder.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    holder.get()
+    assert holder.version == new_version != first_version
+
+def test_missing_artifact_falls_back_without_training(holder):
+    assert ml_utils.predict_category('Taxi to airport') == 'Transport'
+    assert not os.path.exists(holder.path)
+
+def test_legacy_tuple_artifact_is_supported(holder):
+    train_model(holder.path)
+    with open(holder.path, 'rb') as f:
+        artifact = pickle.load(f)
+    with open(holder.path, 'wb') as f:
+        pickle.dump((artifact['model'], artifact['vectorizer']), f)
+
+    assert holder.get() is not None
+    assert holder.version.startswith('legacy-')
+
+def test_lazy_warm_up_never_trains_on_the_request_path(holder, tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    monkeypatch.setenv('CATEGORY_MODEL_WARM_UP', 'lazy')
+    monkeypatch.setenv('CATEGORY_MODEL_PATH', holder.path)
+    monkeypatch.setattr(ml_utils, 'train_model', lambda *args, **kwargs: pytest.fail('trained on a request'))
+    from budget_app import create_app
+    create_app()
+
+    assert ml_utils.predict_category('Pizza') == 'Food'
+    assert ml_utils.predict_category('Gift card') == 'Other'
+    assert not os.path.exists(holder.path)
+    assert holder.version is None
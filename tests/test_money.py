@@ -0,0 +1,128 @@
+# tests/test_money.py
+
+"""
+Tests for money stored as integer minor units: conversion, exact SQL arithmetic, splits and the migration.
+"""
+
+import logging
+import os
+import sqlite3
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select, text
+from budget_app import create_app, db
+from budget_app.models import User, Expense, from_minor, minor_units, to_minor
+from budget_app.services.rollups import rebuild_rollups, rollup_currency_totals
+from budget_app.services.splits import compute_split
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def _user():
+    user = User(username='alice', email='alice@example.com', password='x')
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+def test_amounts_round_to_the_cent_half_away_from_zero():
+    assert to_minor(10.005) == 1001
+    assert to_minor(-10.005) == -1001
+    assert to_minor(0.1 + 0.2) == 30
+    assert to_minor(Decimal('19.995')) == 2000
+    assert to_minor('12.5') == 1250
+    assert to_minor(None) == 0
+    assert from_minor(1999) == 19.99
+
+def test_columns_hold_integer_cents(app):
+    user = _user()
+    db.session.add(Expense(category='Food', amount=19.999, date=datetime(2024, 1, 2), user_id=user.id))
+    db.session.commit()
+
+    assert db.session.execute(text('SELECT amount, typeof(amount) FROM expense')).one() == (2000, 'integer')
+    assert Expense.query.one().amount == 20.0
+    assert Expense.query.filter(Expense.amount > 19.99).count() == 1
+    assert Expense.query.filter(Expense.amount == 20).count() == 1
+
+def test_sql_sums_and_arithmetic_are_exact(app):
+    user = _user()
+    db.session.execute(Expense.__table__.insert(), [
+        {'category': 'Coffee', 'amount': 0.1, 'date': datetime(2024, 1, 2), 'currency_code': 'USD', 'user_id': user.id}
+        for _ in range(10000)
+    ])
+    db.session.commit()
+
+    assert db.session.execute(select(func.sum(Expense.amount))).scalar() == 1000.0
+    assert db.session.execute(select(func.sum(minor_units(Expense.amount)))).scalar() == 100000
+    assert db.session.execute(select(func.sum(Expense.amount) - 0.3)).scalar() == 999.7
+    assert db.session.execute(select(func.max(Expense.amount) * 3)).scalar() == 0.3
+
+    rebuild_rollups()
+    assert rollup_currency_totals(user.id, 'expense') == {'USD': 1000.0}
+
+def test_splits_are_exact_to_the_cent():
+    split_map, error = compute_split(200, 'equal', [1, 2, 3])
+    assert error is None
+    assert split_map == {1: 66.66, 2: 66.67, 3: 66.67}
+
+    split_map, error = compute_split(0.1 + 0.2, 'percentage', [1, 2], {1: 33.3, 2: 66.7})
+    assert split_map == {1: 0.1, 2: 0.2}
+    assert to_minor(sum(split_map.values())) == 30
+
+    assert compute_split(10, 'exact', [1, 2], {1: 3.3, 2: 6.7}) == ({1: 3.3, 2: 6.7}, None)
+    _, error = compute_split(10, 'exact', [1, 2], {1: 3.3, 2: 6.69})
+    assert error == 'Exact split amounts must match the total expense.'
+
+def test_float_columns_warn_at_startup_and_migrate_to_cents(monkeypatch, tmp_path, caplog):
+    from flask_migrate import stamp, upgrade
+
+    path = tmp_path / 'legacy.db'
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE expense (
+            id INTEGER PRIMARY KEY, amount FLOAT NOT NULL, category VARCHAR(50) NOT NULL,
+            description VARCHAR(255), date DATETIME, currency_code VARCHAR(3) DEFAULT 'USD' NOT NULL,
+            is_recurring BOOLEAN, frequency VARCHAR(20), user_id INTEGER NOT NULL
+        );
+        INSERT INTO expense (amount, category, user_id) VALUES (10.005, 'Food', 1), (-0.015, 'Refund', 1), (19.99, 'Food', 1);
+    """)
+    connection.commit()
+    connection.close()
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{path}')
+
+    with caplog.at_level(logging.WARNING):
+        app = create_app()
+    assert 'expense.amount still stores money as floats' in caplog.text
+
+    with app.app_context():
+        stamp(directory=MIGRATIONS_DIR, revision='8c41e7d2a9f0')
+        upgrade(directory=MIGRATIONS_DIR, revision='b7d3e5f1c2a8')
+        assert db.session.execute(text('SELECT amount FROM expense ORDER BY id')).scalars().all() == [1001, -2, 1999]
+        assert [expense.amount for expense in Expense.query.order_by(Expense.id)] == [10.01, -0.02, 19.99]
+        db.session.remove()
+
+def test_migrating_a_database_created_from_the_models_leaves_cents_alone(monkeypatch, tmp_path):
+    from flask_migrate import upgrade
+
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'fresh.db'}")
+    app = create_app()
+    with app.app_context():
+        user = _user()
+        db.session.add(Expense(category='Food', amount=12.34, date=datetime(2024, 1, 2), user_id=user.id))
+        db.session.commit()
+
+        upgrade(directory=MIGRATIONS_DIR, revision='b7d3e5f1c2a8')
+        assert db.session.execute(text('SELECT amount FROM expense')).scalar() == 1234
+        db.session.remove()
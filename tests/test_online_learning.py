@@ -0,0 +1,130 @@
+# tests/test_online_learning.py
+
+"""
+Tests for incremental category learning from user corrections.
+"""
+
+import threading
+from datetime import datetime
+
+import pytest
+from budget_app import create_app, db, ml_utils
+from budget_app.ml_online import OnlineCategoryModel
+from budget_app.models import User, Expense
+
+@pytest.fixture
+def online(tmp_path):
+    model = OnlineCategoryModel(str(tmp_path / 'online.pkl'), max_users=2, max_features_per_user=5, persist_every=3)
+    model.load_or_seed(ml_utils.sample_data)
+    return model
+
+def test_correction_personalizes_prediction(online):
+    assert online.predict('Netflix subscription', user_id=1) != 'Entertainment'
+
+    for _ in range(3):
+        assert online.learn(1, 'Netflix subscription', 'Entertainment')
+
+    assert online.predict('Netflix subscription', user_id=1) == 'Entertainment'
+
+def test_unknown_category_is_ignored(online):
+    assert not online.learn(1, 'Rent for March', 'Housing')
+    assert 1 not in online.deltas
+
+def test_deltas_are_bounded(online):
+    for user_id in range(5):
+        online.learn(user_id, 'one two three four five six seven', 'Food')
+
+    assert list(online.deltas) == [3, 4]
+    assert all(len(delta['features']) <= 5 for delta in online.deltas.values())
+
+def test_persists_periodically_and_reloads(online, tmp_path):
+    online.learn(1, 'Netflix subscription', 'Entertainment')
+    online.learn(1, 'Netflix subscription', 'Entertainment')
+    assert not (tmp_path / 'online.pkl').exists()
+
+    online.learn(1, 'Netflix subscription', 'Entertainment')
+    online.wait_for_persist()
+    assert (tmp_path / 'online.pkl').exists()
+
+    restored = OnlineCategoryModel(online.path)
+    restored.load_or_seed([])
+    assert restored.predict('Netflix subscription', user_id=1) == 'Entertainment'
+    assert (restored.model.class_count_ == online.model.class_count_).all()
+
+def test_persist_runs_off_the_request_thread(online):
+    started, release = threading.Event(), threading.Event()
+    online.persist = lambda: started.set() or release.wait(5)
+
+    for _ in range(3):
+        online.learn(1, 'Netflix subscription', 'Entertainment')
+
+    # learn() has returned while the save is still blocked on its own thread.
+    assert started.wait(5)
+    assert online._persist_thread.is_alive()
+    release.set()
+    online.wait_for_persist()
+
+def test_workers_saving_to_one_path_keep_each_others_corrections(tmp_path):
+    path = str(tmp_path / 'online.pkl')
+    first, second = OnlineCategoryModel(path), OnlineCategoryModel(path)
+    first.load_or_seed(ml_utils.sample_data)
+    second.load_or_seed(ml_utils.sample_data)
+    seeded = first.model.class_count_.copy()
+
+    first.learn(1, 'Netflix subscription', 'Entertainment')
+    first.persist()
+    second.learn(2, 'Bus pass', 'Transport')
+    second.learn(2, 'Train ticket', 'Transport')
+    second.persist()
+
+    restored = OnlineCategoryModel(path)
+    restored.load_or_seed([])
+    assert restored.model.class_count_.sum() == seeded.sum() + 3
+    assert sorted(restored.deltas) == [1, 2]
+    assert restored.predict('Netflix subscription', user_id=1) == 'Entertainment'
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    monkeypatch.setenv('CATEGORY_MODEL_PATH', str(tmp_path / 'model.pkl'))
+    monkeypatch.setenv('CATEGORY_MODEL_MODE', 'online')
+    monkeypatch.setenv('ONLINE_MODEL_PATH', str(tmp_path / 'online.pkl'))
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    ml_utils.disable_online_learning()
+
+def test_edit_expense_feeds_corrections(app):
+    user = User(username='alice', email='alice@example.com', password='x')
+    db.session.add(user)
+    db.session.commit()
+    expense = Expense(amount=15, category='Other', description='Netflix subscription', date=datetime(2024, 1, 3), user_id=user.id)
+    db.session.add(expense)
+    db.session.commit()
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+
+    learned = []
+    original_learn = ml_utils.online_model.learn
+    ml_utils.online_model.learn = lambda *args: learned.append(args) or original_learn(*args)
+
+    response = client.post(f'/edit_expense/{expense.id}', data={
+        'amount': '15',
+        'currency_code': 'USD',
+        'category': 'Entertainment',
+        'description': 'Netflix subscription',
+        'date': '2024-01-03',
+    })
+
+    assert response.status_code == 302
+    assert learned == [(user.id, 'Netflix subscription', 'Entertainment')]
+    assert ml_utils.online_model.deltas[user.id]['classes'].sum() == 1
@@ -0,0 +1,124 @@
+# tests/test_query_plans.py
+
+"""
+Query-plan regression tests: every query issued by the hot routes must be
+served by an index instead of a full table scan.
+
+Runs against SQLite by default; set TEST_DATABASE_URL to a PostgreSQL URL to
+check the same routes with EXPLAIN there.
+"""
+
+import os
+import re
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event, text
+from budget_app import create_app, db
+from budget_app.models import User, Income, Expense, Group, GroupMember, SharedExpense, ExpenseShare, UserProfile
+from budget_app.services.rollups import rebuild_rollups
+
+ROUTES = [
+    ('GET', '/dashboard', None),
+    ('GET', '/income', None),
+    ('GET', '/expenses?per_page=2', None),
+    ('GET', '/graph', None),
+    ('GET', '/rules', None),
+    ('GET', '/groups', None),
+    ('GET', '/view_group/{group_id}', None),
+    ('GET', '/group/{group_id}', None),
+    ('GET', '/add_shared_expense/{group_id}', None),
+    ('POST', '/export', {'export_format': 'csv', 'start_date': '2024-01-01', 'end_date': '2024-12-31'}),
+]
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', os.environ.get('TEST_DATABASE_URL', 'sqlite:///:memory:'))
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def seeded(app):
+    owner = User(username='owner', email='owner@example.com', password='x')
+    friend = User(username='friend', email='friend@example.com', password='x')
+    db.session.add_all([owner, friend])
+    db.session.flush()
+    db.session.add(UserProfile(user_id=owner.id, currency='INR'))
+    for day in range(1, 6):
+        db.session.add(Income(amount=100 * day, source='Job', date=date(2024, 3, day), user_id=owner.id))
+        db.session.add(Expense(amount=10 * day, category='Food', date=datetime(2024, 3, day), user_id=owner.id))
+        db.session.add(Income(amount=5, source='Job', date=date(2024, 3, day), user_id=friend.id))
+        db.session.add(Expense(amount=5, category='Food', date=datetime(2024, 3, day), user_id=friend.id))
+
+    group = Group(name='Trip', created_by=owner.id)
+    db.session.add(group)
+    db.session.flush()
+    db.session.add_all([GroupMember(group_id=group.id, user_id=owner.id), GroupMember(group_id=group.id, user_id=friend.id)])
+    expense = SharedExpense(group_id=group.id, description='Hotel', amount=200, paid_by=owner.id)
+    db.session.add(expense)
+    db.session.flush()
+    db.session.add_all([
+        ExpenseShare(expense_id=expense.id, user_id=owner.id, amount_owed=100),
+        ExpenseShare(expense_id=expense.id, user_id=friend.id, amount_owed=100),
+    ])
+    db.session.commit()
+    rebuild_rollups()
+    return {'user_id': owner.id, 'group_id': group.id}
+
+def _capture_route_queries(app, seeded):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(seeded['user_id'])
+        session['_fresh'] = True
+
+    captured = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            captured.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', _record)
+    try:
+        for method, path, data in ROUTES:
+            url = path.format(**seeded)
+            response = client.open(url, method=method, data=data)
+            assert response.status_code < 400, url
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', _record)
+    return captured
+
+def _full_scans(statement, parameters):
+    table_names = set(db.metadata.tables)
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite':
+        plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+        scans = []
+        for row in plan:
+            match = re.match(r'SCAN (\S+)(.*)', row[-1])
+            if match and match.group(1).strip('"') in table_names and 'INDEX' not in match.group(2):
+                scans.append(row[-1])
+        return scans
+
+    connection.execute(text('SET enable_seqscan = off'))
+    plan = connection.exec_driver_sql(f'EXPLAIN {statement}', parameters).fetchall()
+    return [row[0].strip() for row in plan if re.search(r'Seq Scan on "?(\w+)', row[0]) and
+            re.search(r'Seq Scan on "?(\w+)', row[0]).group(1) in table_names]
+
+def test_route_queries_use_indexes(app, seeded):
+    captured = _capture_route_queries(app, seeded)
+    assert captured
+
+    offenders = {}
+    for statement, parameters in captured:
+        scans = _full_scans(statement, parameters)
+        if scans:
+            offenders[statement] = scans
+
+    assert offenders == {}
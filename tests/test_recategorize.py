@@ -0,0 +1,124 @@
+# tests/test_recategorize.py
+
+"""
+Tests for bulk expense re-categorization.
+"""
+
+from datetime import datetime
+
+import pytest
+from budget_app import create_app, db
+from budget_app.models import User, Expense
+from budget_app.services.recategorize import recategorize_expenses
+from budget_app.services.rollups import rebuild_rollups, rollup_category_totals
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    monkeypatch.setenv('CATEGORY_MODEL_PATH', str(tmp_path / 'model.pkl'))
+    monkeypatch.setenv('ADMIN_USERNAMES', 'admin')
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def users(app):
+    admin = User(username='admin', email='admin@example.com', password='x')
+    member = User(username='member', email='member@example.com', password='x')
+    db.session.add_all([admin, member])
+    db.session.commit()
+    for user in (admin, member):
+        db.session.add_all([
+            Expense(amount=12, category='Other', description='Pizza night', date=datetime(2024, 1, 3), user_id=user.id),
+            Expense(amount=30, category='Other', description='Uber ride home', date=datetime(2024, 1, 4), user_id=user.id),
+            Expense(amount=8, category='Food', description='Pizza slice', date=datetime(2024, 1, 5), user_id=user.id),
+            Expense(amount=5, category='Other', description=None, date=datetime(2024, 1, 6), user_id=user.id),
+        ])
+    db.session.commit()
+    rebuild_rollups()
+    return admin, member
+
+def _categories(user_id):
+    return [expense.category for expense in Expense.query.filter_by(user_id=user_id).order_by(Expense.id)]
+
+def test_dry_run_reports_without_writing(users):
+    admin, _ = users
+    report = recategorize_expenses(user_id=admin.id, dry_run=True, only_categories=None)
+
+    assert report['scanned'] == 3
+    assert report['changed'] == 2
+    assert [(old, new) for _, old, new in report['diff']] == [('Other', 'Food'), ('Other', 'Transport')]
+    assert _categories(admin.id) == ['Other', 'Other', 'Food', 'Other']
+
+def test_bulk_update_keeps_rollups_in_sync(users):
+    admin, member = users
+    report = recategorize_expenses(chunk_size=2, only_categories=['Other'], dry_run=False)
+
+    assert report['changed'] == 4
+    assert report['chunks'] == 2
+    assert _categories(admin.id) == ['Food', 'Transport', 'Food', 'Other']
+    assert _categories(member.id) == ['Food', 'Transport', 'Food', 'Other']
+    assert rebuild_rollups(repair=False)['drifted_keys'] == 0
+    assert ('Food', 'USD', 20, 2) in rollup_category_totals(admin.id)
+
+def test_defaults_only_preview_expenses_left_in_other(users):
+    admin, _ = users
+    db.session.add(Expense(amount=20, category='Gifts', description='Pizza night', date=datetime(2024, 1, 7), user_id=admin.id))
+    db.session.commit()
+
+    report = recategorize_expenses(user_id=admin.id)
+    assert report['dry_run'] is True
+    assert [(old, new) for _, old, new in report['diff']] == [('Other', 'Food'), ('Other', 'Transport')]
+    assert _categories(admin.id) == ['Other', 'Other', 'Food', 'Other', 'Gifts']
+
+    report = recategorize_expenses(user_id=admin.id, only_categories=None, dry_run=False)
+    assert report['changed'] == 3
+    assert _categories(admin.id) == ['Food', 'Transport', 'Food', 'Other', 'Food']
+
+def _client_for(app, user):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+    return client
+
+def test_admin_endpoint_rejects_regular_users(app, users):
+    _, member = users
+    client = _client_for(app, member)
+    assert client.post('/admin/recategorize', json={'dry_run': True}).status_code == 403
+
+def test_admin_endpoint_runs_for_admins(app, users):
+    admin, member = users
+    client = _client_for(app, admin)
+    response = client.post('/admin/recategorize', json={'dry_run': True, 'user_id': member.id})
+    assert response.status_code == 200
+    assert response.get_json()['changed'] == 2
+    assert _categories(member.id) == ['Other', 'Other', 'Food', 'Other']
+
+def test_admin_endpoint_needs_a_json_body_and_never_writes(app, users):
+    admin, member = users
+    client = _client_for(app, admin)
+    response = client.post('/admin/recategorize', data={'dry_run': 'false', 'user_id': member.id})
+    assert response.status_code == 415
+    assert _categories(member.id) == ['Other', 'Other', 'Food', 'Other']
+
+    assert client.post('/admin/recategorize', json={'user_id': member.id}).get_json()['dry_run'] is True
+    assert _categories(member.id) == ['Other', 'Other', 'Food', 'Other']
+
+    response = client.post('/admin/recategorize', json={'user_id': member.id, 'dry_run': False})
+    assert response.status_code == 400
+    assert '--apply' in response.get_json()['error']
+    assert _categories(member.id) == ['Other', 'Other', 'Food', 'Other']
+
+def test_admin_endpoint_previews_a_bounded_number_of_chunks(app, users, monkeypatch):
+    admin, _ = users
+    monkeypatch.setattr('budget_app.services.recategorize.PREVIEW_MAX_CHUNKS', 2)
+
+    report = _client_for(app, admin).post('/admin/recategorize', json={'chunk_size': 1}).get_json()
+
+    assert (report['chunks'], report['scanned'], report['complete']) == (2, 2, False)
+    assert recategorize_expenses(chunk_size=1, max_chunks=4)['complete'] is True
@@ -0,0 +1,251 @@
+# tests/test_recurring_expenses.py
+
+"""
+Tests for the batch recurring-transaction scheduler and its date arithmetic.
+"""
+
+import subprocess
+import sys
+import textwrap
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from budget_app import create_app, db
+from budget_app.models import User, Income, Expense, RecurringTransaction
+from budget_app.services import recurring_expenses
+from budget_app.services.recurring_expenses import add_month, add_months, claim_due, due_occurrences, run_recurring
+from budget_app.services.rollups import rebuild_rollups
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+NOW = datetime(2024, 4, 15, 12, 0)
+
+def _schedules():
+    alice = User(username='alice', email='alice@example.com', password='x')
+    bob = User(username='bob', email='bob@example.com', password='x')
+    db.session.add_all([alice, bob])
+    db.session.flush()
+    entries = [
+        RecurringTransaction(type='expense', amount=1200, category='Rent', interval='monthly', next_date=datetime(2024, 1, 31), user_id=alice.id),
+        RecurringTransaction(type='income', amount=3000, category='Salary', interval='monthly', next_date=datetime(2024, 3, 1), user_id=alice.id),
+        RecurringTransaction(type='expense', amount=5, category=None, interval='daily', next_date=datetime(2024, 4, 10), user_id=bob.id),
+        RecurringTransaction(type='expense', amount=20, category='Gym', interval='weekly', next_date=datetime(2024, 3, 30), user_id=bob.id),
+        RecurringTransaction(type='expense', amount=99, category='Later', interval='monthly', next_date=datetime(2024, 5, 1), user_id=bob.id),
+        RecurringTransaction(type='expense', amount=7, category='Odd', interval='yearly', next_date=datetime(2024, 1, 1), user_id=bob.id),
+    ]
+    db.session.add_all(entries)
+    db.session.commit()
+    return alice.id, bob.id
+
+def test_add_months_clamps_to_the_end_of_the_month():
+    assert add_month(date(2023, 1, 31)) == date(2023, 2, 28)
+    assert add_month(datetime(2024, 1, 31, 9, 30)) == datetime(2024, 2, 29, 9, 30)
+    assert add_month(date(2024, 12, 15)) == date(2025, 1, 15)
+    assert add_months(date(2024, 1, 31), 14) == date(2025, 3, 31)
+
+def test_due_occurrences_catch_up_without_drift():
+    occurrences, next_date = due_occurrences(datetime(2024, 1, 31), 'monthly', NOW)
+    assert occurrences == [datetime(2024, 1, 31), datetime(2024, 2, 29), datetime(2024, 3, 31)]
+    assert next_date == datetime(2024, 4, 30)
+
+    occurrences, next_date = due_occurrences(datetime(2024, 4, 10), 'daily', NOW, limit=2)
+    assert occurrences == [datetime(2024, 4, 10), datetime(2024, 4, 11)]
+    assert next_date == datetime(2024, 4, 12)
+
+def test_month_end_schedules_return_to_the_31st_across_runs(app):
+    user = User(username='carol', email='carol@example.com', password='x')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(RecurringTransaction(type='expense', amount=50, category='Rent', interval='monthly',
+                                        next_date=datetime(2024, 1, 31), user_id=user.id))
+    db.session.commit()
+
+    for run_at in (datetime(2024, 1, 31, 12), datetime(2024, 2, 29, 12), datetime(2024, 3, 31, 12)):
+        assert run_recurring(now=run_at)['occurrences'] == 1
+
+    assert [expense.date for expense in Expense.query.order_by(Expense.date)] == [
+        datetime(2024, 1, 31), datetime(2024, 2, 29), datetime(2024, 3, 31),
+    ]
+    entry = RecurringTransaction.query.one()
+    assert (entry.next_date, entry.anchor_day) == (datetime(2024, 4, 30), 31)
+    assert due_occurrences(entry.next_date, 'monthly', datetime(2024, 6, 1), anchor_day=31)[0] == [
+        datetime(2024, 4, 30), datetime(2024, 5, 31),
+    ]
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 1000])
+def test_run_emits_every_missed_occurrence_once(app, chunk_size):
+    alice_id, bob_id = _schedules()
+
+    report = run_recurring(now=NOW, chunk_size=chunk_size)
+
+    assert report['due'] == 4
+    assert report['skipped'] == 1
+    assert report['incomes'] == 2
+    assert report['expenses'] == 3 + 6 + 3
+    rent = Expense.query.filter_by(category='Rent').order_by(Expense.date).all()
+    assert [expense.date for expense in rent] == [datetime(2024, 1, 31), datetime(2024, 2, 29), datetime(2024, 3, 31)]
+    assert [income.date for income in Income.query.order_by(Income.date)] == [date(2024, 3, 1), date(2024, 4, 1)]
+    assert Expense.query.filter_by(category='Recurring Expense').count() == 6
+    next_dates = {entry.category: entry.next_date for entry in RecurringTransaction.query}
+    assert next_dates['Rent'] == datetime(2024, 4, 30)
+    assert next_dates['Gym'] == datetime(2024, 4, 20)
+    assert next_dates['Later'] == datetime(2024, 5, 1)
+    assert next_dates['Odd'] == datetime(2024, 1, 1)
+    assert rebuild_rollups(repair=False)['drifted_keys'] == 0
+    assert db.session.get(User, alice_id).data_version > 0
+
+    # A second run at the same time has nothing left to emit.
+    again = run_recurring(now=NOW, chunk_size=chunk_size)
+    assert again['occurrences'] == 0
+    assert Expense.query.count() == 12
+
+def test_capped_catch_up_continues_on_the_next_run(app):
+    _schedules()
+
+    first = run_recurring(now=NOW, max_occurrences=2)
+    second = run_recurring(now=NOW, max_occurrences=2)
+    run_recurring(now=NOW, max_occurrences=2)
+
+    assert first['occurrences'] == 2 + 2 + 2 + 2
+    assert second['occurrences'] == 1 + 0 + 2 + 1
+    assert Expense.query.count() == 12
+    assert rebuild_rollups(repair=False)['drifted_keys'] == 0
+
+def test_due_entries_are_selected_through_the_next_date_index(app):
+    _schedules()
+    plans = []
+
+    def _explain(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(('SELECT', 'UPDATE')) and 'FROM recurring_transaction' in statement and not executemany:
+            plans.extend(row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', _explain)
+    try:
+        run_recurring(now=NOW, chunk_size=2)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', _explain)
+
+    assert plans
+    assert any('ix_recurring_transaction_next_date (next_date<?)' in plan for plan in plans)
+    # The claim's outer UPDATE goes by primary key; nothing walks the whole table or index.
+    assert not any(plan.startswith('SCAN recurring_transaction') for plan in plans)
+
+def test_cli_reports_throughput(app):
+    _schedules()
+    result = app.test_cli_runner().invoke(args=['recurring', 'run', '--now', '2024-04-15 12:00:00'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Advanced 4 schedules' in result.output
+    assert 'Skipped 1 schedules' in result.output
+    assert 'schedules/s' in result.output
+
+def test_expired_leases_are_taken_over_and_live_ones_skipped(app):
+    _schedules()
+    clock = datetime.utcnow()
+    rent = RecurringTransaction.query.filter_by(category='Rent').one()
+    gym = RecurringTransaction.query.filter_by(category='Gym').one()
+    rent.lease_owner, rent.lease_expires_at = 'crashed-worker#1', clock - timedelta(minutes=1)
+    gym.lease_owner, gym.lease_expires_at = 'busy-worker#1', clock + timedelta(minutes=5)
+    db.session.commit()
+
+    claimed = claim_due('me#1', NOW, 10)
+
+    assert [entry.category for entry in claimed] == ['Rent', 'Salary', None]
+    assert all(entry.lease_expires_at > clock for entry in claimed)
+    assert claim_due('other#1', NOW, 10) == []
+
+    # The run skips the live lease; the busy worker's entry is still due afterwards.
+    db.session.execute(db.update(RecurringTransaction).values(lease_owner=None, lease_expires_at=None)
+                       .where(RecurringTransaction.lease_owner == 'me#1'))
+    db.session.commit()
+    report = run_recurring(now=NOW)
+    assert report['due'] == 3
+    assert Expense.query.filter_by(category='Gym').count() == 0
+
+def test_rows_taken_over_after_the_claim_are_left_to_the_new_owner(app, monkeypatch):
+    _schedules()
+    original = recurring_expenses.claim_due
+
+    def claim_then_lose_rent(token, *args, **kwargs):
+        entries = original(token, *args, **kwargs)
+        # The lease ran out and another worker claimed Rent before this one posted the chunk.
+        db.session.execute(db.update(RecurringTransaction).where(RecurringTransaction.category == 'Rent')
+                           .values(lease_owner='other#1', lease_expires_at=datetime.utcnow() + timedelta(minutes=5)))
+        db.session.commit()
+        return entries
+
+    monkeypatch.setattr(recurring_expenses, 'claim_due', claim_then_lose_rent)
+    # Like psycopg2 in batch mode: executemany row counts cannot be trusted.
+    monkeypatch.setattr(db.engine.dialect, 'supports_sane_multi_rowcount', False)
+    report = run_recurring(now=NOW)
+
+    assert report['lost_leases'] == 1
+    assert report['due'] == 3
+    assert Expense.query.filter_by(category='Rent').count() == 0
+    rent = RecurringTransaction.query.filter_by(category='Rent').one()
+    assert (rent.next_date, rent.lease_owner) == (datetime(2024, 1, 31), 'other#1')
+    assert Income.query.filter_by(source='Salary').count() == 2
+
+WORKER = textwrap.dedent('''
+    import sys
+    from datetime import datetime
+    from budget_app import create_app
+    from budget_app.services.recurring_expenses import run_recurring
+
+    with create_app().app_context():
+        report = run_recurring(now=datetime(2024, 4, 15, 12, 0), chunk_size=7, owner=sys.argv[1])
+        print(report['due'], report['occurrences'])
+''')
+
+def test_concurrent_workers_post_each_occurrence_once(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'recurring.db'}"
+    monkeypatch.setenv('DATABASE_URL', url)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        users = [User(username=f'user{i}', email=f'user{i}@example.com', password='x') for i in range(20)]
+        db.session.add_all(users)
+        db.session.flush()
+        for i in range(200):
+            db.session.add(RecurringTransaction(
+                type='income' if i % 5 == 0 else 'expense', amount=i + 1, category=f'C{i}',
+                interval=('daily', 'weekly', 'monthly')[i % 3], next_date=datetime(2024, 3, 1 + i % 28),
+                user_id=users[i % 20].id,
+            ))
+        db.session.commit()
+        expected = sum(
+            len(due_occurrences(entry.next_date, entry.interval, NOW)[0]) for entry in RecurringTransaction.query
+        )
+        db.session.remove()
+
+    workers = [
+        subprocess.Popen([sys.executable, '-c', WORKER, f'worker-{i}'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for i in range(4)
+    ]
+    outputs = [worker.communicate(timeout=120) for worker in workers]
+    assert all(worker.returncode == 0 for worker in workers), [err for _, err in outputs]
+    counts = [tuple(map(int, out.split())) for out, _ in outputs]
+
+    with app.app_context():
+        assert sum(due for due, _ in counts) == 200
+        assert sum(occurrences for _, occurrences in counts) == expected
+        assert Expense.query.count() + Income.query.count() == expected
+        duplicates = (
+            db.session.query(Expense.category, Expense.date).group_by(Expense.category, Expense.date)
+            .having(db.func.count() > 1).count()
+        )
+        assert duplicates == 0
+        assert RecurringTransaction.query.filter(RecurringTransaction.next_date <= NOW).count() == 0
+        assert rebuild_rollups(repair=False)['drifted_keys'] == 0
+        db.session.remove()
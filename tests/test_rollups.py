@@ -0,0 +1,157 @@
+# tests/test_rollups.py
+
+"""
+Tests for the monthly rollup table and its rebuild/verify logic.
+"""
+
+import logging
+import os
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event, text
+from budget_app import create_app, db
+from budget_app.models import User, Income, Expense, MonthlyRollup
+from budget_app.services.rollups import apply_delta, compute_rollups, rebuild_rollups, rollup_currency_totals
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    user = User(username='roll', email='roll@example.com', password='x')
+    db.session.add(user)
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    client.user_id = user.id
+    return client
+
+def _rollup_rows(user_id):
+    return {
+        (row.period, row.currency_code, row.category, row.kind): (row.total, row.entry_count)
+        for row in MonthlyRollup.query.filter_by(user_id=user_id).all()
+    }
+
+def test_write_paths_keep_rollups_in_sync(client):
+    client.post('/add_expense', data={
+        'amount': '40', 'category': 'Food', 'currency_code': 'INR', 'date': '2024-05-02', 'frequency': '',
+    })
+    client.post('/add_income', data={
+        'amount': '900', 'source': 'Job', 'currency_code': 'INR', 'date': '2024-05-01', 'frequency': 'none',
+    })
+    assert _rollup_rows(client.user_id) == {
+        ('2024-05', 'INR', 'Food', 'expense'): (40, 1),
+        ('2024-05', 'INR', 'Job', 'income'): (900, 1),
+    }
+
+    expense = Expense.query.filter_by(user_id=client.user_id).one()
+    client.post(f'/edit_expense/{expense.id}', data={
+        'amount': '25', 'category': 'Transport', 'currency_code': 'INR', 'date': '2024-06-02', 'frequency': '',
+    })
+    income = Income.query.filter_by(user_id=client.user_id).one()
+    client.post(f'/delete_income/{income.id}')
+
+    assert _rollup_rows(client.user_id) == {('2024-06', 'INR', 'Transport', 'expense'): (25, 1)}
+    assert rebuild_rollups(repair=False)['drifted_keys'] == 0
+
+def test_rebuild_reports_and_repairs_drift(client):
+    db.session.add_all([
+        Income(amount=100, source='Job', date=date(2024, 1, 5), currency_code='EUR', user_id=client.user_id),
+        Expense(amount=30, category='Food', date=datetime(2024, 1, 9), currency_code='EUR', user_id=client.user_id),
+    ])
+    db.session.commit()
+
+    report = rebuild_rollups(repair=False)
+    assert report == {'users': 1, 'drifted_users': 1, 'drifted_keys': 2}
+    assert rollup_currency_totals(client.user_id, 'income') == {}
+
+    rebuild_rollups(chunk_size=1)
+    assert rollup_currency_totals(client.user_id, 'income') == {'EUR': 100}
+    assert rollup_currency_totals(client.user_id, 'expense') == {'EUR': 30}
+    assert rebuild_rollups(repair=False)['drifted_keys'] == 0
+
+def test_undated_entries_keep_a_fixed_period(client):
+    from budget_app.services import rollups
+
+    # Legacy rows can lack a date; the column default only dates new ORM inserts.
+    db.session.execute(Expense.__table__.insert(), [
+        {'amount': 3, 'category': 'Misc', 'date': None, 'currency_code': 'USD', 'user_id': client.user_id},
+    ])
+    rollups.track_expense(Expense.query.one())
+    db.session.commit()
+
+    assert _rollup_rows(client.user_id) == {(rollups.UNDATED_PERIOD, 'USD', 'Misc', 'expense'): (3, 1)}
+    assert rollups.rollup_monthly_totals(client.user_id) == {}
+    assert rollups.rollup_currency_totals(client.user_id, 'expense') == {'USD': 3}
+    assert rebuild_rollups(repair=False)['drifted_keys'] == 0
+
+def test_rollup_changes_are_added_in_sql(client):
+    statements = []
+    event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    apply_delta(client.user_id, '2024-01', 'USD', 'Food', 'expense', 10.1, 1)
+    apply_delta(client.user_id, '2024-01', 'USD', 'Food', 'expense', 0.2, 1)
+    apply_delta(client.user_id, '2024-01', 'USD', 'Rent', 'expense', 5, 1)
+    apply_delta(client.user_id, '2024-01', 'USD', 'Rent', 'expense', -5, -1)
+
+    # No read-modify-write: concurrent writers to one key cannot lose each other's updates.
+    assert not [statement for statement in statements if statement.lstrip().upper().startswith('SELECT')]
+    assert any('ON CONFLICT' in statement for statement in statements)
+    assert _rollup_rows(client.user_id) == {('2024-01', 'USD', 'Food', 'expense'): (10.3, 2)}
+
+def test_existing_databases_are_backfilled_by_the_migration(monkeypatch, tmp_path, caplog):
+    from flask_migrate import stamp, upgrade
+
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'budget.db'}")
+    app = create_app()
+    with app.app_context():
+        user = User(username='old', email='old@example.com', password='x')
+        db.session.add(user)
+        db.session.commit()
+        # Rows written before rollups existed, and a table create_all() has just added empty.
+        db.session.execute(Expense.__table__.insert(), [
+            {'amount': 12.5, 'category': 'Food', 'date': datetime(2024, 3, 4), 'currency_code': 'EUR', 'user_id': user.id},
+            {'amount': 7.5, 'category': 'Food', 'date': datetime(2024, 3, 9), 'currency_code': 'EUR', 'user_id': user.id},
+            {'amount': 3, 'category': 'Misc', 'date': None, 'currency_code': 'USD', 'user_id': user.id},
+        ])
+        db.session.execute(Income.__table__.insert(), [
+            {'amount': 900, 'source': 'Job', 'date': date(2024, 3, 1), 'currency_code': 'EUR', 'user_id': user.id},
+        ])
+        db.session.execute(text('DELETE FROM schema_version'))
+        db.session.commit()
+        user_id = user.id
+        db.session.remove()
+
+    with caplog.at_level(logging.WARNING):
+        app = create_app()
+    assert 'monthly_rollup tracks 0 of 1 income rows; monthly_rollup tracks 0 of 3 expense rows' in caplog.text
+
+    with app.app_context():
+        stamp(directory=MIGRATIONS_DIR, revision='d2e8a4c6f1b3')
+        upgrade(directory=MIGRATIONS_DIR)
+        assert _rollup_rows(user_id) == {
+            (period, code, category, kind): values
+            for (_, period, code, category, kind), values in compute_rollups([user_id]).items()
+        }
+        assert _rollup_rows(user_id)[('0000-00', 'USD', 'Misc', 'expense')] == (3, 1)
+        assert rollup_currency_totals(user_id, 'expense') == {'EUR': 20, 'USD': 3}
+        assert rebuild_rollups(repair=False)['drifted_keys'] == 0
+        db.session.remove()
+
+    caplog.clear()
+    create_app()
+    assert 'out of date' not in caplog.text
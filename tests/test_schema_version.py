@@ -0,0 +1,97 @@
+# tests/test_schema_version.py
+
+"""
+Tests for the schema-version marker that lets app startup skip schema reflection.
+"""
+
+import logging
+import os
+import sqlite3
+
+import pytest
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import event, text
+import budget_app
+from budget_app import create_app, db
+from budget_app.models import SCHEMA_VERSION, SchemaVersion, User
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+@pytest.fixture
+def database_url(monkeypatch, tmp_path):
+    url = f"sqlite:///{tmp_path / 'budget.db'}"
+    monkeypatch.setenv('DATABASE_URL', url)
+    return url
+
+def _startup_statements(monkeypatch):
+    """Create an app and return the SQL its startup ran."""
+    statements = []
+    original = budget_app._recorded_schema_version
+
+    def recorded_schema_version():
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        return original()
+
+    monkeypatch.setattr(budget_app, '_recorded_schema_version', recorded_schema_version)
+    app = create_app()
+    monkeypatch.setattr(budget_app, '_recorded_schema_version', original)
+    return app, statements
+
+def test_schema_version_matches_the_latest_migration():
+    config = Config()
+    config.set_main_option('script_location', MIGRATIONS_DIR)
+    assert ScriptDirectory.from_config(config).get_heads() == [SCHEMA_VERSION]
+
+def test_a_verified_schema_is_not_reflected_again(database_url, monkeypatch):
+    app, statements = _startup_statements(monkeypatch)
+    assert len(statements) > 20
+    with app.app_context():
+        marker = db.session.get(SchemaVersion, 1)
+        assert marker.version == SCHEMA_VERSION
+
+    _, statements = _startup_statements(monkeypatch)
+    assert statements == ['SELECT version FROM schema_version WHERE id = 1']
+
+def test_a_stale_marker_triggers_a_full_check(database_url, monkeypatch):
+    app = create_app()
+    with app.app_context():
+        db.session.get(SchemaVersion, 1).version = 'old'
+        db.session.commit()
+
+    _, statements = _startup_statements(monkeypatch)
+    assert any('PRAGMA' in statement for statement in statements)
+    with app.app_context():
+        assert db.session.get(SchemaVersion, 1).version == SCHEMA_VERSION
+
+def test_missing_columns_are_reported_and_added_by_the_migration(database_url, tmp_path, monkeypatch, caplog):
+    from flask_migrate import stamp, upgrade
+
+    app = create_app()
+    with app.app_context():
+        db.session.add(User(username='alice', email='alice@example.com', password='x'))
+        db.session.commit()
+        db.session.execute(text('DELETE FROM schema_version'))
+        db.session.commit()
+        db.session.remove()
+    connection = sqlite3.connect(tmp_path / 'budget.db')
+    connection.executescript('ALTER TABLE user DROP COLUMN data_version; ALTER TABLE user DROP COLUMN is_guest;')
+    connection.close()
+
+    with caplog.at_level(logging.WARNING):
+        app = create_app()
+    assert 'user.is_guest is missing; user.data_version is missing' in caplog.text
+    with app.app_context():
+        assert db.session.get(SchemaVersion, 1) is None
+
+        stamp(directory=MIGRATIONS_DIR, revision='b7d3e5f1c2a8')
+        upgrade(directory=MIGRATIONS_DIR)
+        user = User.query.one()
+        assert (user.is_guest, user.data_version) == (False, 0)
+        db.session.remove()
+
+    caplog.clear()
+    app = create_app()
+    assert 'out of date' not in caplog.text
+    with app.app_context():
+        assert db.session.get(SchemaVersion, 1).version == SCHEMA_VERSION
@@ -0,0 +1,77 @@
+# tests/test_settlements.py
+
+"""
+Tests for the minimum-transfer settlement solver.
+"""
+
+import random
+
+import pytest
+from budget_app.services import settlements
+from budget_app.services.settlements import minimize_transfers, to_cents
+
+def _apply(balances, transfers):
+    remaining = dict(balances)
+    for debtor, creditor, cents in transfers:
+        assert cents > 0
+        remaining[debtor] += cents
+        remaining[creditor] -= cents
+    return remaining
+
+def _random_balances(count, seed):
+    rng = random.Random(seed)
+    values = [rng.choice([-1, 1]) * rng.randint(1, 8) * 250 for _ in range(count - 1)]
+    values.append(-sum(values))
+    return {user_id: value for user_id, value in enumerate(values, start=1)}
+
+def test_beats_largest_first_matching():
+    # Pairing the largest creditor with the largest debtor needs five transfers here.
+    balances = {1: 500, 2: 100, 3: -400, 4: -200, 5: 200, 6: -200}
+
+    transfers = minimize_transfers(balances)
+
+    assert len(transfers) == 4
+    assert set(_apply(balances, transfers).values()) == {0}
+
+@pytest.mark.parametrize('seed', range(20))
+def test_exact_solver_reaches_lower_bound(seed):
+    balances = _random_balances(9, seed)
+    transfers = minimize_transfers(balances)
+    assert set(_apply(balances, transfers).values()) == {0}
+
+    # Never worse than the heuristic, which is what larger groups get.
+    assert len(transfers) <= len(minimize_transfers(balances, exact_limit=0))
+    assert len(transfers) <= len([value for value in balances.values() if value]) - 1
+
+def test_output_is_deterministic():
+    balances = _random_balances(11, seed=7)
+    shuffled = dict(sorted(balances.items(), key=lambda item: random.Random(1).random()))
+
+    assert minimize_transfers(balances) == minimize_transfers(shuffled) == minimize_transfers(balances)
+
+def test_falls_back_when_over_budget():
+    balances = _random_balances(16, seed=3)
+
+    transfers = minimize_transfers(balances, exact_limit=64, time_budget=0)
+
+    assert set(_apply(balances, transfers).values()) == {0}
+    assert transfers == minimize_transfers(balances, exact_limit=0)
+
+def test_exact_limit_is_capped(monkeypatch):
+    balances = _random_balances(settlements.MAX_EXACT_MEMBERS + 1, seed=5)
+    monkeypatch.setattr(settlements, '_zero_sum_partition', lambda *args: pytest.fail('ran the exact solver'))
+
+    transfers = minimize_transfers(balances, exact_limit=30)
+
+    assert set(_apply(balances, transfers).values()) == {0}
+
+def test_large_groups_use_the_heuristic():
+    balances = _random_balances(1000, seed=11)
+    transfers = minimize_transfers(balances)
+    assert set(_apply(balances, transfers).values()) == {0}
+    assert len(transfers) < 1000
+
+def test_to_cents_rounds_half_up():
+    assert to_cents(10.005) == 1001
+    assert to_cents(-0.015) == -2
+    assert to_cents(None) == 0
@@ -0,0 +1,110 @@
+# tests/test_user_loader.py
+
+"""
+Tests for the request-scoped user loader and the user queries of the group pages.
+"""
+
+import re
+
+import pytest
+from flask import g
+from sqlalchemy import event
+from budget_app import create_app, db
+from budget_app.models import User, Group, GroupMember, SharedExpense
+from budget_app.services.user_loader import UserLoader
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///:memory:')
+    monkeypatch.setenv('CATEGORY_MODEL_PATH', str(tmp_path / 'model.pkl'))
+    app = create_app()
+    app.config['TESTING'] = True
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+def _make_group(member_count, prefix='user'):
+    users = [
+        User(username=f'{prefix}{index}', email=f'{prefix}{index}@example.com', password='x', is_guest=index % 4 == 3)
+        for index in range(member_count)
+    ]
+    db.session.add_all(users)
+    db.session.flush()
+    group = Group(name='Trip', created_by=users[0].id)
+    db.session.add(group)
+    db.session.flush()
+    db.session.add_all([GroupMember(group_id=group.id, user_id=user.id) for user in users])
+    db.session.add_all([
+        SharedExpense(group_id=group.id, description=f'Expense {index}', amount=10.0, paid_by=users[index].id)
+        for index in range(min(member_count, 20))
+    ])
+    db.session.commit()
+    return group, users
+
+class _Statements:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, *args):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(db.engine, 'before_cursor_execute', self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, 'before_cursor_execute', self)
+
+    @property
+    def user_queries(self):
+        return [statement for statement in self.statements if re.search(r'FROM user\b', statement)]
+
+def _get(app, viewer, path):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(viewer.id)
+        session['_fresh'] = True
+    db.session.expire_all()
+    g.pop('_login_user', None)
+    with _Statements() as recorder:
+        response = client.get(path)
+    assert response.status_code == 200
+    recorder.response = response
+    return recorder
+
+def test_loader_batches_and_remembers_missing_ids(app):
+    _, users = _make_group(5)
+    first, second, third = (user.id for user in users[:3])
+    db.session.expire_all()
+    loader = UserLoader()
+
+    with _Statements() as recorder:
+        loader.prime([first, second])
+        found = loader.get_many([third, first, 9999])
+        assert loader.get(second).username == 'user1'
+        assert loader.get(9999) is None
+    assert list(found) == [third, first]
+    assert len(recorder.user_queries) == 1
+
+@pytest.mark.parametrize('path', ['/group/{id}', '/view_group/{id}', '/add_shared_expense/{id}'])
+def test_group_pages_do_not_query_users_per_member(app, path):
+    small_group, small_users = _make_group(3)
+    small = _get(app, small_users[0], path.format(id=small_group.id))
+    large_group, large_users = _make_group(500, prefix='member')
+    large = _get(app, large_users[0], path.format(id=large_group.id))
+
+    assert len(large.statements) == len(small.statements)
+    # Only Flask-Login's lookup of the logged-in user reads a single user by id.
+    assert len([statement for statement in large.user_queries if 'user.id = ?' in statement]) == 1
+
+def test_view_group_loads_payers_who_left_in_one_query(app):
+    group, users = _make_group(5)
+    GroupMember.query.filter(GroupMember.group_id == group.id, GroupMember.user_id.in_([users[3].id, users[4].id])).delete()
+    db.session.commit()
+
+    recorder = _get(app, users[0], f'/view_group/{group.id}')
+    assert len([statement for statement in recorder.user_queries if ' IN (' in statement]) == 1
+    assert b'user4' in recorder.response.data